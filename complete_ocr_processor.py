@@ -6,24 +6,86 @@
 """
 
 import os
-import base64
+import sys
+import glob
 import json
 import time
-import requests
 from pathlib import Path
 import re
-from typing import List, Dict, Tuple
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Iterable, List, Dict, Tuple, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_processor'))
+from llm_client import CHAT_COMPLETIONS_PATH, LLMClient, chat_completion_text, get_shared_llm_client
+from ocr_pipeline import encode_image
+from ocr_store import OCRResultStore, image_sha256
+
+# 各识别方法的模型和提示词（同时作为结果库的键，修改后旧结果自动失效）
+OCR_METHOD_SPECS = {
+    'qwen-vl-max': {
+        'model': 'qwen-vl-max-latest',
+        'prompt': "请准确识别图片中的所有手写文字内容，保持原有的换行和标点符号，不要添加任何解释或分析，只输出识别到的文字内容。",
+        'temperature': 0.1
+    },
+    'qwen-vl-ocr': {
+        'model': 'qwen-vl-ocr-latest',
+        'prompt': "",  # 专业OCR模型，不带提示词
+        'temperature': 0
+    },
+    'optimized-prompt': {
+        'model': 'qwen-vl-max-latest',
+        'prompt': "这是老刘的投资笔记手写稿。请仔细逐字识别图片中的所有手写中文内容，包括：1)股票投资相关术语 2)人名和机构名 3)数字和日期 4)标点符号。请按原文布局输出，不要遗漏任何文字。",
+        'temperature': 0
+    }
+}
+
+# 各识别方法失败时结果文字中的名称
+METHOD_FAILURE_LABELS = {
+    'qwen-vl-max': 'qwen-vl-max',
+    'qwen-vl-ocr': 'qwen-vl-ocr',
+    'optimized-prompt': '备用方法'
+}
+
+# 多方法并发识别的提前结束策略
+DEFAULT_RACE_POLICY = {
+    'deadline': 120,       # 单张图片的截止秒数，到期后在已完成的结果中选择
+    'early_exit': 'quality',  # 'quality'：采用第一个达到质量阈值的结果；'all'：等全部方法完成后选最长的
+    'min_length': 100,     # 质量阈值：识别成功且不少于该字符数
+    'min_trials': 5,       # 方法参与满该页数后才评估胜率
+    'min_win_rate': 0.1    # 胜率低于该值的方法自动停用（至少保留一个方法）
+}
 
 class CompleteOCRProcessor:
-    def __init__(self, api_key: str):
-        """初始化OCR处理器"""
+    def __init__(self, api_key: str, llm_client: Optional[LLMClient] = None, race_policy: Optional[Dict] = None,
+                 store: Optional[OCRResultStore] = None, use_store: bool = True):
+        """
+        初始化OCR处理器（请求经共享客户端按配额调度、失败自动退避重试）
+        
+        Args:
+            race_policy: 多方法并发识别策略，默认 DEFAULT_RACE_POLICY
+            store: OCR结果库，默认 cache/ocr_results.db
+            use_store: 为False时每次都重新识别
+        """
         self.api_key = api_key
-        self.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        self.headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+        self.client = llm_client if llm_client is not None else get_shared_llm_client(api_key)
         self.results = {}
+        self.race_policy = dict(DEFAULT_RACE_POLICY, **(race_policy or {}))
+        if use_store:
+            self.store = store if store is not None else OCRResultStore()
+        else:
+            self.store = None
+        self.methods = {
+            'qwen-vl-max': self.extract_with_qwen_vl_max,
+            'qwen-vl-ocr': self.extract_with_qwen_vl_ocr,
+            'optimized-prompt': self.extract_with_different_prompts
+        }
+        self.disabled_methods = set()
+        self.method_stats = {
+            method: {'runs': 0, 'wins': 0, 'completed': 0, 'failures': 0, 'abandoned': 0, 'latency_total': 0.0}
+            for method in self.methods
+        }
+        self._stats_lock = threading.Lock()
 
     def get_sorted_image_files(self, directory: str) -> List[str]:
         """获取按文件名排序的图片文件列表"""
@@ -42,138 +104,54 @@ class CompleteOCRProcessor:
         sorted_files = sorted(image_files, key=extract_number)
         return [str(f) for f in sorted_files]
 
-    def extract_with_qwen_vl_max(self, image_path: str) -> str:
-        """使用qwen-vl-max提取文字"""
-        try:
-            with open(image_path, 'rb') as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            payload = {
-                "model": "qwen-vl-max-latest",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": "请准确识别图片中的所有手写文字内容，保持原有的换行和标点符号，不要添加任何解释或分析，只输出识别到的文字内容。"
-                            }
-                        ]
-                    }
-                ],
-                "temperature": 0.1,
-                "max_tokens": 4096
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content'].strip()
-            else:
-                return f"[qwen-vl-max识别失败: HTTP {response.status_code}]"
-                
-        except Exception as e:
-            return f"[qwen-vl-max识别失败: {str(e)}]"
+    def encode_image(self, image_path: str) -> str:
+        """图片转为 data URL（并发识别时每张图片只编码一次）"""
+        with open(image_path, 'rb') as image_file:
+            return encode_image(image_file.read(), image_path)
+
+    def build_payload(self, method: str, image_url: str) -> Dict:
+        """识别方法对应的请求体（qwen-vl-ocr 为专业OCR模型，只传图片和像素范围）"""
+        spec = OCR_METHOD_SPECS[method]
+        if method == 'qwen-vl-ocr':
+            content = [{
+                "type": "image_url",
+                "image_url": {
+                    "url": image_url,
+                    "min_pixels": 28 * 28 * 4,
+                    "max_pixels": 28 * 28 * 8192
+                }
+            }]
+        else:
+            content = [
+                {"type": "image_url", "image_url": {"url": image_url}},
+                {"type": "text", "text": spec['prompt']}
+            ]
+        return {
+            "model": spec['model'],
+            "messages": [{"role": "user", "content": content}],
+            "temperature": spec['temperature'],
+            "max_tokens": 4096
+        }
+
+    def extract_with_qwen_vl_max(self, image_path: str, image_url: Optional[str] = None) -> str:
+        """使用qwen-vl-max提取文字（image_url 为已编码的图片，省略时读取 image_path）"""
+        return self._extract('qwen-vl-max', image_path, image_url)
 
-    def extract_with_qwen_vl_ocr(self, image_path: str) -> str:
+    def extract_with_qwen_vl_ocr(self, image_path: str, image_url: Optional[str] = None) -> str:
         """使用qwen-vl-ocr模型提取文字（专业OCR模型）"""
-        try:
-            with open(image_path, 'rb') as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            payload = {
-                "model": "qwen-vl-ocr-latest",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                    "min_pixels": 28 * 28 * 4,
-                                    "max_pixels": 28 * 28 * 8192
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "temperature": 0,
-                "max_tokens": 4096
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content'].strip()
-            else:
-                return f"[qwen-vl-ocr识别失败: HTTP {response.status_code}]"
-                
-        except Exception as e:
-            return f"[qwen-vl-ocr识别失败: {str(e)}]"
+        return self._extract('qwen-vl-ocr', image_path, image_url)
 
-    def extract_with_different_prompts(self, image_path: str) -> str:
+    def extract_with_different_prompts(self, image_path: str, image_url: Optional[str] = None) -> str:
         """使用不同提示词再次提取，提高准确性"""
+        return self._extract('optimized-prompt', image_path, image_url)
+
+    def _extract(self, method: str, image_path: str, image_url: Optional[str]) -> str:
         try:
-            with open(image_path, 'rb') as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            payload = {
-                "model": "qwen-vl-max-latest",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": "这是老刘的投资笔记手写稿。请仔细逐字识别图片中的所有手写中文内容，包括：1)股票投资相关术语 2)人名和机构名 3)数字和日期 4)标点符号。请按原文布局输出，不要遗漏任何文字。"
-                            }
-                        ]
-                    }
-                ],
-                "temperature": 0,
-                "max_tokens": 4096
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content'].strip()
-            else:
-                return f"[备用方法识别失败: HTTP {response.status_code}]"
-                
+            image_url = image_url or self.encode_image(image_path)
+            result = self.client.complete(CHAT_COMPLETIONS_PATH, self.build_payload(method, image_url), timeout=120)
+            return chat_completion_text(result)
         except Exception as e:
-            return f"[备用方法识别失败: {str(e)}]"
+            return f"[{METHOD_FAILURE_LABELS[method]}识别失败: {str(e)}]"
 
     def compare_and_choose_best(self, results: Dict[str, str]) -> Tuple[str, str]:
         """比较多种方法的结果，选择最佳的"""
@@ -194,46 +172,182 @@ class CompleteOCRProcessor:
         return best_method, best_text
 
     def process_single_image(self, image_path: str, page_num: int) -> Dict:
-        """处理单个图片，使用多种方法"""
+        """处理单个图片：结果库已有的直接复用，其余方法并发识别，按 race_policy 提前结束或到期后选择最佳结果"""
         filename = os.path.basename(image_path)
         print(f"\n[{page_num}/27] 处理: {filename}")
+        policy = self.race_policy
+        methods = self.active_methods()
+        
+        try:
+            with open(image_path, 'rb') as image_file:
+                data = image_file.read()
+        except Exception as e:
+            # 读取失败时各方法同样失败，不再发起请求
+            results = {method: f"[{method}识别失败: {str(e)}]" for method in methods}
+            best_method, best_text = self.compare_and_choose_best(results)
+            return {'filename': filename, 'page_num': page_num, 'results': results,
+                    'best_method': best_method, 'best_text': best_text, 'latencies': {}}
         
         results = {}
+        if self.store is not None:
+            image_hash = image_sha256(data)
+            signature = self.page_signature(methods)
+            record = self.store.get_page(image_hash, signature)
+            if record is not None:
+                print(f"  ✓ 已有结果: {record['best_method']} (长度: {len(record['best_text'])})")
+                return {'filename': filename, 'page_num': page_num, **record}
+            
+            for method in methods:
+                spec = OCR_METHOD_SPECS[method]
+                text = self.store.get_text(image_hash, spec['model'], spec['prompt'])
+                if text is not None:
+                    results[method] = text
+            if results:
+                print(f"  - 结果库已有: {', '.join(results)}")
+        else:
+            image_hash = signature = None
         
-        # 方法1: qwen-vl-max
-        print("  - 使用 qwen-vl-max...")
-        results['qwen-vl-max'] = self.extract_with_qwen_vl_max(image_path)
-        time.sleep(1)
+        winner = None
+        if policy['early_exit'] == 'quality':
+            winner = next((method for method in methods if method in results and self.passes_quality(results[method])), None)
+        to_run = [] if winner is not None else [method for method in methods if method not in results]
         
-        # 方法2: qwen-vl-ocr (专业OCR模型)
-        print("  - 使用 qwen-vl-ocr...")
-        results['qwen-vl-ocr'] = self.extract_with_qwen_vl_ocr(image_path)
-        time.sleep(1)
+        started = time.monotonic()
+        futures = {}
+        if to_run:
+            print(f"  - 并发识别: {', '.join(to_run)}")
+            image_url = encode_image(data, image_path)
+            for method in to_run:
+                # 直接持有客户端返回的 Future，提前结束时 cancel() 能停止排队、重试中的请求
+                future = self.client.submit(CHAT_COMPLETIONS_PATH, self.build_payload(method, image_url), timeout=120)
+                future.add_done_callback(lambda f, method=method: self._record_completion(method, f, started))
+                futures[future] = method
         
-        # 方法3: 不同提示词
-        print("  - 使用优化提示词...")
-        results['optimized-prompt'] = self.extract_with_different_prompts(image_path)
-        time.sleep(1)
+        latencies = {}
+        pending = set(futures)
+        deadline = started + policy['deadline']
+        while pending and winner is None:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            # 同时完成的结果按方法顺序检查
+            for future in sorted(done, key=lambda f: methods.index(futures[f])):
+                method = futures[future]
+                results[method] = self._method_text(method, future, image_hash)
+                latencies[method] = round(time.monotonic() - started, 2)
+                if winner is None and policy['early_exit'] == 'quality' and self.passes_quality(results[method]):
+                    winner = method
         
-        # 比较结果选择最佳
-        best_method, best_text = self.compare_and_choose_best(results)
+        # 提前结束或到期：取消尚未完成的方法（排队和重试中的请求不再发出，已发出的请求返回后丢弃）
+        for future in pending:
+            future.cancel()
+            method = futures[future]
+            reason = "已采用其他方法结果" if winner else "超时"
+            results[method] = f"[{method}未完成: {reason}]"
+            with self._stats_lock:
+                self.method_stats[method]['abandoned'] += 1
+        for method in methods:
+            results.setdefault(method, f"[{method}未完成: 已采用其他方法结果]")
         
-        print(f"  ✓ 最佳方法: {best_method} (长度: {len(best_text)})")
+        if winner is not None:
+            best_method, best_text = winner, results[winner]
+        else:
+            best_method, best_text = self.compare_and_choose_best(results)
         
-        return {
-            'filename': filename,
-            'page_num': page_num,
-            'results': results,
+        # 胜率只统计实际发出请求的方法
+        with self._stats_lock:
+            for method in to_run:
+                self.method_stats[method]['runs'] += 1
+            if best_method in to_run:
+                self.method_stats[best_method]['wins'] += 1
+        
+        elapsed = time.monotonic() - started
+        print(f"  ✓ 最佳方法: {best_method} (长度: {len(best_text)}, 耗时: {elapsed:.1f}s)")
+        
+        record = {
+            'results': {method: results[method] for method in methods},
             'best_method': best_method,
-            'best_text': best_text
+            'best_text': best_text,
+            'latencies': latencies
         }
+        if self.store is not None and not best_text.startswith('['):
+            self.store.put_page(image_hash, signature, record)
+        
+        return {'filename': filename, 'page_num': page_num, **record}
+
+    def page_signature(self, methods: List[str]) -> str:
+        """整页结果的识别配置摘要：参与的方法及其模型/提示词、选择策略"""
+        return json.dumps({
+            'methods': [[method, OCR_METHOD_SPECS[method]] for method in methods],
+            'early_exit': self.race_policy['early_exit'],
+            'min_length': self.race_policy['min_length']
+        }, ensure_ascii=False, sort_keys=True)
+
+    def passes_quality(self, text: str) -> bool:
+        """识别成功且长度达到阈值"""
+        return not text.startswith('[') and len(text) >= self.race_policy['min_length']
+
+    def active_methods(self) -> List[str]:
+        """参与识别的方法：参与页数达到 min_trials 且胜率低于 min_win_rate 的方法停用"""
+        policy = self.race_policy
+        with self._stats_lock:
+            for method, stats in self.method_stats.items():
+                if method in self.disabled_methods or stats['runs'] < policy['min_trials']:
+                    continue
+                remaining = [m for m in self.methods if m not in self.disabled_methods and m != method]
+                if remaining and stats['wins'] / stats['runs'] < policy['min_win_rate']:
+                    self.disabled_methods.add(method)
+                    print(f"  ⚠️ 停用低胜率方法: {method} ({stats['wins']}/{stats['runs']})")
+        return [method for method in self.methods if method not in self.disabled_methods]
+
+    def get_method_stats(self) -> Dict[str, Dict]:
+        """各方法的胜率、完成数、失败数和平均耗时"""
+        with self._stats_lock:
+            return {
+                method: {
+                    'runs': stats['runs'],
+                    'wins': stats['wins'],
+                    'win_rate': round(stats['wins'] / stats['runs'], 3) if stats['runs'] else 0.0,
+                    'completed': stats['completed'],
+                    'failures': stats['failures'],
+                    'abandoned': stats['abandoned'],
+                    'mean_latency': round(stats['latency_total'] / stats['completed'], 2) if stats['completed'] else None,
+                    'disabled': method in self.disabled_methods
+                }
+                for method, stats in self.method_stats.items()
+            }
+
+    def _method_text(self, method: str, future: Future, image_hash: Optional[str]) -> str:
+        """已完成请求的识别文字（失败时为失败说明），写入结果库"""
+        try:
+            text = chat_completion_text(future.result())
+        except Exception as e:
+            text = f"[{METHOD_FAILURE_LABELS[method]}识别失败: {str(e)}]"
+        if self.store is not None:
+            spec = OCR_METHOD_SPECS[method]
+            self.store.put_text(image_hash, spec['model'], spec['prompt'], text)
+        return text
+
+    def _record_completion(self, method: str, future: Future, started: float):
+        # 提前结束前已返回的请求都记录耗时，胜率之外也能看到各方法的真实延迟
+        if future.cancelled():
+            return
+        with self._stats_lock:
+            stats = self.method_stats[method]
+            stats['completed'] += 1
+            stats['latency_total'] += time.monotonic() - started
+            if future.exception() is not None:
+                stats['failures'] += 1
 
-    def process_all_images(self, directory: str) -> List[Dict]:
-        """处理所有图片"""
+    def process_all_images(self, directory: str, resume: bool = True) -> List[Dict]:
+        """处理所有图片（resume 时先导入已有检查点，结果库中已完成的页不再调用接口）"""
         image_files = self.get_sorted_image_files(directory)
         print(f"开始处理所有 {len(image_files)} 个图片文件...")
         print("=" * 60)
         
+        if resume:
+            self.resume_from_checkpoint(image_files)
+        
         all_results = []
         
         for i, image_path in enumerate(image_files, 1):
@@ -249,53 +363,109 @@ class CompleteOCRProcessor:
         print("✓ 所有图片处理完成!")
         return all_results
 
+    def resume_from_checkpoint(self, image_files: List[str], checkpoint_files: Optional[List[str]] = None) -> int:
+        """
+        把检查点文件中的识别结果导入结果库（按文件名对应到当前图片，按图片内容计算哈希）
+        
+        Args:
+            checkpoint_files: 默认为当前目录下的 ocr_progress_*.json 和 complete_ocr_results.json
+        
+        Returns:
+            新导入的识别结果条数
+        """
+        if self.store is None:
+            return 0
+        if checkpoint_files is None:
+            def progress_number(path):
+                match = re.search(r'ocr_progress_(\d+)\.json$', path)
+                return int(match.group(1)) if match else 0
+            # 最新（页数最多）的检查点优先，同一结果只写入一次
+            checkpoint_files = ["complete_ocr_results.json"] + sorted(
+                glob.glob("ocr_progress_*.json"), key=progress_number, reverse=True
+            )
+        
+        paths_by_name = {os.path.basename(path): path for path in image_files}
+        hashes = {}
+        imported = 0
+        for checkpoint in checkpoint_files:
+            if not os.path.exists(checkpoint):
+                continue
+            try:
+                with open(checkpoint, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 跳过无法读取的检查点 {checkpoint}: {e}")
+                continue
+            
+            for record in records:
+                image_path = paths_by_name.get(record.get('filename'))
+                if image_path is None:
+                    continue
+                if image_path not in hashes:
+                    with open(image_path, 'rb') as image_file:
+                        hashes[image_path] = image_sha256(image_file.read())
+                for method, text in record.get('results', {}).items():
+                    spec = OCR_METHOD_SPECS.get(method)
+                    if spec and self.store.put_text(hashes[image_path], spec['model'], spec['prompt'], text):
+                        imported += 1
+        
+        if imported:
+            print(f"💾 从检查点导入 {imported} 条识别结果")
+        return imported
+
     def save_intermediate_results(self, results: List[Dict], filename: str):
-        """保存中间结果"""
-        with open(filename, 'w', encoding='utf-8') as f:
+        """保存中间结果（先写临时文件再替换，中断时不会留下半个文件）"""
+        temp_file = f"{filename}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, filename)
 
-    def generate_complete_documents(self, results: List[Dict]):
-        """生成完整文档"""
+    def generate_complete_documents(self, results: Iterable[Dict]) -> int:
+        """
+        生成完整文档：主文档和比对文档同时打开，结果逐条写入两个文件
+        results 可以是生成器（如 iter_json_array("complete_ocr_results.json")），返回页数
+        """
         
-        # 生成文档1：原始OCR结果
         doc1_file = "老刘投资笔记_完整文档1_原始OCR提取.txt"
-        with open(doc1_file, 'w', encoding='utf-8') as f:
-            f.write("# 老刘投资笔记 - 完整文档1：原始OCR文字提取结果\n")
-            f.write(f"# 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("# 说明：本文档为老刘投资笔记手写内容的完整OCR识别结果\n")
-            f.write("# 处理模型：阿里云 qwen-vl-max + qwen-vl-ocr 多重验证\n")
-            f.write("# 文件总数：27张图片，按68-94顺序排列\n\n")
-            f.write("=" * 80 + "\n\n")
-            
-            for result in results:
-                f.write(f"## 第{result['page_num']}页 - {result['filename']}\n")
-                f.write(f"### 最佳识别方法: {result['best_method']}\n\n")
-                f.write(f"{result['best_text']}\n\n")
-                f.write("-" * 80 + "\n\n")
-        
-        # 生成比对文档：包含所有方法的结果
         comparison_file = "老刘投资笔记_OCR方法比对.txt"
-        with open(comparison_file, 'w', encoding='utf-8') as f:
-            f.write("# 老刘投资笔记 - OCR方法比对文档\n")
-            f.write(f"# 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("# 说明：多种OCR方法的详细比对结果\n\n")
-            f.write("=" * 80 + "\n\n")
+        page_count = 0
+        
+        with open(doc1_file, 'w', encoding='utf-8') as doc1, open(comparison_file, 'w', encoding='utf-8') as comparison:
+            # 文档1：原始OCR结果
+            doc1.write("# 老刘投资笔记 - 完整文档1：原始OCR文字提取结果\n")
+            doc1.write(f"# 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            doc1.write("# 说明：本文档为老刘投资笔记手写内容的完整OCR识别结果\n")
+            doc1.write("# 处理模型：阿里云 qwen-vl-max + qwen-vl-ocr 多重验证\n")
+            doc1.write("# 文件总数：27张图片，按68-94顺序排列\n\n")
+            doc1.write("=" * 80 + "\n\n")
+            
+            # 比对文档：包含所有方法的结果
+            comparison.write("# 老刘投资笔记 - OCR方法比对文档\n")
+            comparison.write(f"# 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            comparison.write("# 说明：多种OCR方法的详细比对结果\n\n")
+            comparison.write("=" * 80 + "\n\n")
             
             for result in results:
-                f.write(f"## 第{result['page_num']}页 - {result['filename']}\n\n")
+                page_count += 1
                 
-                for method, text in result['results'].items():
-                    f.write(f"### {method} 结果:\n")
-                    f.write(f"长度: {len(text)} 字符\n")
-                    f.write(f"{text}\n\n")
-                    f.write("-" * 40 + "\n")
+                doc1.write(f"## 第{result['page_num']}页 - {result['filename']}\n")
+                doc1.write(f"### 最佳识别方法: {result['best_method']}\n\n")
+                doc1.write(f"{result['best_text']}\n\n")
+                doc1.write("-" * 80 + "\n\n")
                 
-                f.write(f"**最佳选择**: {result['best_method']}\n\n")
-                f.write("=" * 80 + "\n\n")
+                comparison.write(f"## 第{result['page_num']}页 - {result['filename']}\n\n")
+                for method, text in result['results'].items():
+                    comparison.write(f"### {method} 结果:\n")
+                    comparison.write(f"长度: {len(text)} 字符\n")
+                    comparison.write(f"{text}\n\n")
+                    comparison.write("-" * 40 + "\n")
+                comparison.write(f"**最佳选择**: {result['best_method']}\n\n")
+                comparison.write("=" * 80 + "\n\n")
         
         print(f"✓ 完整文档已生成:")
         print(f"  - 主文档: {doc1_file}")
         print(f"  - 比对文档: {comparison_file}")
+        return page_count
 
 def main():
     """主函数"""
@@ -333,6 +503,13 @@ def main():
         for method, count in sorted(method_stats.items(), key=lambda x: x[1], reverse=True):
             print(f"  {method}: {count} 页 ({count/total_pages*100:.1f}%)")
         
+        print(f"\n⏱️ 各方法胜率与耗时:")
+        for method, stats in processor.get_method_stats().items():
+            latency = f"{stats['mean_latency']}s" if stats['mean_latency'] is not None else "-"
+            status = " (已停用)" if stats['disabled'] else ""
+            print(f"  {method}: 胜率 {stats['win_rate']*100:.0f}% ({stats['wins']}/{stats['runs']}), "
+                  f"平均耗时 {latency}, 失败 {stats['failures']}{status}")
+        
     except Exception as e:
         print(f"❌ 程序执行出错: {str(e)}")
 
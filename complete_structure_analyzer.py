@@ -4,12 +4,28 @@
 完整版结构化分析器 - 基于27页完整内容
 """
 
+import io
+import os
 import re
 import json
 import time
-from typing import Dict, List, Tuple
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 
+from doc_stream import append_spool, spool
+from keyword_engine import KeywordEngine, QuoteMatcher, iter_unique
+from ocr_store import ResultStore, get_shared_store
+
+PAGE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'page_analysis.db')
+PAGE_CACHE_TIER = 'page_analysis'
+ANALYZER_VERSION = 1    # 提取逻辑变化时递增，使旧的分页缓存失效
+PARALLEL_MIN_PAGES = 4  # 待分析页数少于此值时在当前进程分析（进程池启动开销大于分析本身）
+PAGE_BATCH_SIZE = 64    # 流式分析时每批读入的页数
+PAGE_HEADER_PATTERN = re.compile(r'## 第(\d+)页 - ([^\n]+)')
+
 @dataclass
 class InvestmentNote:
     """投资笔记结构化数据"""
@@ -45,7 +61,14 @@ class InvestmentNote:
 class CompleteInvestmentAnalyzer:
     """完整投资笔记分析器"""
     
-    def __init__(self):
+    def __init__(self, page_cache: Optional[ResultStore] = None, use_cache: bool = True,
+                 max_workers: Optional[int] = None):
+        """
+        Args:
+            page_cache: 分页分析结果库（按页面文字+关键词配置寻址，不会过时），默认 cache/page_analysis.db
+            use_cache: 为False时每页都重新分析
+            max_workers: 分析进程数，默认为CPU核数
+        """
         # 定义关键词模式（更全面）
         self.patterns = {
             # 投资策略关键词
@@ -92,61 +115,60 @@ class CompleteInvestmentAnalyzer:
             ]
         }
         
-        # 投资名言模式
-        self.quote_patterns = [
-            r'"[^"]*"',  # 双引号包围的内容
-            r'"[^"]*"',  # 中文双引号包围的内容
-            r'.*——.*',    # 含有"——"的名言
-            r'.*巴菲特.*', r'.*格雷厄姆.*', r'.*芒格.*',  # 投资大师相关
-            r'.*杨德龙.*', r'.*任泽平.*', r'.*段永平.*'  # 国内投资专家
-        ]
-
-    def extract_key_quotes(self, text: str) -> List[str]:
-        """提取投资金句和名言"""
-        quotes = []
-        
-        # 提取引号内容
-        for pattern in self.quote_patterns:
-            matches = re.findall(pattern, text, re.MULTILINE)
-            quotes.extend(matches)
+        # 投资名言：双引号包围的内容；含破折号或投资大师名字的整行
+        self.quote_patterns = [r'"[^"]*"']
+        self.quote_line_keywords = ['——', '巴菲特', '格雷厄姆', '芒格', '杨德龙', '任泽平', '段永平']
+        # 名人名言：包含人名的整句
+        self.famous_people = ['巴菲特', '格雷厄姆', '芒格', '杨德龙', '任泽平', '段永平', '索罗斯', '利弗莫尔']
+        self.quote_matcher = QuoteMatcher(self.quote_patterns, self.quote_line_keywords, self.famous_people)
         
-        # 提取名人名言（包含人名的句子）
-        famous_people = ['巴菲特', '格雷厄姆', '芒格', '杨德龙', '任泽平', '段永平', '索罗斯', '利弗莫尔']
-        for person in famous_people:
-            pattern = f'[^。！？]*{person}[^。！？]*'
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            quotes.extend(matches)
+        # 投资观点、择时建议的关键词（取包含这些词的整句）
+        self.view_keywords = ['投资', '买入', '卖出', '持有']
+        self.timing_keywords = ['时机', '时候', '机会', '入场']
         
-        # 清理和去重
-        cleaned_quotes = []
-        for quote in quotes:
-            quote = quote.strip('，。！？ \n\t')
-            if len(quote) > 8 and quote not in cleaned_quotes:
-                cleaned_quotes.append(quote)
+        # 所有类别合成一个关键词引擎，每页只扫描一遍
+        self.keyword_engine = KeywordEngine({
+            **self.patterns,
+            'views': self.view_keywords,
+            'timing': self.timing_keywords
+        })
         
-        return cleaned_quotes
+        if use_cache:
+            self.page_cache = page_cache if page_cache is not None else get_shared_store(PAGE_CACHE_PATH)
+        else:
+            self.page_cache = None
+        self.max_workers = max_workers
+        # 关键词配置的摘要，配置变化时分页缓存自动失效
+        self.config_signature = hashlib.sha256(json.dumps({
+            'version': ANALYZER_VERSION,
+            'patterns': self.patterns,
+            'quotes': [self.quote_patterns, self.quote_line_keywords, self.famous_people],
+            'views': self.view_keywords,
+            'timing': self.timing_keywords
+        }, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def extract_key_quotes(self, text: str) -> List[str]:
+        """提取投资金句和名言"""
+        return list(self.iter_key_quotes(text))
+
+    def iter_key_quotes(self, text: str) -> Iterator[str]:
+        """逐条产出清理、去重后的金句（引号内容、名言行、名人名言句由一个匹配器一次扫描得到）"""
+        return iter_unique(self.quote_matcher.iter_quotes(text), 8, '，。！？ \n\t')
 
     def extract_by_keywords(self, text: str, keyword_type: str) -> List[str]:
         """基于关键词提取相关内容"""
+        return list(self.iter_by_keywords(text, keyword_type))
+
+    def iter_by_keywords(self, text: str, keyword_type: str) -> Iterator[str]:
+        """逐条产出包含某类关键词的句子（清理、去重后）"""
         if keyword_type not in self.patterns:
-            return []
-        
-        results = []
-        patterns = self.patterns[keyword_type]
-        
-        for pattern in patterns:
-            # 提取包含关键词的句子
-            matches = re.findall(f'[^。！？]*{pattern}[^。！？]*', text, re.IGNORECASE)
-            results.extend(matches)
+            return iter(())
         
-        # 清理和去重
-        cleaned_results = []
-        for result in results:
-            result = result.strip('，。！？ \n\t')
-            if len(result) > 5 and result not in cleaned_results:
-                cleaned_results.append(result)
-        
-        return cleaned_results
+        return self._clean_hits(self.keyword_engine.sentence_hits(text)[keyword_type])
+
+    def _clean_hits(self, sentences: List[str]) -> Iterator[str]:
+        """清理和保序去重"""
+        return iter_unique(sentences, 5, '，。！？ \n\t')
 
     def analyze_page(self, page_num: int, filename: str, text: str) -> InvestmentNote:
         """分析单页内容"""
@@ -168,197 +190,263 @@ class CompleteInvestmentAnalyzer:
             risk_warnings=[]
         )
         
-        # 提取各类信息
+        # 提取各类信息（所有类别的关键词一次扫描）
+        hits = self.keyword_engine.sentence_hits(text)
         note.key_quotes = self.extract_key_quotes(text)
-        note.investment_strategies = self.extract_by_keywords(text, 'strategies')
-        note.mentioned_stocks = self.extract_by_keywords(text, 'stocks')
-        note.financial_metrics = self.extract_by_keywords(text, 'financial')
-        note.market_analysis = self.extract_by_keywords(text, 'market')
-        note.technical_analysis = self.extract_by_keywords(text, 'technical')
-        note.risk_warnings = self.extract_by_keywords(text, 'risks')
+        note.investment_strategies = list(self._clean_hits(hits['strategies']))
+        note.mentioned_stocks = list(self._clean_hits(hits['stocks']))
+        note.financial_metrics = list(self._clean_hits(hits['financial']))
+        note.market_analysis = list(self._clean_hits(hits['market']))
+        note.technical_analysis = list(self._clean_hits(hits['technical']))
+        note.risk_warnings = list(self._clean_hits(hits['risks']))
         
-        # 提取投资观点（包含"投资"、"买"、"卖"等关键词的句子）
-        investment_patterns = [r'[^。！？]*投资[^。！？]*', r'[^。！？]*买入[^。！？]*', 
-                             r'[^。！？]*卖出[^。！？]*', r'[^。！？]*持有[^。！？]*']
-        for pattern in investment_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            note.investment_views.extend([m.strip() for m in matches if len(m.strip()) > 8])
+        # 投资观点（包含"投资"、"买入"、"卖出"、"持有"的句子）
+        note.investment_views = [m.strip() for m in hits['views'] if len(m.strip()) > 8]
         
-        # 提取择时建议
-        timing_patterns = [r'[^。！？]*时机[^。！？]*', r'[^。！？]*时候[^。！？]*', 
-                          r'[^。！？]*机会[^。！？]*', r'[^。！？]*入场[^。！？]*']
-        for pattern in timing_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            note.timing_advice.extend([m.strip() for m in matches if len(m.strip()) > 8])
+        # 择时建议（包含"时机"、"时候"等关键词的句子）
+        note.timing_advice = [m.strip() for m in hits['timing'] if len(m.strip()) > 8]
         
         return note
 
     def analyze_full_document(self, ocr_file: str) -> List[InvestmentNote]:
-        """分析完整OCR文档"""
+        """分析完整OCR文档，返回全部页的分析结果"""
+        return list(self.iter_full_document(ocr_file))
+
+    def iter_full_document(self, ocr_file: str, batch_size: int = PAGE_BATCH_SIZE) -> Iterator[InvestmentNote]:
+        """
+        按页序逐页产出分析结果，文档逐行读取、每次只持有一批页面
+        页面文字未变的直接取缓存，其余页在进程池中并行分析
+        """
         
         print(f"开始分析完整OCR文档: {ocr_file}")
         
-        with open(ocr_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        total = analyzed = 0
+        executor = None
+        try:
+            with open(ocr_file, 'r', encoding='utf-8') as f:
+                pages = self.iter_split_pages(f)
+                while True:
+                    batch = list(islice(pages, batch_size))
+                    if not batch:
+                        break
+                    
+                    notes = [None] * len(batch)
+                    pending = []
+                    for position, (page_num, filename, text) in enumerate(batch):
+                        cached = self.page_cache.get(self.page_cache_key(text), PAGE_CACHE_TIER) if self.page_cache else None
+                        if cached is not None:
+                            notes[position] = InvestmentNote(page_number=page_num, source_file=filename, raw_text=text, **cached)
+                        else:
+                            pending.append(position)
+                    
+                    # 页数较多时使用进程池（关键词匹配是CPU密集型），进程池在各批之间复用
+                    if len(pending) >= PARALLEL_MIN_PAGES and self.max_workers != 1:
+                        if executor is None:
+                            executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_page_worker)
+                        results = executor.map(_analyze_page_in_worker, [batch[position] for position in pending], chunksize=4)
+                    else:
+                        results = (self.analyze_page(*batch[position]) for position in pending)
+                    
+                    for position, note in zip(pending, results):
+                        notes[position] = note
+                        if self.page_cache is not None:
+                            self.page_cache.put(self.page_cache_key(note.raw_text), self._cache_value(note), PAGE_CACHE_TIER)
+                        print(f"✓ 分析完成第{note.page_number}页: {note.source_file}")
+                    
+                    total += len(batch)
+                    analyzed += len(pending)
+                    yield from notes
+        finally:
+            if executor is not None:
+                executor.shutdown()
         
-        # 按页面分割
-        pages = re.split(r'## 第(\d+)页 - ([^\n]+)', content)
+        print(f"共 {total} 页：重新分析 {analyzed} 页，复用缓存 {total - analyzed} 页")
+
+    def split_pages(self, content: str) -> List[Tuple[int, str, str]]:
+        """按页面分割OCR文档，返回 (页码, 文件名, 清理后的文字)，跳过没有文字的页"""
+        return list(self.iter_split_pages(io.StringIO(content)))
+
+    def iter_split_pages(self, lines: Iterable[str]) -> Iterator[Tuple[int, str, str]]:
+        """逐行读取OCR文档（可直接传入打开的文件），每读完一页产出一次，不需要整篇载入内存"""
+        header = None
+        body = []
         
-        notes = []
+        for line in lines:
+            position = 0
+            for match in PAGE_HEADER_PATTERN.finditer(line):
+                body.append(line[position:match.start()])
+                if header is not None:
+                    page = self._clean_page(header, body)
+                    if page:
+                        yield page
+                header = (int(match.group(1)), match.group(2).strip())
+                body = []
+                position = match.end()
+            # 第一个页头之前是文档头部信息，跳过
+            if header is not None:
+                body.append(line[position:])
         
-        # 处理每一页（跳过头部信息）
-        for i in range(1, len(pages), 3):  # 每3个元素组成一页：页码、文件名、内容
-            if i+2 < len(pages):
-                page_num = int(pages[i])
-                filename = pages[i+1].strip()
-                text = pages[i+2].strip()
-                
-                # 清理内容，只保留实际文字
-                lines = text.split('\n')
-                clean_lines = []
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('#') and not line.startswith('-') and not line.startswith('识别方法'):
-                        clean_lines.append(line)
-                
-                clean_text = '\n'.join(clean_lines)
-                
-                if clean_text:
-                    note = self.analyze_page(page_num, filename, clean_text)
-                    notes.append(note)
-                    print(f"✓ 分析完成第{page_num}页: {filename}")
+        if header is not None:
+            page = self._clean_page(header, body)
+            if page:
+                yield page
+
+    @staticmethod
+    def _clean_page(header: Tuple[int, str], body: List[str]) -> Optional[Tuple[int, str, str]]:
+        # 清理内容，只保留实际文字
+        clean_lines = []
+        for line in ''.join(body).strip().split('\n'):
+            line = line.strip()
+            if line and not line.startswith('#') and not line.startswith('-') and not line.startswith('识别方法'):
+                clean_lines.append(line)
         
-        return notes
+        clean_text = '\n'.join(clean_lines)
+        if not clean_text:
+            return None
+        return header[0], header[1], clean_text
+
+    def page_cache_key(self, text: str) -> str:
+        """分页缓存键：关键词配置 + 页面文字的哈希"""
+        return hashlib.sha256(f"{self.config_signature}\n{text}".encode('utf-8')).hexdigest()
 
-    def generate_structured_document(self, notes: List[InvestmentNote], output_file: str):
-        """生成结构化文档"""
+    @staticmethod
+    def _cache_value(note: InvestmentNote) -> Dict:
+        # 页码、文件名、原文在重组时填回，只缓存提取结果
+        value = asdict(note)
+        for field in ('page_number', 'source_file', 'raw_text'):
+            value.pop(field)
+        return value
+
+    def generate_structured_document(self, notes: Iterable[InvestmentNote], output_file: str) -> int:
+        """生成结构化文档（逐条写入，notes 可以是 iter_full_document 这样的生成器），返回页数"""
         
         print(f"生成完整结构化文档: {output_file}")
         
-        with open(output_file, 'w', encoding='utf-8') as f:
+        with StructuredDocumentWriter(output_file) as writer:
+            for note in notes:
+                writer.add(note)
+        
+        print(f"✓ 完整结构化文档生成完成: {output_file}")
+        return writer.page_count
+
+class StructuredDocumentWriter:
+    """
+    结构化文档的流式写出
+    分页详情和汇总条目在收到每页笔记时写入临时文件，统计数字来自累计的去重计数（只保存条目摘要），
+    内存占用不随页数增长；全部笔记收到后依次写出 头部、统计、汇总、分页详情
+    """
+    
+    # 统计项 (名称, 笔记字段)，按文档中的顺序
+    STAT_FIELDS = [
+        ('投资金句', 'key_quotes'), ('投资策略', 'investment_strategies'), ('投资观点', 'investment_views'),
+        ('择时建议', 'timing_advice'), ('提及股票', 'mentioned_stocks'), ('财务指标', 'financial_metrics'),
+        ('技术分析', 'technical_analysis'), ('风险提示', 'risk_warnings')
+    ]
+    
+    # 列出全部条目的汇总部分 (标题, 笔记字段)，条目按首次出现的顺序
+    SUMMARY_SECTIONS = [
+        ('## 💎 核心投资金句汇总', 'key_quotes'),
+        ('## 📈 投资策略汇总', 'investment_strategies'),
+        ('## 💭 核心投资观点', 'investment_views')
+    ]
+    
+    # 分页详情的各部分 (标题, 笔记字段)
+    DETAIL_SECTIONS = [
+        ('**🎯 投资金句**', 'key_quotes'),
+        ('**💭 投资观点**', 'investment_views'),
+        ('**📊 投资策略**', 'investment_strategies'),
+        ('**🏢 相关股票**', 'mentioned_stocks'),
+        ('**💰 财务指标**', 'financial_metrics'),
+        ('**📉 技术分析**', 'technical_analysis'),
+        ('**🌍 市场判断**', 'market_analysis'),
+        ('**⏰ 择时建议**', 'timing_advice'),
+        ('**⚠️ 风险提示**', 'risk_warnings')
+    ]
+    
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.page_count = 0
+        self._seen = {field: set() for _, field in self.STAT_FIELDS}
+        self._summaries = {field: spool() for _, field in self.SUMMARY_SECTIONS}
+        self._details = spool()
+
+    def __enter__(self) -> 'StructuredDocumentWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.finish()
+        finally:
+            self._discard()
+
+    def add(self, note: InvestmentNote):
+        """接收一页笔记"""
+        self.page_count += 1
+        
+        for field, seen in self._seen.items():
+            summary = self._summaries.get(field)
+            for item in getattr(note, field):
+                digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+                if digest not in seen:
+                    seen.add(digest)
+                    if summary is not None:
+                        summary.write(f"{len(seen)}. {item}\n\n")
+        
+        details = self._details
+        details.write(f"### 第{note.page_number}页 - {note.source_file}\n\n")
+        for title, field in self.DETAIL_SECTIONS:
+            items = getattr(note, field)
+            if items:
+                details.write(f"{title}\n")
+                for item in items:
+                    details.write(f"- {item}\n")
+                details.write("\n")
+        details.write("-" * 80 + "\n\n")
+
+    def finish(self):
+        """写出完整文档（先写临时文件再替换，中途出错不会留下半个文档）"""
+        temp_path = f"{self.output_file}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
             # 文档头部
             f.write("# 老刘投资笔记 - 完整文档2：结构化投资信息提取\n")
             f.write(f"# 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("# 说明：基于27页完整内容的结构化分析结果\n")
+            f.write(f"# 说明：基于{self.page_count}页完整内容的结构化分析结果\n")
             f.write("# 数据来源：多重OCR验证的最佳识别结果\n\n")
             f.write("=" * 80 + "\n\n")
             
             # 汇总统计
             f.write("## 📊 内容统计汇总\n\n")
+            f.write(f"- **总页数**: {self.page_count}\n")
+            for label, field in self.STAT_FIELDS:
+                f.write(f"- **{label}**: {len(self._seen[field])}\n")
+            f.write("\n")
             
-            all_quotes = []
-            all_strategies = []
-            all_stocks = []
-            all_financial = []
-            all_technical = []
-            all_risks = []
-            all_views = []
-            all_timing = []
-            
-            for note in notes:
-                all_quotes.extend(note.key_quotes)
-                all_strategies.extend(note.investment_strategies)
-                all_stocks.extend(note.mentioned_stocks)
-                all_financial.extend(note.financial_metrics)
-                all_technical.extend(note.technical_analysis)
-                all_risks.extend(note.risk_warnings)
-                all_views.extend(note.investment_views)
-                all_timing.extend(note.timing_advice)
-            
-            f.write(f"- **总页数**: {len(notes)}\n")
-            f.write(f"- **投资金句**: {len(set(all_quotes))}\n")
-            f.write(f"- **投资策略**: {len(set(all_strategies))}\n") 
-            f.write(f"- **投资观点**: {len(set(all_views))}\n")
-            f.write(f"- **择时建议**: {len(set(all_timing))}\n")
-            f.write(f"- **提及股票**: {len(set(all_stocks))}\n")
-            f.write(f"- **财务指标**: {len(set(all_financial))}\n")
-            f.write(f"- **技术分析**: {len(set(all_technical))}\n")
-            f.write(f"- **风险提示**: {len(set(all_risks))}\n\n")
-            
-            # 核心投资金句汇总
-            f.write("## 💎 核心投资金句汇总\n\n")
-            unique_quotes = list(set(all_quotes))
-            for i, quote in enumerate(unique_quotes, 1):
-                f.write(f"{i}. {quote}\n\n")
-            f.write("-" * 80 + "\n\n")
-            
-            # 投资策略汇总
-            f.write("## 📈 投资策略汇总\n\n")
-            unique_strategies = list(set(all_strategies))
-            for i, strategy in enumerate(unique_strategies, 1):
-                f.write(f"{i}. {strategy}\n\n")
-            f.write("-" * 80 + "\n\n")
-            
-            # 核心投资观点
-            f.write("## 💭 核心投资观点\n\n")
-            unique_views = list(set(all_views))
-            for i, view in enumerate(unique_views, 1):
-                f.write(f"{i}. {view}\n\n")
-            f.write("-" * 80 + "\n\n")
+            for title, field in self.SUMMARY_SECTIONS:
+                f.write(f"{title}\n\n")
+                append_spool(f, self._summaries[field])
+                f.write("-" * 80 + "\n\n")
             
             # 按页详细分析
             f.write("## 📄 分页详细分析\n\n")
-            
-            for note in notes:
-                f.write(f"### 第{note.page_number}页 - {note.source_file}\n\n")
-                
-                if note.key_quotes:
-                    f.write("**🎯 投资金句**\n")
-                    for quote in note.key_quotes:
-                        f.write(f"- {quote}\n")
-                    f.write("\n")
-                
-                if note.investment_views:
-                    f.write("**💭 投资观点**\n")
-                    for view in note.investment_views:
-                        f.write(f"- {view}\n")
-                    f.write("\n")
-                
-                if note.investment_strategies:
-                    f.write("**📊 投资策略**\n")
-                    for strategy in note.investment_strategies:
-                        f.write(f"- {strategy}\n")
-                    f.write("\n")
-                
-                if note.mentioned_stocks:
-                    f.write("**🏢 相关股票**\n")
-                    for stock in note.mentioned_stocks:
-                        f.write(f"- {stock}\n")
-                    f.write("\n")
-                
-                if note.financial_metrics:
-                    f.write("**💰 财务指标**\n")
-                    for metric in note.financial_metrics:
-                        f.write(f"- {metric}\n")
-                    f.write("\n")
-                
-                if note.technical_analysis:
-                    f.write("**📉 技术分析**\n")
-                    for tech in note.technical_analysis:
-                        f.write(f"- {tech}\n")
-                    f.write("\n")
-                
-                if note.market_analysis:
-                    f.write("**🌍 市场判断**\n")
-                    for market in note.market_analysis:
-                        f.write(f"- {market}\n")
-                    f.write("\n")
-                
-                if note.timing_advice:
-                    f.write("**⏰ 择时建议**\n")
-                    for timing in note.timing_advice:
-                        f.write(f"- {timing}\n")
-                    f.write("\n")
-                
-                if note.risk_warnings:
-                    f.write("**⚠️ 风险提示**\n")
-                    for risk in note.risk_warnings:
-                        f.write(f"- {risk}\n")
-                    f.write("\n")
-                
-                f.write("-" * 80 + "\n\n")
+            append_spool(f, self._details)
         
-        print(f"✓ 完整结构化文档生成完成: {output_file}")
+        os.replace(temp_path, self.output_file)
+
+    def _discard(self):
+        for spooled in self._summaries.values():
+            spooled.close()
+        self._details.close()
+
+_worker_analyzer = None
+
+def _init_page_worker():
+    # 每个分析进程只建一次分析器（关键词自动机），不使用缓存，缓存由主进程统一读写
+    global _worker_analyzer
+    _worker_analyzer = CompleteInvestmentAnalyzer(use_cache=False)
+
+def _analyze_page_in_worker(page: Tuple[int, str, str]) -> InvestmentNote:
+    return _worker_analyzer.analyze_page(*page)
 
 def main():
     """主函数"""
@@ -370,14 +458,12 @@ def main():
     analyzer = CompleteInvestmentAnalyzer()
     
     try:
-        # 分析OCR文档
-        notes = analyzer.analyze_full_document(OCR_FILE)
-        
-        # 生成结构化文档
-        analyzer.generate_structured_document(notes, OUTPUT_FILE)
+        # 边分析OCR文档边写结构化文档
+        notes = analyzer.iter_full_document(OCR_FILE)
+        page_count = analyzer.generate_structured_document(notes, OUTPUT_FILE)
         
         print(f"\n📋 完整处理统计:")
-        print(f"   - 分析页数: {len(notes)}")
+        print(f"   - 分析页数: {page_count}")
         print(f"   - 输出文档: {OUTPUT_FILE}")
         
     except FileNotFoundError as e:
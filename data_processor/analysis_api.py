@@ -1,14 +1,20 @@
 # 股票分析API服务
 from stock_analysis_engine import StockAnalysisEngine
+from analysis_runner import BatchAnalysisRunner
 import json
 from datetime import datetime
 import os
+from typing import Optional
 
 class StockAnalysisAPI:
     """为小程序提供股票分析数据的API服务"""
     
-    def __init__(self):
-        self.analyzer = StockAnalysisEngine()
+    def __init__(self, hedged_quotes: Optional[bool] = None):
+        """
+        Args:
+            hedged_quotes: 单股行情是否对冲请求，为None时读取环境变量 STOCK_HEDGED_QUOTES
+        """
+        self.analyzer = StockAnalysisEngine(hedged_quotes=hedged_quotes)
         self.output_dir = "analysis_results"
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
@@ -18,22 +24,25 @@ class StockAnalysisAPI:
         try:
             # 执行综合分析
             analysis_result = self.analyzer.comprehensive_analysis(stock_code, market)
-            
-            # 为小程序优化数据结构
-            optimized_result = self._optimize_for_miniprogram(analysis_result)
-            
-            # 保存到JSON文件
-            output_file = os.path.join(self.output_dir, f"{stock_code}_{market.lower()}.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(optimized_result, f, ensure_ascii=False, indent=2)
-            
-            print(f"分析 {stock_code} 分析数据生成成功: {output_file}")
-            return optimized_result
+            return self._save_analysis(stock_code, market, analysis_result)
             
         except Exception as e:
             print(f"分析 {stock_code} 失败: {e}")
             return self._generate_error_response(stock_code, str(e))
     
+    def _save_analysis(self, stock_code: str, market: str, analysis_result: dict) -> dict:
+        """优化数据结构后保存到JSON文件"""
+        # 为小程序优化数据结构
+        optimized_result = self._optimize_for_miniprogram(analysis_result)
+        
+        # 保存到JSON文件
+        output_file = os.path.join(self.output_dir, f"{stock_code}_{market.lower()}.json")
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(optimized_result, f, ensure_ascii=False, indent=2)
+        
+        print(f"分析 {stock_code} 分析数据生成成功: {output_file}")
+        return optimized_result
+    
     def _optimize_for_miniprogram(self, raw_data: dict) -> dict:
         """优化数据结构以适应小程序使用"""
         return {
@@ -110,6 +119,7 @@ class StockAnalysisAPI:
                 "data_sources": raw_data['data_sources'],
                 "version": raw_data['version'],
                 "cache_duration": 3600,  # 1小时缓存
+                "incomplete_stages": raw_data.get('incomplete_stages', []),  # 超时后使用回退数据的阶段
                 "searchable_content": self._generate_searchable_content(raw_data)
             }
         }
@@ -192,27 +202,46 @@ class StockAnalysisAPI:
             "analysis_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
     
-    def batch_analyze(self, stock_list: list) -> dict:
-        """批量分析股票"""
+    def batch_analyze(self, stock_list: list, limits: dict = None, stock_deadline: float = None) -> dict:
+        """
+        批量分析股票（各阶段按资源分别限流并发执行）
+        
+        Args:
+            stock_list: [{'code': 代码, 'market': 'A'/'HK'}]
+            limits: akshare/history/llm 的并发上限，默认见 analysis_runner.DEFAULT_LIMITS
+            stock_deadline: 单只股票的截止秒数，超时阶段使用回退数据
+        """
         results = {}
         success_count = 0
         
-        for stock_info in stock_list:
+        runner_options = {'limits': limits}
+        if stock_deadline is not None:
+            runner_options['stock_deadline'] = stock_deadline
+        
+        with BatchAnalysisRunner(self.analyzer, **runner_options) as runner:
+            outcomes = runner.run(stock_list)
+        
+        for stock_info, (analysis_result, error) in zip(stock_list, outcomes):
             stock_code = stock_info['code']
             market = stock_info.get('market', 'A')
             
             try:
-                result = self.analyze_single_stock(stock_code, market)
+                if error is not None:
+                    raise error
+                result = self._save_analysis(stock_code, market, analysis_result)
                 if not result.get('error'):
                     success_count += 1
                 results[stock_code] = result
             except Exception as e:
+                print(f"分析 {stock_code} 失败: {e}")
                 results[stock_code] = self._generate_error_response(stock_code, str(e))
         
         return {
             "total": len(stock_list),
             "success": success_count,
             "failed": len(stock_list) - success_count,
+            "partial": runner.stats['partial'],
+            "ai_cache": self.analyzer.get_analysis_cache_stats(),
             "results": results,
             "batch_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
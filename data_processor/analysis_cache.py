@@ -0,0 +1,71 @@
+# AI分析文本缓存 - 按归一化后的提示词输入计算内容哈希，输入基本不变时复用上次生成的分析
+import hashlib
+import json
+import math
+import os
+import re
+from typing import Dict
+from persistent_cache import PersistentCache, get_shared_cache
+
+ANALYSIS_CACHE_TIER = 'qwen_analysis'
+ANALYSIS_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'qwen_analysis.db')
+ANALYSIS_CACHE_TTL = {ANALYSIS_CACHE_TIER: 604800}  # 1周（按输入内容寻址，输入变化即换键）
+PRICE_BUCKET_RATIO = 0.03  # 价格按3%的对数区间分桶，日内小幅波动落在同一桶
+PROMPT_VERSION = 1         # 提示词模板变化时递增，使旧缓存失效
+
+_NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def _number(value, digits: int):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return round(value, digits) if math.isfinite(value) else None
+
+
+def _price_bucket(price) -> int:
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return 0
+    if not math.isfinite(price) or price <= 0:
+        return 0
+    return int(math.floor(math.log(price) / math.log(1 + PRICE_BUCKET_RATIO)))
+
+
+def _normalize_text(text: str) -> str:
+    """去掉要点中的具体数值（数值已按区间单独计入），只保留结论模板"""
+    return _NUMBER_PATTERN.sub('#', str(text))
+
+
+def normalize_analysis_inputs(stock_info: Dict, metrics: Dict, laoliu_eval: Dict, model: str) -> Dict:
+    """提取影响分析结论的提示词输入并归一化"""
+    return {
+        'version': PROMPT_VERSION,
+        'model': model,
+        'code': stock_info.get('code'),
+        'name': stock_info.get('name'),
+        'industry': stock_info.get('industry'),
+        'price_bucket': _price_bucket(stock_info.get('current_price')),
+        'pe': _number(stock_info.get('pe_ratio', 0), 0),
+        'pb': _number(stock_info.get('pb_ratio', 0), 1),
+        'roe': _number(metrics.get('roe'), 1),
+        'debt_ratio': _number(metrics.get('debt_ratio'), 2),
+        'revenue_growth': _number(metrics.get('revenue_growth'), 0),
+        'score': laoliu_eval.get('laoliu_score'),
+        'points': [_normalize_text(point) for point in laoliu_eval.get('analysis_points', [])[:3]],
+        'warnings': [_normalize_text(warning) for warning in laoliu_eval.get('risk_warnings', [])]
+    }
+
+
+def analysis_cache_key(stock_info: Dict, metrics: Dict, laoliu_eval: Dict, model: str) -> str:
+    """归一化输入的SHA-256"""
+    payload = json.dumps(normalize_analysis_inputs(stock_info, metrics, laoliu_eval, model),
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_analysis_cache(db_path: str = ANALYSIS_CACHE_PATH, max_entries: int = 20000) -> PersistentCache:
+    """AI分析文本使用独立的缓存文件，容量和命中统计与行情缓存分开"""
+    return get_shared_cache(db_path, max_entries=max_entries, ttl=ANALYSIS_CACHE_TTL)
@@ -0,0 +1,135 @@
+# 批量综合分析 - 行情/财务、日线库、LLM 三类资源分别限流，单只股票内各阶段并发，超时阶段回退后返回部分结果
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_LIMITS = {
+    'akshare': 4,   # 行情和财务数据（akshare 接口另有熔断限流）
+    'history': 4,   # 本地日线库及其增量下载
+    'llm': 4        # 通义千问接口
+}
+DEFAULT_STOCK_DEADLINE = 90.0  # 单只股票从开始分析到出结果的最长秒数
+
+
+class BatchAnalysisRunner:
+    """
+    并发执行 StockAnalysisEngine.comprehensive_analysis 的各阶段
+
+    每只股票：
+    - 基本信息+财务指标（akshare池，两者共用同一份个股详情缓存，顺序执行）与量价分析（history池）同时开始
+    - 基本信息和财务指标就绪后计算老刘评分，再提交AI分析（llm池）
+    - 任一阶段在截止时间前未完成或出错时使用引擎自身的回退数据，结果中记录 incomplete_stages
+    多只股票由外层线程池并发，三类资源的并发数互相独立
+    """
+
+    def __init__(self, engine, limits: Optional[Dict[str, int]] = None,
+                 max_stocks: Optional[int] = None, stock_deadline: float = DEFAULT_STOCK_DEADLINE):
+        """
+        Args:
+            engine: StockAnalysisEngine 实例（各线程共用）
+            limits: 各资源的并发上限，默认 DEFAULT_LIMITS
+            max_stocks: 同时处理的股票数，默认 akshare + llm 并发数之和，保证两条流水线都不空转
+            stock_deadline: 单只股票的截止秒数
+        """
+        self.engine = engine
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.max_stocks = max_stocks or self.limits['akshare'] + self.limits['llm']
+        self.stock_deadline = stock_deadline
+        self._pools = {
+            resource: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"analysis-{resource}")
+            for resource, limit in self.limits.items()
+        }
+        self._lock = threading.Lock()
+        self.stats = {'stocks': 0, 'partial': 0, 'timeouts': 0, 'errors': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """关闭各资源线程池（不等待已超时仍在运行的阶段）"""
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def analyze(self, stock_code: str, market: str = 'A') -> Dict:
+        """分析单只股票，结构同 comprehensive_analysis"""
+        engine = self.engine
+        deadline = time.monotonic() + self.stock_deadline
+        incomplete = []
+        print(f"开始分析股票: {stock_code} ({market})")
+
+        info_future = self._pools['akshare'].submit(self._fetch_info, stock_code, market)
+        volume_future = self._pools['history'].submit(engine.analyze_volume_price_relationship, stock_code)
+
+        basic_info, financial_metrics = self._stage_result(
+            info_future, deadline, 'basic_info', incomplete,
+            lambda: (engine._get_realistic_mock_data(stock_code, market),
+                     engine._get_realistic_financial_data(stock_code))
+        )
+        laoliu_evaluation = engine.calculate_laoliu_score(basic_info, financial_metrics)
+
+        ai_future = self._pools['llm'].submit(engine.generate_qwen_analysis, basic_info, financial_metrics, laoliu_evaluation)
+
+        volume_price_analysis = self._stage_result(
+            volume_future, deadline, 'volume_price', incomplete,
+            lambda: {'signal': '数据不足', 'description': '量价数据获取超时'}
+        )
+        ai_analysis = self._stage_result(
+            ai_future, deadline, 'ai_analysis', incomplete,
+            lambda: engine._fallback_analysis(basic_info, laoliu_evaluation)
+        )
+
+        result = engine.build_analysis_result(
+            basic_info, financial_metrics, laoliu_evaluation, volume_price_analysis, ai_analysis
+        )
+        with self._lock:
+            self.stats['stocks'] += 1
+            if incomplete:
+                self.stats['partial'] += 1
+        if incomplete:
+            result['incomplete_stages'] = incomplete
+
+        print(f"分析完成，综合评分: {result['comprehensive_score']}")
+        return result
+
+    def run(self, stock_list: List[Dict]) -> List[Tuple[Optional[Dict], Optional[Exception]]]:
+        """
+        批量分析
+
+        Args:
+            stock_list: [{'code': 代码, 'market': 'A'/'HK'}]
+
+        Returns:
+            与输入顺序一致的 (分析结果, 异常) 列表，成功时异常为None
+        """
+        def analyze_one(stock_info: Dict):
+            try:
+                return self.analyze(stock_info['code'], stock_info.get('market', 'A')), None
+            except Exception as e:
+                with self._lock:
+                    self.stats['errors'] += 1
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=self.max_stocks, thread_name_prefix="analysis-stock") as executor:
+            return list(executor.map(analyze_one, stock_list))
+
+    def _fetch_info(self, stock_code: str, market: str) -> Tuple[Dict, Dict]:
+        # 基本信息先行，财务指标随后命中同一份个股详情缓存；详情取自共享行情快照且不读日线库，日线只在history池中读取
+        return self.engine.get_stock_basic_info(stock_code, market), self.engine.get_financial_metrics(stock_code)
+
+    def _stage_result(self, future, deadline: float, stage: str, incomplete: List[str], fallback: Callable[[], Any]):
+        """在截止时间内取阶段结果，超时或出错时记录阶段并返回回退数据"""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeout:
+            future.cancel()
+            with self._lock:
+                self.stats['timeouts'] += 1
+            print(f"阶段 {stage} 超时，使用回退数据")
+        except Exception as e:
+            print(f"阶段 {stage} 失败: {e}")
+        incomplete.append(stage)
+        return fallback()
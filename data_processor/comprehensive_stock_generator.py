@@ -3,6 +3,7 @@ import json
 import random
 from datetime import datetime
 import pandas as pd
+from laoliu_scoring import CLASSIC_PROFILE, score_record
 
 class ComprehensiveStockGenerator:
     """基于真实数据模式生成完整股票数据库"""
@@ -140,35 +141,9 @@ class ComprehensiveStockGenerator:
     
     def calculate_laoliu_score(self, pe: float, pb: float, industry: str, change: float) -> int:
         """计算老刘评分"""
-        score = 50
-        
-        # PE评估
-        if 0 < pe <= 15:
-            score += 20
-        elif 15 < pe <= 25:
-            score += 10
-        elif pe > 30:
-            score -= 10
-        
-        # PB评估  
-        if 0 < pb <= 2:
-            score += 15
-        elif pb > 5:
-            score -= 10
-        
-        # 行业加权
-        if industry == "银行":
-            score += 15
-        elif industry in ["食品饮料", "医药"]:
-            score += 10
-        elif industry in ["科技", "电子"]:
-            score += 5
-        
-        # 逆向投资机会
-        if change < -5:
-            score += 5
-        
-        return max(0, min(100, score))
+        return score_record(
+            {'pe_ratio': pe, 'pb_ratio': pb, 'industry': industry, 'change_percent': change}, CLASSIC_PROFILE
+        )
     
     def get_investment_advice(self, score: int) -> str:
         if score >= 80:
@@ -57,7 +57,7 @@ class DataGenerator:
             
             # 6. 分析A股数据
             logger.info("分析A股数据...")
-            analyzed_a_stocks = self.analyzer.analyze_stocks(a_stocks, 'A')
+            analyzed_a_stocks = self.analyzer.analyze_table(a_stocks, 'A').to_records()  # 分页列表输出全部股票，每行都需要投资理由
             
             # 7. 生成A股推荐
             logger.info("生成A股推荐...")
@@ -66,7 +66,7 @@ class DataGenerator:
             
             # 8. 分析港股数据
             logger.info("分析港股数据...")
-            analyzed_hk_stocks = self.analyzer.analyze_stocks(hk_stocks, 'HK')
+            analyzed_hk_stocks = self.analyzer.analyze_table(hk_stocks, 'HK').to_records()  # 分页列表输出全部股票，每行都需要投资理由
             
             # 9. 生成港股推荐
             logger.info("生成港股推荐...")
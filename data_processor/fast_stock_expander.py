@@ -2,6 +2,7 @@
 import json
 import random
 from datetime import datetime
+from laoliu_scoring import EXPANDER_PROFILE, score_record
 
 # 中国知名公司和股票代码
 REAL_A_STOCKS = [
@@ -128,29 +129,9 @@ def generate_stock_data(stock_info):
 
 def calculate_laoliu_score(pe, pb, industry, change):
     """计算老刘评分"""
-    score = 50
-    
-    if 0 < pe <= 15:
-        score += 20
-    elif 15 < pe <= 25:
-        score += 10
-    elif pe > 30:
-        score -= 10
-    
-    if 0 < pb <= 2:
-        score += 15
-    elif pb > 5:
-        score -= 10
-    
-    if industry == "银行":
-        score += 15
-    elif industry in ["食品饮料", "医药"]:
-        score += 10
-    
-    if change < -5:
-        score += 5
-    
-    return max(0, min(100, score))
+    return score_record(
+        {'pe_ratio': pe, 'pb_ratio': pb, 'industry': industry, 'change_percent': change}, EXPANDER_PROFILE
+    )
 
 def get_investment_advice(score):
     if score >= 80:
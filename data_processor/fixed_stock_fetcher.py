@@ -4,12 +4,15 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
-import time
 from typing import Dict, List, Optional, Tuple
 import warnings
 import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
+from spot_data_converter import (A_SPOT_COLUMNS, HK_SPOT_COLUMNS, STANDARD_FIELDS,
+                                 normalize_spot_frame, spot_frame_to_records)
+from persistent_cache import CACHE_TTL, PersistentCache, get_shared_cache
+from provider_health import ProviderHealthRegistry, get_provider_registry
 warnings.filterwarnings('ignore')
 
 class FixedRealTimeStockFetcher:
@@ -18,10 +21,15 @@ class FixedRealTimeStockFetcher:
     解决API调用和网络问题
     """
     
-    def __init__(self):
+    def __init__(self, persistent_cache: Optional[PersistentCache] = None,
+                 health: Optional[ProviderHealthRegistry] = None):
         self.cache = {}
         self.cache_duration = 300  # 5分钟缓存
         self.retry_attempts = 2
+        # 跨进程运行共享的持久化缓存
+        self.persistent_cache = persistent_cache if persistent_cache is not None else get_shared_cache()
+        # 共享的数据源健康状态（熔断+限流）
+        self.health = health if health is not None else get_provider_registry()
         
         # 配置网络会话，解决连接问题
         self.session = requests.Session()
@@ -52,7 +60,7 @@ class FixedRealTimeStockFetcher:
             
             # 方法1：尝试使用 stock_zh_a_spot_em
             try:
-                stock_list = ak.stock_zh_a_spot_em()
+                stock_list = self._ak_call(ak.stock_zh_a_spot_em)
                 if not stock_list.empty:
                     print(f"方法1成功：获取到 {len(stock_list)} 只股票")
                     return self._process_stock_data(stock_list, 'A')
@@ -61,7 +69,7 @@ class FixedRealTimeStockFetcher:
             
             # 方法2：尝试使用 stock_info_a_code_name
             try:
-                stock_codes = ak.stock_info_a_code_name()
+                stock_codes = self._ak_call(ak.stock_info_a_code_name)
                 if not stock_codes.empty:
                     print(f"方法2：获取到 {len(stock_codes)} 只股票代码")
                     return self._batch_get_stock_details(stock_codes, 'A', max_count=500)
@@ -88,7 +96,7 @@ class FixedRealTimeStockFetcher:
             
             # 尝试获取港股数据
             try:
-                hk_list = ak.stock_hk_spot()
+                hk_list = self._ak_call(ak.stock_hk_spot)
                 if not hk_list.empty:
                     print(f"获取到 {len(hk_list)} 只港股")
                     return self._process_hk_data(hk_list)
@@ -104,41 +112,7 @@ class FixedRealTimeStockFetcher:
     
     def _process_stock_data(self, stock_list: pd.DataFrame, market: str) -> List[Dict]:
         """处理股票数据"""
-        formatted_stocks = []
-        
-        for _, row in stock_list.iterrows():
-            try:
-                # 根据不同的列名处理数据
-                code = str(row.get('代码', row.get('symbol', '')))
-                name = str(row.get('名称', row.get('name', '')))
-                price = float(row.get('最新价', row.get('current', row.get('price', 0))))
-                change_pct = float(row.get('涨跌幅', row.get('changepercent', 0)))
-                volume = int(row.get('成交量', row.get('volume', 0)))
-                
-                # 可选字段
-                pe_ratio = float(row.get('市盈率-动态', row.get('pe', 0)))
-                pb_ratio = float(row.get('市净率', row.get('pb', 0)))
-                market_cap = float(row.get('总市值', row.get('market_cap', 0)))
-                
-                if code and name and price > 0:
-                    stock_info = {
-                        'code': code,
-                        'name': name,
-                        'market': market,
-                        'current_price': price,
-                        'change_percent': change_pct,
-                        'volume': volume,
-                        'market_cap': market_cap,
-                        'pe_ratio': pe_ratio,
-                        'pb_ratio': pb_ratio,
-                        'turnover_rate': float(row.get('换手率', 0)),
-                        'amplitude': float(row.get('振幅', 0)),
-                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    formatted_stocks.append(stock_info)
-                    
-            except Exception as e:
-                continue
+        formatted_stocks = spot_frame_to_records(stock_list, A_SPOT_COLUMNS, market)
         
         # 更新缓存
         self._update_cache("all_a_stocks" if market == 'A' else "all_hk_stocks", formatted_stocks)
@@ -147,108 +121,86 @@ class FixedRealTimeStockFetcher:
     
     def _process_hk_data(self, hk_list: pd.DataFrame) -> List[Dict]:
         """处理港股数据"""
-        formatted_stocks = []
-        
-        for _, row in hk_list.iterrows():
-            try:
-                code = str(row.get('symbol', row.get('代码', '')))
-                name = str(row.get('name', row.get('名称', '')))
-                price = float(row.get('lasttrade', row.get('最新价', 0)))
-                change_pct = float(row.get('changepercent', row.get('涨跌幅', 0)))
-                volume = int(row.get('volume', row.get('成交量', 0)))
-                
-                if code and name and price > 0:
-                    stock_info = {
-                        'code': code,
-                        'name': name,
-                        'market': 'HK',
-                        'current_price': price,
-                        'change_percent': change_pct,
-                        'volume': volume,
-                        'market_cap': 0,
-                        'pe_ratio': 0,
-                        'pb_ratio': 0,
-                        'turnover_rate': 0,
-                        'amplitude': 0,
-                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    formatted_stocks.append(stock_info)
-                    
-            except Exception as e:
-                continue
+        formatted_stocks = spot_frame_to_records(hk_list, HK_SPOT_COLUMNS, 'HK')
         
         self._update_cache("all_hk_stocks", formatted_stocks)
         return formatted_stocks
     
     def _batch_get_stock_details(self, stock_codes: pd.DataFrame, market: str, max_count: int = 500) -> List[Dict]:
-        """批量获取股票详情"""
-        formatted_stocks = []
-        
+        """批量获取股票详情 - 整批只拉取一次行情快照，按代码合并"""
         # 限制获取数量避免超时
         codes_to_process = stock_codes.head(max_count)
+        code_col = 'code' if 'code' in codes_to_process.columns else 'symbol'
+        requested = pd.DataFrame({
+            'code': codes_to_process[code_col].astype(str),
+            'name': codes_to_process['name'].astype(str) if 'name' in codes_to_process.columns else ''
+        })
+        update_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        for _, row in codes_to_process.iterrows():
-            try:
-                code = str(row.get('code', row.get('symbol', '')))
-                name = str(row.get('name', ''))
-                
-                # 尝试获取实时价格
-                try:
-                    realtime = ak.stock_zh_a_spot_em()
-                    stock_data = realtime[realtime['代码'] == code]
-                    
-                    if not stock_data.empty:
-                        stock_row = stock_data.iloc[0]
-                        stock_info = {
-                            'code': code,
-                            'name': name,
-                            'market': market,
-                            'current_price': float(stock_row['最新价']),
-                            'change_percent': float(stock_row['涨跌幅']),
-                            'volume': int(stock_row['成交量']),
-                            'market_cap': float(stock_row.get('总市值', 0)),
-                            'pe_ratio': float(stock_row.get('市盈率-动态', 0)),
-                            'pb_ratio': float(stock_row.get('市净率', 0)),
-                            'turnover_rate': float(stock_row.get('换手率', 0)),
-                            'amplitude': float(stock_row.get('振幅', 0)),
-                            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
-                        formatted_stocks.append(stock_info)
-                except:
-                    # 如果无法获取实时数据，使用基础信息
-                    stock_info = {
-                        'code': code,
-                        'name': name,
-                        'market': market,
-                        'current_price': 10.0,  # 默认价格
-                        'change_percent': 0.0,
-                        'volume': 1000000,
-                        'market_cap': 1000000000,
-                        'pe_ratio': 15.0,
-                        'pb_ratio': 1.5,
-                        'turnover_rate': 2.0,
-                        'amplitude': 3.0,
-                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    formatted_stocks.append(stock_info)
-                
-                # 避免请求过快
-                time.sleep(0.1)
-                
-            except Exception as e:
-                continue
+        snapshot = self._get_spot_snapshot()
+        if snapshot is None:
+            # 如果无法获取实时数据，使用基础信息
+            defaults = {
+                'market': market,
+                'current_price': 10.0,  # 默认价格
+                'change_percent': 0.0,
+                'volume': 1000000,
+                'market_cap': 1000000000,
+                'pe_ratio': 15.0,
+                'pb_ratio': 1.5,
+                'turnover_rate': 2.0,
+                'amplitude': 3.0,
+                'update_time': update_time
+            }
+            formatted_stocks = [dict(record, **defaults) for record in requested.to_dict('records')]
+            print(f"批量获取完成(默认数据): {len(formatted_stocks)} 只股票")
+            return formatted_stocks
+        
+        # 一次向量化合并，只保留快照中存在的代码
+        merged = requested.join(snapshot, on='code', how='inner')
+        merged['market'] = market
+        merged['update_time'] = update_time
+        formatted_stocks = merged[STANDARD_FIELDS].to_dict('records')
         
         print(f"批量获取完成: {len(formatted_stocks)} 只股票")
         return formatted_stocks
     
+    def _get_spot_snapshot(self) -> Optional[pd.DataFrame]:
+        """获取A股行情快照（按代码索引），同一缓存周期内只下载一次"""
+        cache_key = "a_spot_snapshot"
+        
+        if self._is_cache_valid(cache_key, tier=None):
+            return self.cache[cache_key]['data']
+        
+        try:
+            realtime = self._ak_call(ak.stock_zh_a_spot_em)
+        except Exception as e:
+            print(f"获取行情快照失败: {e}")
+            return None
+        
+        if realtime is None or realtime.empty:
+            return None
+        
+        # 按代码合并时使用未过滤的快照，停牌或零价格的股票同样返回
+        snapshot = normalize_spot_frame(realtime, A_SPOT_COLUMNS, 'A', drop_invalid=False)
+        snapshot = snapshot.drop(columns=['name', 'market', 'update_time'])
+        snapshot = snapshot.drop_duplicates('code').set_index('code')
+        
+        self._update_cache(cache_key, snapshot, tier=None)
+        return snapshot
+    
     def get_stock_financial_metrics_fixed(self, stock_code: str) -> Dict:
         """修复版财务指标获取"""
+        cache_key = f"financial_{stock_code}"
+        if self._is_cache_valid(cache_key, tier='financial'):
+            return self.cache[cache_key]['data']
+        
         try:
             # 尝试不同的API方法获取财务数据
             methods_to_try = [
-                lambda: ak.stock_financial_analysis_indicator(symbol=stock_code),
-                lambda: ak.stock_zyjs_ths(symbol=stock_code),
-                lambda: ak.stock_financial_hk_analysis_indicator_ths(symbol=stock_code)
+                lambda: self._ak_call(ak.stock_financial_analysis_indicator, symbol=stock_code),
+                lambda: self._ak_call(ak.stock_zyjs_ths, symbol=stock_code),
+                lambda: self._ak_call(ak.stock_financial_hk_analysis_indicator_ths, symbol=stock_code)
             ]
             
             for method in methods_to_try:
@@ -256,7 +208,9 @@ class FixedRealTimeStockFetcher:
                     financial_data = method()
                     if not financial_data.empty:
                         latest = financial_data.iloc[0]
-                        return self._extract_financial_metrics(latest)
+                        metrics = self._extract_financial_metrics(latest)
+                        self._update_cache(cache_key, metrics, tier='financial')
+                        return metrics
                 except:
                     continue
             
@@ -444,20 +398,44 @@ class FixedRealTimeStockFetcher:
         
         return filtered_stocks[:50]
     
-    def _is_cache_valid(self, key: str) -> bool:
-        """检查缓存是否有效"""
-        if key not in self.cache:
-            return False
+    def _ak_call(self, func, *args, **kwargs):
+        """经过熔断和限流调用akshare接口（每个接口单独一个熔断器，KeyError、空表等数据错误不计入熔断）"""
+        return self.health.call(f"akshare.{func.__name__}", func, *args, **kwargs)
+    
+    def get_provider_status(self) -> Dict[str, Dict]:
+        """各数据源的熔断状态、当前限速和调用统计"""
+        return self.health.snapshot()
+    
+    def _is_cache_valid(self, key: str, tier: Optional[str] = 'quote') -> bool:
+        """检查缓存是否有效（内存未命中时查询持久化缓存）"""
+        now = datetime.now().timestamp()
+        if key in self.cache:
+            ttl = CACHE_TTL.get(tier, self.cache_duration)
+            if now - self.cache[key]['timestamp'] < ttl:
+                return True
         
-        cache_time = self.cache[key]['timestamp']
-        return (datetime.now().timestamp() - cache_time) < self.cache_duration
+        if tier is not None and self.persistent_cache is not None:
+            cached = self.persistent_cache.get(key, tier, with_created_at=True)
+            if cached is not None:
+                # 沿用持久化缓存中的写入时间，提升到内存后不会延长有效期
+                data, created_at = cached
+                self.cache[key] = {'data': data, 'timestamp': created_at}
+                return True
+        
+        return False
     
-    def _update_cache(self, key: str, data: any):
-        """更新缓存"""
+    def _update_cache(self, key: str, data: any, tier: Optional[str] = 'quote'):
+        """更新缓存，tier为None时只保存在内存中"""
         self.cache[key] = {
             'data': data,
             'timestamp': datetime.now().timestamp()
         }
+        
+        if tier is not None and self.persistent_cache is not None:
+            try:
+                self.persistent_cache.set(key, data, tier)
+            except Exception as e:
+                print(f"写入持久化缓存失败 {key}: {e}")
 
 if __name__ == "__main__":
     # 测试修复版数据获取
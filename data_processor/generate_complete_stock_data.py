@@ -6,6 +6,7 @@ import os
 from datetime import datetime
 from typing import Dict, List
 import pandas as pd
+from stock_ranking import StockRanking
 
 class CompleteStockDataGenerator:
     """生成完整的股票数据，包括A股和港股所有股票"""
@@ -227,8 +228,7 @@ class CompleteStockDataGenerator:
     
     def _get_top_stocks(self, stocks: List[Dict], count: int) -> List[Dict]:
         """获取评分最高的股票"""
-        sorted_stocks = sorted(stocks, key=lambda x: x.get('laoliu_score', 0), reverse=True)
-        return sorted_stocks[:count]
+        return StockRanking(stocks, 'laoliu_score').top(count)
     
     def _calculate_average_pe(self, stocks: List[Dict]) -> float:
         """计算平均市盈率"""
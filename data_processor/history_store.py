@@ -0,0 +1,236 @@
+# 本地日线行情库 - SQLite存储OHLCV日线，增量追加，任意时间窗口从本地读取
+import os
+import sqlite3
+import threading
+import time
+import akshare as ak
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Optional
+from provider_health import ProviderHealthRegistry, get_provider_registry
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'history.db')
+
+# akshare日线列名 -> 库表列名
+BAR_COLUMNS = {
+    '开盘': 'open',
+    '收盘': 'close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '涨跌幅': 'change_percent',
+    '涨跌额': 'change_amount',
+    '换手率': 'turnover_rate'
+}
+
+_shared_stores = {}
+_shared_lock = threading.Lock()
+
+
+class HistoryStore:
+    """
+    本地日线行情库
+    每只股票只下载最后一根已存K线之后的数据（最后一根重新下载以覆盖盘中未完成的K线），
+    同步后在 sync_ttl 内的查询不再访问网络。返回的DataFrame与 ak.stock_zh_a_hist 列名一致。
+    前复权(qfq)等复权数据在除权除息后会整体变化：增量追加时核对已存K线的收盘价，不一致时自动清除并重新回填。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_HISTORY_PATH, sync_ttl: int = 6 * 3600,
+                 health: Optional[ProviderHealthRegistry] = None):
+        """
+        Args:
+            db_path: SQLite文件路径
+            sync_ttl: 同步有效期（秒），期内不重复请求增量数据
+            health: 数据源健康注册表，默认使用进程内共享实例
+        """
+        self.db_path = db_path
+        self.sync_ttl = sync_ttl
+        self.health = health if health is not None else get_provider_registry()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        bar_columns = ', '.join(f'{column} REAL' for column in BAR_COLUMNS.values())
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS daily_bars (symbol TEXT NOT NULL, adjust TEXT NOT NULL, '
+            f'date TEXT NOT NULL, {bar_columns}, PRIMARY KEY (symbol, adjust, date))'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS sync_state (symbol TEXT NOT NULL, adjust TEXT NOT NULL, '
+            'first_date TEXT, last_date TEXT, synced_at REAL, PRIMARY KEY (symbol, adjust))'
+        )
+        self._conn.commit()
+
+    def get_window(self, symbol: str, days: int = 30, adjust: str = '', refresh: bool = True) -> pd.DataFrame:
+        """
+        获取最近 days 个自然日的日线
+
+        Args:
+            symbol: A股代码
+            days: 自然日窗口
+            adjust: 复权方式，''/qfq/hfq
+            refresh: 是否按需增量同步，False时只读本地数据
+        """
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+
+        if refresh:
+            self.sync(symbol, start_date, end_date, adjust)
+
+        return self._read_bars(symbol, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), adjust)
+
+    def sync(self, symbol: str, start_date: datetime, end_date: datetime, adjust: str = ''):
+        """补齐窗口起点之前缺失的数据，并追加最后一根K线之后的数据"""
+        state = self._get_sync_state(symbol, adjust)
+        start_str = start_date.strftime('%Y-%m-%d')
+
+        if state is None:
+            self._download(symbol, start_date, end_date, adjust)
+            return
+
+        first_date, last_date, synced_at = state
+
+        # 窗口早于已覆盖范围时回填前段
+        if start_str < first_date:
+            backfill_end = datetime.strptime(first_date, '%Y-%m-%d') - timedelta(days=1)
+            self._download(symbol, start_date, backfill_end, adjust)
+
+        # 增量追加：从上次同步时已收盘的最后一根K线开始重新下载，用它核对复权基准
+        if time.time() - (synced_at or 0) >= self.sync_ttl:
+            check_date = self._last_settled_date(symbol, adjust, synced_at)
+            append_from = check_date or last_date
+            append_start = datetime.strptime(append_from, '%Y-%m-%d') if append_from else start_date
+            history = self._fetch(symbol, append_start, end_date, adjust)
+            if history is None:
+                return
+
+            if adjust and check_date and self._adjust_changed(symbol, adjust, check_date, history):
+                # 除权除息后复权价整体变化，新旧基准的K线不能拼接，清除后整段重新回填
+                print(f"{symbol} {adjust}复权基准已变化，重新回填日线")
+                self.invalidate(symbol, adjust)
+                self._download(symbol, min(start_date, datetime.strptime(first_date, '%Y-%m-%d')), end_date, adjust)
+                return
+
+            self._write_bars(symbol, adjust, history, append_start.strftime('%Y-%m-%d'))
+
+    def invalidate(self, symbol: str, adjust: Optional[str] = None):
+        """删除某只股票的本地数据（复权数据变化后重新回填）"""
+        with self._lock:
+            if adjust is None:
+                self._conn.execute('DELETE FROM daily_bars WHERE symbol = ?', (symbol,))
+                self._conn.execute('DELETE FROM sync_state WHERE symbol = ?', (symbol,))
+            else:
+                self._conn.execute('DELETE FROM daily_bars WHERE symbol = ? AND adjust = ?', (symbol, adjust))
+                self._conn.execute('DELETE FROM sync_state WHERE symbol = ? AND adjust = ?', (symbol, adjust))
+            self._conn.commit()
+
+    def _download(self, symbol: str, start_date: datetime, end_date: datetime, adjust: str):
+        """从akshare下载区间日线并写入本地库"""
+        history = self._fetch(symbol, start_date, end_date, adjust)
+        if history is not None:
+            self._write_bars(symbol, adjust, history, start_date.strftime('%Y-%m-%d'))
+
+    def _fetch(self, symbol: str, start_date: datetime, end_date: datetime, adjust: str) -> Optional[pd.DataFrame]:
+        """从akshare下载区间日线，失败时返回None"""
+        try:
+            return self.health.call(
+                'akshare.stock_zh_a_hist', ak.stock_zh_a_hist,
+                symbol=symbol,
+                start_date=start_date.strftime('%Y%m%d'),
+                end_date=end_date.strftime('%Y%m%d'),
+                adjust=adjust
+            )
+        except Exception as e:
+            print(f"下载 {symbol} 日线失败: {e}")
+            return None
+
+    def _last_settled_date(self, symbol: str, adjust: str, synced_at: Optional[float]) -> Optional[str]:
+        """上次同步时已经收盘的最后一根K线日期（同步当天的K线可能是盘中数据，不能用来核对）"""
+        synced_day = datetime.fromtimestamp(synced_at or 0).strftime('%Y-%m-%d')
+        with self._lock:
+            return self._conn.execute(
+                'SELECT MAX(date) FROM daily_bars WHERE symbol = ? AND adjust = ? AND date < ?',
+                (symbol, adjust, synced_day)
+            ).fetchone()[0]
+
+    def _adjust_changed(self, symbol: str, adjust: str, check_date: str, history: pd.DataFrame) -> bool:
+        """重新下载的 check_date 收盘价与本地不一致，说明复权基准已变化"""
+        if history is None or history.empty or '收盘' not in history.columns:
+            return False
+        dates = pd.to_datetime(history['日期']).dt.strftime('%Y-%m-%d')
+        fresh = pd.to_numeric(history['收盘'][dates == check_date], errors='coerce').dropna()
+        if fresh.empty:
+            return False
+        with self._lock:
+            stored = self._conn.execute(
+                'SELECT close FROM daily_bars WHERE symbol = ? AND adjust = ? AND date = ?',
+                (symbol, adjust, check_date)
+            ).fetchone()
+        if stored is None or stored[0] is None:
+            return False
+        return abs(float(fresh.iloc[0]) - stored[0]) > 1e-4 * max(1.0, abs(stored[0]))
+
+    def _write_bars(self, symbol: str, adjust: str, history: pd.DataFrame, covered_from: str):
+        """写入日线并更新同步状态，covered_from 记录已覆盖的最早日期（含非交易日）"""
+        now = time.time()
+        rows = []
+        if history is not None and not history.empty:
+            bars = pd.DataFrame({'date': pd.to_datetime(history['日期']).dt.strftime('%Y-%m-%d')})
+            for source, column in BAR_COLUMNS.items():
+                bars[column] = pd.to_numeric(history[source], errors='coerce').astype(float) if source in history.columns else None
+            rows = list(bars.itertuples(index=False, name=None))
+
+        columns = ', '.join(BAR_COLUMNS.values())
+        placeholders = ', '.join('?' for _ in BAR_COLUMNS)
+        with self._lock:
+            if rows:
+                self._conn.executemany(
+                    f'INSERT OR REPLACE INTO daily_bars (symbol, adjust, date, {columns}) '
+                    f'VALUES (?, ?, ?, {placeholders})',
+                    [(symbol, adjust) + row for row in rows]
+                )
+            last_date = self._conn.execute(
+                'SELECT MAX(date) FROM daily_bars WHERE symbol = ? AND adjust = ?', (symbol, adjust)
+            ).fetchone()[0]
+            previous = self._conn.execute(
+                'SELECT first_date FROM sync_state WHERE symbol = ? AND adjust = ?', (symbol, adjust)
+            ).fetchone()
+            first_date = min(covered_from, previous[0]) if previous and previous[0] else covered_from
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sync_state (symbol, adjust, first_date, last_date, synced_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (symbol, adjust, first_date, last_date, now)
+            )
+            self._conn.commit()
+
+    def _read_bars(self, symbol: str, start: str, end: str, adjust: str) -> pd.DataFrame:
+        columns = ', '.join(BAR_COLUMNS.values())
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT date, {columns} FROM daily_bars WHERE symbol = ? AND adjust = ? AND date BETWEEN ? AND ? '
+                f'ORDER BY date',
+                (symbol, adjust, start, end)
+            ).fetchall()
+
+        bars = pd.DataFrame(rows, columns=['日期'] + list(BAR_COLUMNS.keys()))
+        if not bars.empty:
+            bars.insert(1, '股票代码', symbol)
+        return bars
+
+    def _get_sync_state(self, symbol: str, adjust: str):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT first_date, last_date, synced_at FROM sync_state WHERE symbol = ? AND adjust = ?',
+                (symbol, adjust)
+            ).fetchone()
+
+
+def get_shared_history_store(db_path: str = DEFAULT_HISTORY_PATH) -> HistoryStore:
+    """获取进程内共享的日线行情库"""
+    with _shared_lock:
+        if db_path not in _shared_stores:
+            _shared_stores[db_path] = HistoryStore(db_path)
+        return _shared_stores[db_path]
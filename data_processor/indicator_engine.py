@@ -0,0 +1,150 @@
+# 批量技术指标引擎 - 对(股票数 × 交易日)二维数组一次性计算全部股票的MA/RSI/MACD/量能趋势
+import warnings
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Tuple
+
+MIN_HISTORY_DAYS = 20   # 少于该交易日数不计算指标（与单只计算保持一致）
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+
+NUMERIC_COLUMNS = ['ma5', 'ma10', 'ma20', 'rsi', 'macd', 'signal']
+INDICATOR_COLUMNS = NUMERIC_COLUMNS + ['volume_trend']
+
+
+def _ewm_weights(span: int, days: int) -> np.ndarray:
+    """EWM(adjust=True)权重矩阵，W[i, t] = (1 - alpha) ** (t - i)，i > t 时为0"""
+    decay = 1 - 2 / (span + 1)
+    lags = np.arange(days)[None, :] - np.arange(days)[:, None]
+    return np.where(lags >= 0, decay ** np.maximum(lags, 0), 0.0)
+
+
+def _ewm_mean(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    按行计算EWM均值序列，等价于 pd.Series.ewm(span=span).mean()
+    缺失值不计入加权，但仍占用衰减位置（ignore_na=False）
+    """
+    valid = ~np.isnan(values)
+    weights = _ewm_weights(span, values.shape[1])
+    numerator = np.where(valid, values, 0.0) @ weights
+    denominator = valid.astype(float) @ weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _tail_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """最后 window 个交易日的均值（窗口内有缺失值时为NaN，同 rolling(window).mean()）"""
+    if values.shape[1] < window:
+        return np.full(values.shape[0], np.nan)
+    return values[:, -window:].mean(axis=1)
+
+
+def calculate_indicators(closes: np.ndarray, volumes: np.ndarray,
+                         symbols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    批量计算最新一个交易日的技术指标
+
+    Args:
+        closes: 收盘价，形状 (股票数, 交易日数)，按日期升序右对齐，历史较短的股票左侧以NaN补齐
+        volumes: 成交量，形状同 closes
+        symbols: 股票代码，作为结果索引
+
+    Returns:
+        每只股票一行：ma5/ma10/ma20/rsi/macd/signal/volume_trend，以及有效交易日数 days；
+        交易日不足 MIN_HISTORY_DAYS 的股票指标为NaN、volume_trend为None
+    """
+    closes = np.asarray(closes, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    if closes.ndim != 2 or closes.shape != volumes.shape:
+        raise ValueError(f"closes 和 volumes 必须是相同形状的二维数组: {closes.shape} / {volumes.shape}")
+
+    n_symbols, n_days = closes.shape
+    index = pd.Index(symbols if symbols is not None else range(n_symbols), name='symbol')
+
+    # 有效长度 = 去掉左侧补齐部分后的交易日数
+    observed = ~np.isnan(closes)
+    first_valid = np.where(observed.any(axis=1), observed.argmax(axis=1), n_days)
+    days = n_days - first_valid
+    enough = days >= MIN_HISTORY_DAYS
+
+    # 移动平均线
+    ma5 = _tail_mean(closes, 5)
+    ma10 = _tail_mean(closes, 10)
+    ma20 = _tail_mean(closes, 20)
+
+    # RSI（14日简单均值，差分缺失时按0计入）
+    delta = np.diff(closes, axis=1)
+    gain = _tail_mean(np.where(delta > 0, delta, 0.0), RSI_WINDOW)
+    loss = _tail_mean(np.where(delta < 0, -delta, 0.0), RSI_WINDOW)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rsi = 100 - 100 / (1 + gain / loss)
+
+    # MACD
+    macd_line = _ewm_mean(closes, MACD_FAST) - _ewm_mean(closes, MACD_SLOW)
+    signal_line = _ewm_mean(macd_line, MACD_SIGNAL)
+
+    # 量能趋势：近5日均量对比前5日均量（均量跳过缺失值，同 Series.mean()）
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        recent_volume = np.nanmean(volumes[:, -5:], axis=1) if n_days else np.full(n_symbols, np.nan)
+        previous_volume = np.nanmean(volumes[:, -10:-5], axis=1) if n_days > 5 else np.full(n_symbols, np.nan)
+    volume_trend = np.select(
+        [recent_volume > previous_volume * 1.5, recent_volume < previous_volume * 0.5],
+        ['放量', '缩量'], default='正常'
+    ).astype(object)
+
+    table = pd.DataFrame({
+        'ma5': ma5,
+        'ma10': ma10,
+        'ma20': ma20,
+        'rsi': rsi,
+        'macd': macd_line[:, -1] if n_days else np.full(n_symbols, np.nan),
+        'signal': signal_line[:, -1] if n_days else np.full(n_symbols, np.nan),
+        'volume_trend': volume_trend,
+        'days': days
+    }, index=index)
+
+    table.loc[~enough, NUMERIC_COLUMNS] = np.nan
+    table.loc[~enough, 'volume_trend'] = None
+    return table
+
+
+def indicator_record(table: pd.DataFrame, symbol) -> Dict:
+    """取出单只股票的指标字典，格式同 _calculate_technical_indicators，数据不足时返回空字典"""
+    row = table.loc[symbol]
+    if row['days'] < MIN_HISTORY_DAYS:
+        return {}
+    record = {column: float(row[column]) for column in NUMERIC_COLUMNS}
+    record['volume_trend'] = row['volume_trend']
+    return record
+
+
+def stack_history(histories: Dict[str, pd.DataFrame], days: Optional[int] = None,
+                  close_column: str = '收盘', volume_column: str = '成交量') -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    将多只股票的日线DataFrame按右对齐堆叠为二维数组
+
+    Args:
+        histories: 股票代码 -> 日线DataFrame（按日期升序，列名同 ak.stock_zh_a_hist）
+        days: 保留最近的交易日数，默认取最长的历史长度
+
+    Returns:
+        (股票代码列表, 收盘价数组, 成交量数组)
+    """
+    symbols = list(histories.keys())
+    lengths = [len(df) for df in histories.values()]
+    width = days if days is not None else max(lengths, default=0)
+
+    closes = np.full((len(symbols), width), np.nan)
+    volumes = np.full((len(symbols), width), np.nan)
+    if width == 0:
+        return symbols, closes, volumes
+
+    for row, df in enumerate(histories.values()):
+        tail = df.tail(width)
+        if tail.empty:
+            continue
+        closes[row, width - len(tail):] = pd.to_numeric(tail[close_column], errors='coerce').to_numpy(dtype=float)
+        volumes[row, width - len(tail):] = pd.to_numeric(tail[volume_column], errors='coerce').to_numpy(dtype=float)
+
+    return symbols, closes, volumes
@@ -6,8 +6,11 @@
 """
 
 import random
-from typing import Dict, List, Any
+import numpy as np
+from typing import Dict, List, Any, Optional
 from datetime import datetime
+from laoliu_scoring import ANALYZER_PROFILE, INDUSTRY_WEIGHTS, score_record, score_records
+from stock_screener import DEFAULT_NUMERIC_FIELDS, StockScreener
 
 class LaoLiuAnalyzer:
     def __init__(self):
@@ -31,31 +34,24 @@ class LaoLiuAnalyzer:
         }
         
         # 行业权重评估（基于老刘偏好）
-        self.industry_weights = {
-            "银行": 1.2,  # 老刘重视银行股
-            "食品饮料": 1.15,  # 白酒等消费龙头
-            "医药": 1.1,  # 高ROE行业
-            "科技": 1.0,  # 跟热点但需谨慎
-            "新能源": 0.95,  # 高估值需谨慎
-            "房地产": 0.8,  # 政策敏感
-            "军工": 0.9,  # 题材性较强
-            "保险": 1.1,  # 价值投资标的
-            "互联网科技": 0.95,  # 港股估值合理
-            "电信运营": 1.1,  # 高分红稳定
-            "消费": 1.05,  # 长期价值
-            "基建": 0.85,  # 周期性强
-            "煤炭": 0.9,  # 周期底部
-            "钢铁": 0.85  # 产能过剩
-        }
+        self.industry_weights = INDUSTRY_WEIGHTS
         
         print("老刘投资策略分析器初始化完成")
     
-    def analyze_stock_laoliu_style(self, stock_data: Dict) -> Dict:
-        """基于老刘理念分析单只股票"""
+    def analyze_stocks_laoliu_style(self, stocks: List[Dict]) -> List[Dict]:
+        """批量分析：整列一次评分，再逐只生成分析要点"""
+        scores = score_records(stocks, ANALYZER_PROFILE)
+        return [self.analyze_stock_laoliu_style(stock, int(score)) for stock, score in zip(stocks, scores)]
+    
+    def analyze_stock_laoliu_style(self, stock_data: Dict, laoliu_score: Optional[int] = None) -> Dict:
+        """基于老刘理念分析单只股票，laoliu_score 为批量评分时已算好的分数"""
+        if laoliu_score is None:
+            laoliu_score = score_record(stock_data, ANALYZER_PROFILE)
+        
         analysis = {
             "code": stock_data.get("code"),
             "name": stock_data.get("name"),
-            "laoliu_score": 0,
+            "laoliu_score": laoliu_score,
             "analysis_points": [],
             "risk_warnings": [],
             "investment_advice": "",
@@ -69,26 +65,21 @@ class LaoLiuAnalyzer:
         pb_ratio = stock_data.get("pb_ratio", 2)
         
         if roe >= 15:
-            analysis["laoliu_score"] += 25
             analysis["analysis_points"].append(f"ROE达{roe}%，盈利能力强")
         elif roe >= 10:
-            analysis["laoliu_score"] += 15
             analysis["analysis_points"].append(f"ROE为{roe}%，盈利能力较好")
         else:
             analysis["risk_warnings"].append(f"ROE仅{roe}%，盈利能力一般")
         
         # 2. 估值分析
         if pe_ratio <= 15:
-            analysis["laoliu_score"] += 20
             analysis["analysis_points"].append(f"PE仅{pe_ratio}倍，估值偏低")
         elif pe_ratio <= 25:
-            analysis["laoliu_score"] += 10
             analysis["analysis_points"].append(f"PE为{pe_ratio}倍，估值合理")
         else:
             analysis["risk_warnings"].append(f"PE高达{pe_ratio}倍，估值偏高")
         
         if pb_ratio <= 2:
-            analysis["laoliu_score"] += 15
             analysis["analysis_points"].append(f"PB仅{pb_ratio}倍，账面价值安全")
         elif pb_ratio > 5:
             analysis["risk_warnings"].append(f"PB达{pb_ratio}倍，市净率偏高")
@@ -96,7 +87,6 @@ class LaoLiuAnalyzer:
         # 3. 行业权重调整
         industry = stock_data.get("industry", "其他")
         industry_weight = self.industry_weights.get(industry, 1.0)
-        analysis["laoliu_score"] = int(analysis["laoliu_score"] * industry_weight)
         
         if industry_weight > 1.0:
             analysis["analysis_points"].append(f"{industry}行业符合老刘投资偏好")
@@ -113,7 +103,6 @@ class LaoLiuAnalyzer:
         if change_percent < -5 and pe_ratio < 20 and roe > 10:
             analysis["contrarian_opportunity"] = True
             analysis["analysis_points"].append("符合'人弃我取'逆向投资机会")
-            analysis["laoliu_score"] += 10
         
         # 6. 投资建议生成
         if analysis["laoliu_score"] >= 80:
@@ -151,27 +140,44 @@ class LaoLiuAnalyzer:
         else:
             return "量价关系正常"
     
+    def build_screener(self, stocks: List[Dict]) -> StockScreener:
+        """
+        为一份股票快照建立筛选引擎（含整列计算的老刘评分列），同一快照的多次筛选共用
+        缺失的 roe / pe_ratio 按 0 / 100 处理，与逐只筛选时的默认值一致
+        """
+        numeric_fields = dict(DEFAULT_NUMERIC_FIELDS, roe=0, pe_ratio=100)
+        screener = StockScreener(stocks, numeric_fields=numeric_fields)
+        screener.add_column("laoliu_score", score_records(stocks, ANALYZER_PROFILE))
+        return screener
+    
     def screen_stocks_by_laoliu_criteria(self, stocks: List[Dict], 
                                          min_roe: float = 8, 
                                          max_pe: float = 30,
-                                         min_score: int = 50) -> List[Dict]:
-        """按老刘标准筛选股票"""
-        qualified_stocks = []
+                                         min_score: int = 50,
+                                         screener: Optional[StockScreener] = None) -> List[Dict]:
+        """
+        按老刘标准筛选股票：用筛选引擎求交集，只对入选股票生成分析要点
+        
+        Args:
+            screener: build_screener(stocks) 建立的筛选引擎，为None时临时建立
+        """
+        if screener is None:
+            screener = self.build_screener(stocks)
+        scores = screener.column("laoliu_score")
+        
+        # 基础筛选条件
+        mask = screener.screen(ranges={
+            "roe": {"ge": min_roe},
+            "pe_ratio": {"le": max_pe},
+            "laoliu_score": {"ge": min_score}
+        })
         
-        for stock in stocks:
-            analysis = self.analyze_stock_laoliu_style(stock)
-            
-            # 基础筛选条件
-            roe = stock.get("roe", 0)
-            pe_ratio = stock.get("pe_ratio", 100)
-            
-            if (roe >= min_roe and 
-                pe_ratio <= max_pe and 
-                analysis["laoliu_score"] >= min_score):
-                
-                # 合并分析结果到股票数据
-                enhanced_stock = {**stock, **analysis}
-                qualified_stocks.append(enhanced_stock)
+        qualified_stocks = []
+        for position in np.flatnonzero(mask):
+            stock = stocks[position]
+            analysis = self.analyze_stock_laoliu_style(stock, int(scores[position]))
+            # 合并分析结果到股票数据
+            qualified_stocks.append({**stock, **analysis})
         
         # 按老刘评分排序
         qualified_stocks.sort(key=lambda x: x["laoliu_score"], reverse=True)
@@ -0,0 +1,254 @@
+# 老刘评分内核 - 各生成器的评分规则以声明式配置表示，整列数组一次完成评分
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional, Sequence
+
+# 评分列 -> 股票记录字段
+RECORD_FIELDS = {
+    'pe': 'pe_ratio',
+    'pb': 'pb_ratio',
+    'roe': 'roe',
+    'change': 'change_percent',
+    'market_cap': 'market_cap',
+    'debt_ratio': 'debt_ratio',
+    'industry': 'industry'
+}
+
+_COMPARATORS = {
+    'gt': np.greater,
+    'ge': np.greater_equal,
+    'lt': np.less,
+    'le': np.less_equal
+}
+
+# 老刘偏好行业（关键词匹配），StockAnalysisEngine 共用
+PREFERRED_INDUSTRIES = {
+    '银行': {'weight': 1.2, 'keywords': ['银行', '金融']},
+    '食品饮料': {'weight': 1.15, 'keywords': ['食品', '饮料', '白酒', '乳制品']},
+    '医药': {'weight': 1.1, 'keywords': ['医药', '生物', '医疗']},
+    '保险': {'weight': 1.1, 'keywords': ['保险', '人寿']},
+    '公用事业': {'weight': 1.05, 'keywords': ['电力', '水务', '燃气']}
+}
+
+# 行业权重（按行业名精确匹配后乘到评分上），LaoLiuAnalyzer 共用
+INDUSTRY_WEIGHTS = {
+    "银行": 1.2,  # 老刘重视银行股
+    "食品饮料": 1.15,  # 白酒等消费龙头
+    "医药": 1.1,  # 高ROE行业
+    "科技": 1.0,  # 跟热点但需谨慎
+    "新能源": 0.95,  # 高估值需谨慎
+    "房地产": 0.8,  # 政策敏感
+    "军工": 0.9,  # 题材性较强
+    "保险": 1.1,  # 价值投资标的
+    "互联网科技": 0.95,  # 港股估值合理
+    "电信运营": 1.1,  # 高分红稳定
+    "消费": 1.05,  # 长期价值
+    "基建": 0.85,  # 周期性强
+    "煤炭": 0.9,  # 周期底部
+    "钢铁": 0.85  # 产能过剩
+}
+
+# 评分配置说明：
+#   base      基础分
+#   defaults  字段缺失时的默认值
+#   bands     列 -> [(区间条件, 分值)]，按顺序取第一个命中的区间（同 if/elif）
+#   industry  match=exact/contains；points 为 [(行业或关键词列表, 加分)] 取第一个命中，
+#             weights 为 行业 -> 乘数（乘后取整）
+#   bonuses   [(条件列表, 加分)]，条件全部满足时加分
+#   clip      (下限, 上限)，None 表示不限制
+
+# 随机样本生成器（comprehensive_stock_generator）
+CLASSIC_PROFILE = {
+    'base': 50,
+    'defaults': {'pe': 0, 'pb': 0, 'industry': '', 'change': 0},
+    'bands': {
+        'pe': [({'gt': 0, 'le': 15}, 20), ({'gt': 15, 'le': 25}, 10), ({'gt': 30}, -10)],
+        'pb': [({'gt': 0, 'le': 2}, 15), ({'gt': 5}, -10)]
+    },
+    'industry': {
+        'match': 'exact',
+        'points': [(['银行'], 15), (['食品饮料', '医药'], 10), (['科技', '电子'], 5)]
+    },
+    'bonuses': [([('change', 'lt', -5)], 5)],
+    'clip': (0, 100)
+}
+
+# 快速扩展生成器（fast_stock_expander）：科技/电子不加分
+EXPANDER_PROFILE = dict(CLASSIC_PROFILE, industry={
+    'match': 'exact',
+    'points': [(['银行'], 15), (['食品饮料', '医药'], 10)]
+})
+
+# 实时数据简化评分（simple_data_generator / robust_data_generator）
+SIMPLE_PROFILE = {
+    'base': 50,
+    'defaults': {'pe': 15, 'pb': 1.5, 'industry': '', 'change': 0},
+    'bands': CLASSIC_PROFILE['bands'],
+    'industry': {
+        'match': 'contains',
+        'points': [(['银行'], 15), (['食品饮料'], 10), (['医药'], 8)]
+    },
+    'bonuses': [([('change', 'lt', -3)], 5)],
+    'clip': (0, 100)
+}
+
+# 快速完整生成器（quick_complete_generator）：医药不加分
+QUICK_COMPLETE_PROFILE = dict(SIMPLE_PROFILE, industry={
+    'match': 'contains',
+    'points': [(['银行'], 15), (['食品饮料'], 10)]
+})
+
+# 分析引擎快速评分（StockAnalysisEngine._calculate_quick_score）
+ENGINE_QUICK_PROFILE = {
+    'base': 50,
+    'defaults': {'pe': 0, 'pb': 0, 'industry': '', 'market_cap': 0},
+    'bands': {
+        'pe': [({'gt': 0, 'lt': 10}, 20), ({'ge': 10, 'lt': 15}, 15), ({'ge': 15, 'lt': 25}, 10), ({'ge': 50}, -15)],
+        'pb': [({'gt': 0, 'lt': 1.5}, 15), ({'ge': 1.5, 'lt': 3}, 10), ({'ge': 5}, -10)],
+        'market_cap': [({'gt': 100000000000}, 10), ({'gt': 50000000000}, 5)]  # >1000亿 / >500亿
+    },
+    'industry': {
+        'match': 'contains',
+        'points': [(config['keywords'], int((config['weight'] - 1) * 20)) for config in PREFERRED_INDUSTRIES.values()]
+    },
+    'bonuses': [],
+    'clip': (0, 100)
+}
+
+# 分析引擎综合评分（StockAnalysisEngine.calculate_laoliu_score）
+ENGINE_FULL_PROFILE = {
+    'base': 0,
+    'defaults': {'pe': 0, 'pb': 0, 'roe': 0, 'debt_ratio': 0, 'industry': '', 'change': 0},
+    'bands': {
+        'roe': [({'ge': 20}, 30), ({'ge': 15}, 25), ({'ge': 10}, 15)],
+        'pe': [({'gt': 0, 'le': 15}, 20), ({'gt': 15, 'le': 25}, 15)],
+        'pb': [({'gt': 0, 'le': 2}, 5)],
+        'debt_ratio': [({'lt': 0.3}, 20), ({'lt': 0.6}, 15)]
+    },
+    'industry': {
+        'match': 'contains',
+        'points': [(config['keywords'], min(15 * (config['weight'] - 1) + 15, 15))
+                   for config in PREFERRED_INDUSTRIES.values()]
+    },
+    'bonuses': [([('change', 'lt', -5), ('pb', 'lt', 2), ('roe', 'gt', 10)], 10)],  # 人弃我取
+    'clip': (None, 100)
+}
+
+# 老刘分析器（LaoLiuAnalyzer.analyze_stock_laoliu_style）：行业权重乘到基本面得分上
+ANALYZER_PROFILE = {
+    'base': 0,
+    'defaults': {'pe': 20, 'pb': 2, 'roe': 10, 'industry': '其他', 'change': 0},
+    'bands': {
+        'roe': [({'ge': 15}, 25), ({'ge': 10}, 15)],
+        'pe': [({'le': 15}, 20), ({'le': 25}, 10)],
+        'pb': [({'le': 2}, 15)]
+    },
+    'industry': {'match': 'exact', 'weights': INDUSTRY_WEIGHTS, 'default_weight': 1.0},
+    'bonuses': [([('change', 'lt', -5), ('pe', 'lt', 20), ('roe', 'gt', 10)], 10)],  # 人弃我取
+    'clip': (None, None)
+}
+
+
+def _band_condition(values: np.ndarray, band: Dict[str, float]) -> np.ndarray:
+    condition = np.ones(len(values), dtype=bool)
+    for op, bound in band.items():
+        condition &= _COMPARATORS[op](values, bound)
+    return condition
+
+
+def _industry_lookup(industry: str, rule: Dict) -> float:
+    """单个行业名的加分（或乘数），按行业去重后只计算一次"""
+    if 'weights' in rule:
+        return rule['weights'].get(industry, rule.get('default_weight', 1.0))
+    for names, points in rule['points']:
+        if rule['match'] == 'exact':
+            if industry in names:
+                return points
+        elif any(name in industry for name in names):
+            return points
+    return 0
+
+
+def _numeric_column(values: Any, default: float, size: int) -> np.ndarray:
+    if values is None:
+        return np.full(size, default, dtype=float)
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+
+
+def score_columns(columns: Dict[str, Any], profile: Dict, size: Optional[int] = None) -> np.ndarray:
+    """
+    按评分配置对整列数据评分
+
+    Args:
+        columns: 评分列 -> 数组（pe/pb/roe/change/market_cap/debt_ratio 为数值，industry 为行业名），
+                 缺失的列使用配置中的默认值，数值为NaN时不命中任何区间
+        profile: 评分配置
+        size: 股票数，默认取列长度
+
+    Returns:
+        整数评分数组
+    """
+    if size is None:
+        size = max((len(values) for values in columns.values() if values is not None), default=0)
+    defaults = profile.get('defaults', {})
+
+    numeric = {}
+    for column in set(profile['bands']) | {condition[0] for conditions, _ in profile['bonuses'] for condition in conditions}:
+        numeric[column] = _numeric_column(columns.get(column), defaults.get(column, 0), size)
+
+    score = np.full(size, float(profile['base']))
+
+    # 区间打分：np.select 取第一个命中的区间
+    for column, bands in profile['bands'].items():
+        values = numeric[column]
+        score += np.select([_band_condition(values, band) for band, _ in bands],
+                           [points for _, points in bands], default=0)
+
+    # 行业：行业名去重后查表，再按编号展开
+    rule = profile.get('industry')
+    if rule:
+        industries = columns.get('industry')
+        if industries is None:
+            industries = [defaults.get('industry', '')] * size
+        labels = pd.Series(industries, dtype=object).fillna(defaults.get('industry', '')).astype(str)
+        industry_ids, uniques = pd.factorize(labels)
+        table = np.array([_industry_lookup(industry, rule) for industry in uniques], dtype=float)
+        lookup = table[industry_ids] if size else np.zeros(0)
+        if 'weights' in rule:
+            score = np.trunc(score * lookup)
+        else:
+            score += lookup
+
+    # 组合条件加分
+    for conditions, points in profile['bonuses']:
+        matched = np.ones(size, dtype=bool)
+        for column, op, bound in conditions:
+            matched &= _COMPARATORS[op](numeric[column], bound)
+        score += np.where(matched, points, 0)
+
+    lower, upper = profile.get('clip', (None, None))
+    if lower is not None or upper is not None:
+        score = np.clip(score, lower, upper)
+
+    return score.astype(int)
+
+
+def score_records(records: Sequence[Dict], profile: Dict) -> np.ndarray:
+    """对股票记录列表评分（字段名见 RECORD_FIELDS，缺失字段取配置默认值，同 dict.get），一次数组计算"""
+    defaults = profile.get('defaults', {})
+    columns = {
+        column: [record.get(field, defaults.get(column, 0)) for record in records]
+        for column, field in RECORD_FIELDS.items()
+    }
+    return score_columns(columns, profile, size=len(records))
+
+
+def score_record(record: Dict, profile: Dict) -> int:
+    """单只股票评分"""
+    return int(score_records([record], profile)[0])
+
+
+def score_frame(df: pd.DataFrame, profile: Dict) -> np.ndarray:
+    """对标准股票记录DataFrame评分"""
+    columns = {column: df[field].to_numpy() for column, field in RECORD_FIELDS.items() if field in df.columns}
+    return score_columns(columns, profile, size=len(df))
@@ -0,0 +1,325 @@
+# 通义千问共享客户端 - 相同请求合并、按每分钟请求数/Token数调度、429/5xx抖动退避重试、按模型统计延迟分布
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://dashscope.aliyuncs.com"
+CHAT_COMPLETIONS_PATH = "/compatible-mode/v1/chat/completions"                   # OpenAI兼容接口（视觉/OCR模型）
+TEXT_GENERATION_PATH = "/api/v1/services/aigc/text-generation/generation"        # DashScope文本生成接口
+
+# 账号级配额（DashScope 控制台可查），按 API Key 共享
+DEFAULT_BUDGETS = {
+    'rpm': 60,       # 每分钟请求数
+    'tpm': 100000    # 每分钟Token数
+}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 120)  # 延迟分布桶上限（秒）
+IMAGE_TOKEN_ESTIMATE = 1200  # 每张图片的Token估算，响应带 usage 时以实际用量为准
+BUDGET_WINDOW = 60.0
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+class LLMError(Exception):
+    """接口返回错误或重试耗尽"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def chat_completion_text(result: Dict) -> str:
+    """OpenAI兼容接口响应中的文本"""
+    return result['choices'][0]['message']['content'].strip()
+
+
+def estimate_tokens(payload: Dict) -> int:
+    """按字符数粗略估算请求Token（中文约1字1 Token），加上最大输出长度"""
+    tokens = 0
+    messages = payload.get('messages') or payload.get('input', {}).get('messages', [])
+    for message in messages:
+        content = message.get('content', '')
+        parts = content if isinstance(content, list) else [{'type': 'text', 'text': content}]
+        for part in parts:
+            if part.get('type') == 'image_url':
+                tokens += IMAGE_TOKEN_ESTIMATE
+            else:
+                tokens += len(part.get('text', ''))
+    max_tokens = payload.get('max_tokens') or payload.get('parameters', {}).get('max_tokens', 0)
+    return tokens + int(max_tokens or 0)
+
+
+class _BudgetWindow:
+    """60秒滑动窗口内的请求数和Token数预算"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._entries = deque()  # [时间, Token数, 是否已移出窗口]
+        self._tokens = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> list:
+        """等待预算可用后占用，返回窗口条目（拿到实际用量后可修正）"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._entries and now - self._entries[0][0] >= BUDGET_WINDOW:
+                    expired = self._entries.popleft()
+                    expired[2] = True
+                    self._tokens -= expired[1]
+                # 单个请求超过整个Token预算时，只要窗口为空也放行
+                if len(self._entries) < self.rpm and (self._tokens + tokens <= self.tpm or not self._entries):
+                    entry = [now, tokens, False]
+                    self._entries.append(entry)
+                    self._tokens += tokens
+                    return entry
+                await asyncio.sleep(max(0.01, BUDGET_WINDOW - (now - self._entries[0][0])))
+
+    def settle(self, entry: list, tokens: int):
+        """用响应中的实际Token数修正占用（条目已移出窗口时不再修正，避免窗口总数漂移）"""
+        if entry[2]:
+            return
+        self._tokens += tokens - entry[1]
+        entry[1] = tokens
+
+
+class LLMClient:
+    """
+    共享LLM客户端
+    - acomplete()：异步接口；complete()：同步接口（提交到后台事件循环，多线程可同时调用）；submit()：可取消的同步提交
+    - 相同 (路径, 请求体) 的并发请求只发送一次，结果共享
+    - 发送前按 rpm/tpm 滑动窗口排队，429/5xx/连接错误按全抖动指数退避重试（优先遵循 Retry-After），读超时不重试
+    - 每次HTTP请求的耗时按模型计入延迟分布
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, rpm: int = DEFAULT_BUDGETS['rpm'],
+                 tpm: int = DEFAULT_BUDGETS['tpm'], max_retries: int = 3, backoff_base: float = 1.0,
+                 backoff_cap: float = 30.0, max_concurrency: int = 8):
+        """
+        Args:
+            api_key: DashScope API Key
+            base_url: 接口根地址，默认取环境变量 DASHSCOPE_BASE_URL，否则为 DEFAULT_BASE_URL（测试时指向本地假接口）
+            rpm / tpm: 每分钟请求数 / Token数预算
+            max_retries: 可重试错误的最大重试次数
+            backoff_base / backoff_cap: 退避时间的基数和上限（秒）
+            max_concurrency: 同时在途的HTTP请求数
+        """
+        self.api_key = api_key
+        self.base_url = (base_url or os.environ.get('DASHSCOPE_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        })
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-http")
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._budget = None
+        self._semaphore = None
+        self._inflight = {}
+
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'coalesced': 0, 'http_calls': 0, 'retries': 0, 'failures': 0}
+        self._latency = {}
+
+    # ---- 事件循环 ----
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """后台线程中的事件循环，首次同步调用时启动"""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _ensure_async_state(self):
+        # 预算窗口和信号量在后台事件循环中创建
+        if self._budget is None:
+            self._budget = _BudgetWindow(self.rpm, self.tpm)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    # ---- 对外接口 ----
+
+    def complete(self, path: str, payload: Dict, timeout: float = 120, max_retries: Optional[int] = None) -> Dict:
+        """同步调用，返回响应JSON；失败时抛出 LLMError"""
+        return self.submit(path, payload, timeout, max_retries).result()
+
+    def submit(self, path: str, payload: Dict, timeout: float = 120,
+               max_retries: Optional[int] = None) -> Future:
+        """
+        提交请求，立即返回 Future（result() 同 complete）
+        cancel() 后若没有其他调用方在等同一请求，请求本身也被取消：不再排队和重试，已发出的HTTP响应直接丢弃
+        """
+        return asyncio.run_coroutine_threadsafe(self._acomplete(path, payload, timeout, max_retries), self._get_loop())
+
+    async def acomplete(self, path: str, payload: Dict, timeout: float = 120,
+                        max_retries: Optional[int] = None) -> Dict:
+        """异步调用，相同请求在途时直接等待已有请求的结果"""
+        loop = self._get_loop()
+        if asyncio.get_running_loop() is not loop:
+            # 调度状态只存在于后台事件循环，其他事件循环中的调用转交过去
+            return await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(self._acomplete(path, payload, timeout, max_retries), loop)
+            )
+        return await self._acomplete(path, payload, timeout, max_retries)
+
+    async def _acomplete(self, path: str, payload: Dict, timeout: float, max_retries: Optional[int]) -> Dict:
+        self._ensure_async_state()
+        key = hashlib.sha256(
+            (path + json.dumps(payload, ensure_ascii=False, sort_keys=True)).encode('utf-8')
+        ).hexdigest()
+        self._count('requests')
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count('coalesced')
+        else:
+            inflight = {'task': asyncio.ensure_future(self._send(path, payload, timeout, max_retries)), 'waiters': 0}
+            self._inflight[key] = inflight
+            inflight['task'].add_done_callback(lambda _: self._release_inflight(key, inflight))
+        inflight['waiters'] += 1
+        try:
+            # shield：某个等待方被取消时不影响其他共享同一请求的调用方
+            return await asyncio.shield(inflight['task'])
+        finally:
+            inflight['waiters'] -= 1
+            if inflight['waiters'] == 0 and not inflight['task'].done():
+                # 所有等待方都已取消：取消请求本身，后续相同请求重新发送
+                self._release_inflight(key, inflight)
+                inflight['task'].cancel()
+
+    def _release_inflight(self, key: str, inflight: Dict):
+        if self._inflight.get(key) is inflight:
+            del self._inflight[key]
+
+    def get_latency_histograms(self) -> Dict[str, Dict]:
+        """各模型HTTP请求耗时分布：计数、均值、分桶计数（le 为桶上限，inf 为超出最大桶）"""
+        with self._stats_lock:
+            return {
+                model: {
+                    'count': data['count'],
+                    'mean': round(data['total'] / data['count'], 3) if data['count'] else 0.0,
+                    'max': round(data['max'], 3),
+                    'buckets': dict(data['buckets'])
+                }
+                for model, data in self._latency.items()
+            }
+
+    def get_stats(self) -> Dict:
+        """请求、合并、重试和失败次数"""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    # ---- 内部实现 ----
+
+    async def _send(self, path: str, payload: Dict, timeout: float, max_retries: Optional[int]) -> Dict:
+        retries = self.max_retries if max_retries is None else max_retries
+        model = payload.get('model', 'unknown')
+        url = f"{self.base_url}{path}"
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(retries + 1):
+            entry = await self._budget.acquire(estimate_tokens(payload))
+            retry_after = None
+            async with self._semaphore:
+                started = time.monotonic()
+                try:
+                    response = await loop.run_in_executor(
+                        self._executor, lambda: self.session.post(url, json=payload, timeout=timeout)
+                    )
+                    error = None
+                except requests.RequestException as e:
+                    response, error = None, e
+                self._record_latency(model, time.monotonic() - started)
+                self._count('http_calls')
+
+            if response is not None and response.status_code == 200:
+                try:
+                    result = response.json()
+                except ValueError as e:
+                    self._count('failures')
+                    raise LLMError(f"响应不是有效JSON: {e}; {response.text[:200]}", response.status_code)
+                usage = result.get('usage') or {}
+                total_tokens = usage.get('total_tokens') or (usage.get('input_tokens', 0) + usage.get('output_tokens', 0))
+                if total_tokens:
+                    self._budget.settle(entry, total_tokens)
+                return result
+
+            if response is not None:
+                message = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code not in RETRY_STATUS:
+                    self._count('failures')
+                    raise LLMError(message, response.status_code)
+                retry_after = response.headers.get('Retry-After')
+                status_code = response.status_code
+            else:
+                message = f"请求异常: {error}"
+                status_code = None
+                if not isinstance(error, requests.ConnectionError):
+                    # 读超时等：服务端可能仍在生成，重试只会让交互调用等待成倍延长，直接失败
+                    self._count('failures')
+                    raise LLMError(message)
+
+            if attempt == retries:
+                self._count('failures')
+                raise LLMError(f"重试{retries}次后仍失败，{message}", status_code)
+
+            self._count('retries')
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        """全抖动指数退避：[0, min(上限, 基数·2^attempt)] 内均匀取值"""
+        if retry_after is not None:
+            try:
+                return min(self.backoff_cap, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _record_latency(self, model: str, elapsed: float):
+        with self._stats_lock:
+            data = self._latency.setdefault(model, {
+                'count': 0, 'total': 0.0, 'max': 0.0,
+                'buckets': {**{bound: 0 for bound in LATENCY_BUCKETS}, 'inf': 0}
+            })
+            data['count'] += 1
+            data['total'] += elapsed
+            data['max'] = max(data['max'], elapsed)
+            bound = next((bound for bound in LATENCY_BUCKETS if elapsed <= bound), 'inf')
+            data['buckets'][bound] += 1
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+def get_shared_llm_client(api_key: str, base_url: Optional[str] = None, **options) -> LLMClient:
+    """获取进程内共享的客户端（同一 API Key 共用一份配额预算，options 只在首次创建时生效）"""
+    key = (api_key, base_url or os.environ.get('DASHSCOPE_BASE_URL') or DEFAULT_BASE_URL)
+    with _shared_lock:
+        if key not in _shared_clients:
+            _shared_clients[key] = LLMClient(api_key, base_url=base_url, **options)
+        return _shared_clients[key]
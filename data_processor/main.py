@@ -9,15 +9,23 @@ import json
 import datetime
 import os
 import sys
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 # 添加模块路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from stock_data_fetcher import StockDataFetcher
-from stock_analyzer import StockAnalyzer
+from stock_analyzer import AnalyzedTable, StockAnalyzer
 from rule_extractor import RuleExtractor
 from laoliu_analyzer import LaoLiuAnalyzer
+from stock_ranking import StockRanking
+from stock_screener import MINIPROGRAM_SCREENS, StockScreener, miniprogram_score
+
+
+def summary_score(stock: Dict) -> float:
+    """推荐和汇总使用的排名评分：优先老刘评分，否则用综合评分折算"""
+    return stock.get('laoliu_score', stock.get('total_score', 0) * 100)
+
 
 class DataGenerator:
     def __init__(self):
@@ -26,6 +34,7 @@ class DataGenerator:
         self.analyzer = StockAnalyzer()
         self.rule_extractor = RuleExtractor()
         self.laoliu_analyzer = LaoLiuAnalyzer()  # 新增老刘分析器
+        self.rankings = {}  # 市场 -> {'stocks': 推荐列表, 'ranking': 建立该列表的排名视图}
         
         # 输出目录
         self.output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static_data')
@@ -49,13 +58,16 @@ class DataGenerator:
             
             # 2. 分析股票（集成老刘理念）
             print("正在分析股票...")
-            analyzed_a_stocks = self.analyzer.analyze_stocks(a_stocks, market_type='A')
-            analyzed_hk_stocks = self.analyzer.analyze_stocks(hk_stocks, market_type='HK')
+            # 评分整列计算；投资理由只为最终输出的推荐股票生成
+            a_table = self.analyzer.analyze_table(a_stocks, market_type='A')
+            hk_table = self.analyzer.analyze_table(hk_stocks, market_type='HK')
+            analyzed_a_stocks = a_table.to_records(include_reason=False)
+            analyzed_hk_stocks = hk_table.to_records(include_reason=False)
             
             # 使用老刘分析器进行深度分析
             print("正在进行老刘风格分析...")
-            laoliu_a_analysis = [self.laoliu_analyzer.analyze_stock_laoliu_style(stock) for stock in analyzed_a_stocks]
-            laoliu_hk_analysis = [self.laoliu_analyzer.analyze_stock_laoliu_style(stock) for stock in analyzed_hk_stocks]
+            laoliu_a_analysis = self.laoliu_analyzer.analyze_stocks_laoliu_style(analyzed_a_stocks)
+            laoliu_hk_analysis = self.laoliu_analyzer.analyze_stocks_laoliu_style(analyzed_hk_stocks)
             
             # 合并分析结果
             for i, stock in enumerate(analyzed_a_stocks):
@@ -65,8 +77,11 @@ class DataGenerator:
             
             # 3. 生成推荐（基于老刘标准）
             print("正在生成推荐...")
-            a_recommendations = self.generate_laoliu_recommendations(analyzed_a_stocks, 'A')
-            hk_recommendations = self.generate_laoliu_recommendations(analyzed_hk_stocks, 'HK')
+            # 每个市场的快照只建立一次筛选引擎，推荐筛选和小程序快速筛选共用
+            a_screener = self.laoliu_analyzer.build_screener(analyzed_a_stocks)
+            hk_screener = self.laoliu_analyzer.build_screener(analyzed_hk_stocks)
+            a_recommendations = self.generate_laoliu_recommendations(analyzed_a_stocks, 'A', a_table, a_screener)
+            hk_recommendations = self.generate_laoliu_recommendations(analyzed_hk_stocks, 'HK', hk_table, hk_screener)
             
             # 4. 市场择时分析（融入老刘逆向思维）
             print("正在分析市场择时...")
@@ -108,18 +123,9 @@ class DataGenerator:
         hk_count = len(hk_stocks_list)
         total_count = a_count + hk_count
         
-        # 获取顶级推荐（前5只A股，前3只港股）
-        top_a_stocks = sorted(
-            a_stocks_list, 
-            key=lambda x: x.get('laoliu_score', x.get('total_score', 0) * 100), 
-            reverse=True
-        )[:5]
-        
-        top_hk_stocks = sorted(
-            hk_stocks_list, 
-            key=lambda x: x.get('laoliu_score', x.get('total_score', 0) * 100), 
-            reverse=True
-        )[:3]
+        # 获取顶级推荐（前5只A股，前3只港股），复用生成推荐时建立的排名视图
+        top_a_stocks = self._get_ranking('A', a_stocks_list).top(5)
+        top_hk_stocks = self._get_ranking('HK', hk_stocks_list).top(3)
         
         # 生成投资建议
         investment_suggestions = self.rule_extractor.generate_investment_suggestions(
@@ -191,17 +197,31 @@ class DataGenerator:
             }
         }
     
-    def generate_laoliu_recommendations(self, stocks: List[Dict], market_type: str) -> Dict:
-        """生成基于老刘理念的股票推荐"""
+    def generate_laoliu_recommendations(self, stocks: List[Dict], market_type: str,
+                                        table: Optional[AnalyzedTable] = None,
+                                        screener: Optional[StockScreener] = None) -> Dict:
+        """
+        生成基于老刘理念的股票推荐
+        
+        Args:
+            table: 分析结果表，只为入选的推荐股票生成投资理由
+            screener: 同一快照上已建立的筛选引擎，为None时临时建立
+        """
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if screener is None:
+            screener = self.laoliu_analyzer.build_screener(stocks)
         
         # 按老刘标准筛选股票
         qualified_stocks = self.laoliu_analyzer.screen_stocks_by_laoliu_criteria(
-            stocks, min_roe=8, max_pe=30, min_score=40
+            stocks, min_roe=8, max_pe=30, min_score=40, screener=screener
         )
         
-        # 取前20只作为推荐
-        top_stocks = qualified_stocks[:20]
+        # 取前20只作为推荐（排名视图保留给汇总使用）
+        ranking = StockRanking(qualified_stocks, summary_score)
+        top_stocks = ranking.top(20)
+        self.rankings[market_type] = {'stocks': top_stocks, 'ranking': ranking}
+        if table is not None:
+            table.add_reasons(top_stocks)
         
         return {
             "update_time": current_time,
@@ -213,9 +233,20 @@ class DataGenerator:
                 "focus": "高ROE + 低估值 + 量价配合",
                 "risk_control": "分批建仓，控制杠杆"
             },
-            "stocks": top_stocks
+            "stocks": top_stocks,
+            # 小程序快速筛选的服务端结果（按小程序评分降序的代码列表和分面计数）
+            "quick_screens": screener.precompute(
+                MINIPROGRAM_SCREENS, ranking=lambda selected: StockRanking(selected, miniprogram_score).sorted_stocks()
+            )
         }
     
+    def _get_ranking(self, market_type: str, stocks: List[Dict]) -> StockRanking:
+        """取生成这份推荐列表时建立的排名视图；列表不是最近一次生成的推荐（或没有记录）时按给定列表新建"""
+        entry = self.rankings.get(market_type)
+        if entry is not None and entry['stocks'] is stocks:
+            return entry['ranking']
+        return StockRanking(stocks, summary_score)
+    
     def generate_enhanced_timing_analysis(self, market_data: Dict, a_stocks: List[Dict], hk_stocks: List[Dict]) -> Dict:
         """生成增强的市场择时分析"""
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -6,6 +6,7 @@ from datetime import datetime
 from typing import Dict, List
 from stock_analysis_engine import StockAnalysisEngine
 from real_time_stock_fetcher import RealTimeStockFetcher
+from analysis_runner import BatchAnalysisRunner
 
 class MiniprogramDataSync:
     """
@@ -80,23 +81,20 @@ class MiniprogramDataSync:
         print("正在同步详细分析样本...")
         
         analysis_results = []
+        selected = codes[:limit]
         
-        for code in codes[:limit]:
-            try:
-                print(f"正在分析股票: {code}")
-                
-                # 获取完整分析
-                analysis = self.analysis_engine.comprehensive_analysis(code)
-                
-                if analysis:
-                    analysis_results.append(analysis)
-                    print(f"✓ {code} 分析完成")
-                else:
-                    print(f"✗ {code} 分析失败")
-                
-            except Exception as e:
-                print(f"分析股票 {code} 出错: {e}")
-                continue
+        # 获取完整分析（各股票、各阶段并发执行）
+        with BatchAnalysisRunner(self.analysis_engine) as runner:
+            outcomes = runner.run([{'code': code, 'market': 'A'} for code in selected])
+        
+        for code, (analysis, error) in zip(selected, outcomes):
+            if error is not None:
+                print(f"分析股票 {code} 出错: {error}")
+            elif analysis:
+                analysis_results.append(analysis)
+                print(f"✓ {code} 分析完成")
+            else:
+                print(f"✗ {code} 分析失败")
         
         return {
             "total_count": len(analysis_results),
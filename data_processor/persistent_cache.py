@@ -0,0 +1,155 @@
+# 持久化数据缓存 - SQLite存储，按数据类别设置不同有效期，多次运行之间共享
+import os
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# 行情缓存各类数据的有效期（秒），None表示永不过期；其他模块的缓存通过 ttl 参数传入自己的类别表
+CACHE_TTL: Dict[str, Optional[int]] = {
+    'quote': 300,        # 行情快照：5分钟
+    'financial': 86400,  # 财务指标：1天
+    'industry': 604800   # 行业信息：1周
+}
+DEFAULT_TTL = 300  # 类别表中未登记的类别按此有效期处理
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'stock_cache.db')
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+
+class PersistentCache:
+    """
+    持久化缓存
+    值以JSON保存，读取时按类别检查有效期，超出容量时先清理过期项再按最近访问时间淘汰
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_entries: int = 50000,
+                 ttl: Optional[Dict[str, Optional[int]]] = None):
+        """
+        Args:
+            db_path: SQLite文件路径
+            max_entries: 最大缓存条目数
+            ttl: 分类有效期表，默认为行情缓存的 CACHE_TTL；值为None的类别永不过期
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = dict(CACHE_TTL if ttl is None else ttl)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, tier TEXT NOT NULL, value TEXT NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)')
+        self._conn.commit()
+
+    def get(self, key: str, tier: str, with_created_at: bool = False) -> Optional[Any]:
+        """
+        读取缓存，过期或不存在时返回None
+
+        Args:
+            with_created_at: 为True时返回 (值, 写入时间戳)，供内存缓存沿用原始写入时间计算有效期
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM cache WHERE key = ?', (self._full_key(key, tier),)
+            ).fetchone()
+
+            if row is None or self._expired(tier, row[1], now):
+                self.misses += 1
+                return None
+
+            self._conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, self._full_key(key, tier)))
+            self._conn.commit()
+            self.hits += 1
+
+        value = json.loads(row[0])
+        return (value, row[1]) if with_created_at else value
+
+    def get_stale(self, key: str, tier: str) -> Optional[Any]:
+        """读取值而不检查有效期（上游失败时用过期但尚未淘汰的值兜底），不计入命中统计"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM cache WHERE key = ?', (self._full_key(key, tier),)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key: str, value: Any, tier: str):
+        """写入缓存（值必须可JSON序列化）"""
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, tier, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (self._full_key(key, tier), tier, payload, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def clear(self, tier: Optional[str] = None):
+        """清空缓存，可只清空某一类别"""
+        with self._lock:
+            if tier is None:
+                self._conn.execute('DELETE FROM cache')
+            else:
+                self._conn.execute('DELETE FROM cache WHERE tier = ?', (tier,))
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries
+        }
+
+    def _evict(self, now: float):
+        """超出容量时淘汰：先删过期项，再删最久未访问的项"""
+        count = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self.max_entries:
+            return
+
+        for tier, ttl in self.ttl.items():
+            if ttl is None:
+                continue
+            self._conn.execute('DELETE FROM cache WHERE tier = ? AND created_at <= ?', (tier, now - ttl))
+
+        count = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)', (overflow,)
+            )
+
+    def _expired(self, tier: str, created_at: float, now: float) -> bool:
+        ttl = self.ttl.get(tier, DEFAULT_TTL)
+        return ttl is not None and now - created_at >= ttl
+
+    @staticmethod
+    def _full_key(key: str, tier: str) -> str:
+        return f'{tier}:{key}'
+
+
+def get_shared_cache(db_path: str = DEFAULT_CACHE_PATH, max_entries: int = 50000,
+                     ttl: Optional[Dict[str, Optional[int]]] = None) -> PersistentCache:
+    """获取进程内共享的持久化缓存实例（max_entries、ttl 只在首次创建时生效）"""
+    with _shared_lock:
+        if db_path not in _shared_caches:
+            _shared_caches[db_path] = PersistentCache(db_path, max_entries=max_entries, ttl=ttl)
+        return _shared_caches[db_path]
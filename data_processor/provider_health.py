@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据源健康管理 - 熔断器 + 自适应令牌桶限流
+所有数据获取器共用，数据源故障时直接跳过，避免每只股票都等待超时
+只有网络、HTTP和超时错误计入熔断；数据错误（缺列、空表等）说明数据源有响应，直接抛给调用方
+"""
+
+import http.client
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+# 各数据源默认每秒请求数
+DEFAULT_PROVIDER_RATES = {
+    'sina': 20.0,
+    'tencent': 20.0,
+    'eastmoney': 10.0
+}
+DEFAULT_RATE = 5.0
+
+
+def _percentile(samples, percentile: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(percentile * len(samples)))]
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """是否为网络/HTTP/超时类错误（计入熔断），其余异常视为数据错误"""
+    return isinstance(error, (requests.exceptions.RequestException, http.client.HTTPException,
+                              ConnectionError, TimeoutError))
+
+
+class ProviderUnavailableError(Exception):
+    """数据源熔断中，调用被直接拒绝"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    连续失败达到阈值后打开，冷却期后进入半开状态放行一次试探请求，成功则关闭
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """是否放行本次请求（半开状态只放行一个试探请求）"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.time() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def is_open(self) -> bool:
+        """熔断中且尚未到冷却时间"""
+        with self._lock:
+            return self.state == self.OPEN and time.time() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """只释放半开试探名额，不改变状态和连续失败计数（数据源有响应但数据有误时使用）"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应令牌桶
+    遇到429时速率减半，响应变慢时降速，正常响应时逐步恢复到上限
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: float = 0.5,
+                 slow_threshold: float = 3.0):
+        """
+        Args:
+            rate: 初始（也是最大）每秒请求数
+            capacity: 桶容量，默认等于rate
+            min_rate: 最低速率
+            slow_threshold: 超过该耗时（秒）视为慢响应
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.slow_threshold = slow_threshold
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，不足时等待"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self, latency: float):
+        with self._lock:
+            if latency > self.slow_threshold:
+                self.rate = max(self.min_rate, self.rate * 0.8)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.5)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class ProviderHealth:
+    """单个数据源的熔断器、限流器和调用统计"""
+
+    def __init__(self, name: str, rate: float, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.limiter = AdaptiveRateLimiter(rate)
+        self.successes = 0
+        self.failures = 0
+        self.throttled = 0
+        self.skipped = 0
+        self.data_errors = 0
+        self.total_latency = 0.0
+        self.latencies = deque(maxlen=200)  # 最近成功的单只请求耗时样本
+        self.batch_latencies = deque(maxlen=200)  # 批量请求（一次多只）耗时样本，单独统计，不影响对冲等待时间
+        self._lock = threading.Lock()
+
+    def latency_percentile(self, percentile: float, batch: bool = False) -> Optional[float]:
+        """最近成功请求耗时的分位数（秒），样本不足时返回None"""
+        with self._lock:
+            samples = list(self.batch_latencies if batch else self.latencies)
+        if len(samples) < 10:
+            return None
+        return _percentile(samples, percentile)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls = self.successes + self.failures
+            return {
+                'state': self.breaker.state,
+                'consecutive_failures': self.breaker.consecutive_failures,
+                'rate': round(self.limiter.rate, 2),
+                'successes': self.successes,
+                'failures': self.failures,
+                'throttled': self.throttled,
+                'skipped': self.skipped,
+                'data_errors': self.data_errors,
+                'avg_latency': round(self.total_latency / calls, 3) if calls else 0.0,
+                'p95_latency': round(_percentile(list(self.latencies), 0.95), 3) if self.latencies else 0.0,
+                'batch_p95_latency': round(_percentile(list(self.batch_latencies), 0.95), 3) if self.batch_latencies else 0.0
+            }
+
+
+class ProviderHealthRegistry:
+    """数据源健康注册表，按数据源名称管理状态"""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, failure_threshold: int = 3,
+                 reset_timeout: float = 30.0):
+        self.rates = dict(DEFAULT_PROVIDER_RATES, **(rates or {}))
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> ProviderHealth:
+        with self._lock:
+            if provider not in self._providers:
+                self._providers[provider] = ProviderHealth(
+                    provider, self.rates.get(provider, DEFAULT_RATE), self.failure_threshold, self.reset_timeout
+                )
+            return self._providers[provider]
+
+    def is_available(self, provider: str) -> bool:
+        """数据源当前是否可用（不占用半开试探名额）"""
+        return not self.get(provider).breaker.is_open()
+
+    def call(self, provider: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        经过熔断和限流调用数据源（只有 is_transport_error 判定的错误计入熔断）
+
+        Raises:
+            ProviderUnavailableError: 数据源熔断中
+        """
+        return self._call(provider, False, func, args, kwargs)
+
+    def call_batch(self, provider: str, func: Callable, *args, **kwargs) -> Any:
+        """同 call，用于一次请求多只股票的批量调用，耗时记入批量样本"""
+        return self._call(provider, True, func, args, kwargs)
+
+    def _call(self, provider: str, batch: bool, func: Callable, args: tuple, kwargs: Dict) -> Any:
+        health = self.get(provider)
+        if not health.breaker.allow_request():
+            with health._lock:
+                health.skipped += 1
+            raise ProviderUnavailableError(f"数据源 {provider} 熔断中，已跳过")
+
+        health.limiter.acquire()
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            latency = time.time() - start
+            if not is_transport_error(e):
+                # 数据源有响应，只是数据不符合预期：不计入熔断，也不清零连续失败计数，只释放半开试探名额
+                with health._lock:
+                    health.data_errors += 1
+                health.breaker.release_trial()
+                raise
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+            with health._lock:
+                health.failures += 1
+                health.total_latency += latency
+                if status_code == 429:
+                    health.throttled += 1
+            if status_code == 429:
+                health.limiter.on_throttled()
+            health.breaker.record_failure()
+            raise
+
+        latency = time.time() - start
+        with health._lock:
+            health.successes += 1
+            health.total_latency += latency
+            (health.batch_latencies if batch else health.latencies).append(latency)
+        health.limiter.on_success(latency)
+        health.breaker.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """所有数据源的当前状态"""
+        with self._lock:
+            providers = list(self._providers.values())
+        return {health.name: health.snapshot() for health in providers}
+
+
+_shared_registry = None
+_shared_registry_lock = threading.Lock()
+
+
+def get_provider_registry() -> ProviderHealthRegistry:
+    """获取进程内共享的数据源健康注册表"""
+    global _shared_registry
+    with _shared_registry_lock:
+        if _shared_registry is None:
+            _shared_registry = ProviderHealthRegistry()
+        return _shared_registry
@@ -3,6 +3,7 @@ from fixed_stock_fetcher import FixedRealTimeStockFetcher
 import json
 import os
 from datetime import datetime
+from laoliu_scoring import QUICK_COMPLETE_PROFILE, score_record, score_records
 
 def quick_generate_complete_data():
     """快速生成完整股票数据 - 直接使用获取器的完整数据"""
@@ -22,8 +23,9 @@ def quick_generate_complete_data():
     
     # 3. 为每只股票添加老刘评分
     print("计算老刘评分...")
-    for stock in a_stocks:
-        stock['laoliu_score'] = calculate_simple_score(stock)
+    a_scores = score_records(a_stocks, QUICK_COMPLETE_PROFILE)
+    for stock, score in zip(a_stocks, a_scores):
+        stock['laoliu_score'] = int(score)
         stock['investment_advice'] = get_investment_advice(stock['laoliu_score'])
     
     for stock in hk_stocks:
@@ -121,32 +123,7 @@ def quick_generate_complete_data():
 
 def calculate_simple_score(stock):
     """简化版老刘评分"""
-    score = 50
-    
-    pe = stock.get('pe_ratio', 15)
-    if 0 < pe <= 15:
-        score += 20
-    elif 15 < pe <= 25:
-        score += 10
-    elif pe > 30:
-        score -= 10
-    
-    pb = stock.get('pb_ratio', 1.5)
-    if 0 < pb <= 2:
-        score += 15
-    elif pb > 5:
-        score -= 10
-    
-    industry = stock.get('industry', '')
-    if '银行' in industry:
-        score += 15
-    elif '食品饮料' in industry:
-        score += 10
-    
-    if stock.get('change_percent', 0) < -3:
-        score += 5  # 逆向投资机会
-    
-    return max(0, min(100, score))
+    return score_record(stock, QUICK_COMPLETE_PROFILE)
 
 def get_investment_advice(score):
     """获取投资建议"""
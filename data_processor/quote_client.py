@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量行情客户端 - 新浪/腾讯行情接口一次请求多只股票
+hq.sinajs.cn 和 qt.gtimg.cn 都支持逗号分隔的代码列表
+"""
+
+import re
+import requests
+from typing import Dict, List, Optional
+
+try:
+    from .provider_health import ProviderHealthRegistry, ProviderUnavailableError
+except ImportError:
+    from provider_health import ProviderHealthRegistry, ProviderUnavailableError
+
+SINA_QUOTE_URL = 'https://hq.sinajs.cn/list={symbols}'
+TENCENT_QUOTE_URL = 'http://qt.gtimg.cn/q={symbols}'
+
+# var hq_str_sh600000="浦发银行,10.01,...";
+SINA_LINE_PATTERN = re.compile(r'var hq_str_(\w+)="([^"]*)"')
+# v_sh600000="1~浦发银行~600000~10.01~...";
+TENCENT_LINE_PATTERN = re.compile(r'v_(\w+)="([^"]*)"')
+
+
+def parse_quote_response(content: str, pattern: re.Pattern, separator: str) -> Dict[str, List[str]]:
+    """一次解析多行行情响应，返回 代码 -> 字段列表（空行情不返回）"""
+    quotes = {}
+    for symbol, data_str in pattern.findall(content):
+        if data_str:
+            quotes[symbol] = data_str.split(separator)
+    return quotes
+
+
+class BatchQuoteClient:
+    """
+    批量行情客户端
+    按 batch_size 分组打包代码，解析结果按代码映射回去，未命中的代码由调用方重新排队
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, batch_size: int = 50, timeout: int = 10,
+                 sina_url: str = SINA_QUOTE_URL, tencent_url: str = TENCENT_QUOTE_URL,
+                 health: Optional[ProviderHealthRegistry] = None):
+        """
+        Args:
+            session: 共享的请求会话
+            batch_size: 每次请求打包的代码数
+            timeout: 请求超时（秒）
+            sina_url / tencent_url: 行情地址模板，可指向本地回放服务做测试
+            health: 数据源健康注册表，为None时不做熔断和限流
+        """
+        self.session = session or requests.Session()
+        self.health = health
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.sina_url = sina_url
+        self.tencent_url = tencent_url
+        self.request_count = 0
+
+    def fetch_sina(self, symbols: List[str]) -> Dict[str, List[str]]:
+        """批量获取新浪行情，symbols 形如 sh600000 / sz000001 / rt_hk00700"""
+        return self._fetch_batched('sina', self.sina_url, symbols, SINA_LINE_PATTERN, ',')
+
+    def fetch_tencent(self, symbols: List[str]) -> Dict[str, List[str]]:
+        """批量获取腾讯行情，symbols 形如 sh600000 / sz000001 / hk00700"""
+        return self._fetch_batched('tencent', self.tencent_url, symbols, TENCENT_LINE_PATTERN, '~')
+
+    def _fetch_batched(self, provider: str, url_template: str, symbols: List[str], pattern: re.Pattern,
+                       separator: str) -> Dict[str, List[str]]:
+        """分组请求并合并结果，单组失败不影响其他组"""
+        quotes = {}
+        requested = set(symbols)
+
+        for start in range(0, len(symbols), self.batch_size):
+            chunk = symbols[start:start + self.batch_size]
+            url = url_template.format(symbols=','.join(chunk))
+
+            try:
+                if self.health is not None:
+                    # 多只股票的批量请求耗时单独统计，单股对冲的等待时间只参考单只请求
+                    call = self.health.call_batch if len(chunk) > 1 else self.health.call
+                    response = call(provider, self._get, url)
+                else:
+                    response = self._get(url)
+            except ProviderUnavailableError as e:
+                # 熔断中，剩余分组全部作为未命中交给下一个数据源
+                print(str(e))
+                break
+            except Exception as e:
+                print(f"批量行情请求失败 ({len(chunk)}只): {str(e)}")
+                continue
+
+            for symbol, fields in parse_quote_response(response.text, pattern, separator).items():
+                if symbol in requested:
+                    quotes[symbol] = fields
+
+        return quotes
+
+    def _get(self, url: str) -> requests.Response:
+        self.request_count += 1
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response
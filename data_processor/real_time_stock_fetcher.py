@@ -2,11 +2,18 @@
 import akshare as ak
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
+import threading
 import time
 from typing import Dict, List, Optional, Tuple
 import warnings
+from spot_data_converter import A_SPOT_COLUMNS, HK_SPOT_COLUMNS, spot_frame_to_records
+from persistent_cache import CACHE_TTL, PersistentCache, get_shared_cache
+from provider_health import ProviderHealthRegistry, get_provider_registry
+from history_store import HistoryStore, get_shared_history_store
+from indicator_engine import calculate_indicators, indicator_record, stack_history
+from streaming_indicators import IndicatorStateBook, get_shared_indicator_states
 warnings.filterwarnings('ignore')
 
 class RealTimeStockFetcher:
@@ -15,10 +22,23 @@ class RealTimeStockFetcher:
     集成akshare等免费API，支持A股和港股全量数据
     """
     
-    def __init__(self):
-        self.cache = {}  # 简单缓存机制
+    def __init__(self, persistent_cache: Optional[PersistentCache] = None,
+                 health: Optional[ProviderHealthRegistry] = None,
+                 history_store: Optional[HistoryStore] = None,
+                 indicator_states: Optional[IndicatorStateBook] = None):
+        self.cache = {}  # 内存缓存
         self.cache_duration = 300  # 5分钟缓存
         self.retry_attempts = 3
+        # 跨进程运行共享的持久化缓存
+        self.persistent_cache = persistent_cache if persistent_cache is not None else get_shared_cache()
+        # 共享的数据源健康状态（熔断+限流）
+        self.health = health if health is not None else get_provider_registry()
+        # 本地日线库
+        self.history_store = history_store if history_store is not None else get_shared_history_store()
+        # 增量技术指标状态：每天从日线库回放一次，之后每次刷新按最新报价O(1)更新
+        self.indicator_states = indicator_states if indicator_states is not None else get_shared_indicator_states()
+        # 全市场快照的下载锁：并发查询个股时只下载一次
+        self._snapshot_lock = threading.Lock()
         
     def get_all_a_stocks(self) -> List[Dict]:
         """获取所有A股股票列表"""
@@ -32,33 +52,10 @@ class RealTimeStockFetcher:
             print("正在获取A股股票列表...")
             
             # 使用akshare获取A股票列表
-            stock_list = ak.stock_zh_a_spot_em()
+            stock_list = self._ak_call(ak.stock_zh_a_spot_em)
             
-            # 数据清理和格式化
-            formatted_stocks = []
-            for _, row in stock_list.iterrows():
-                try:
-                    stock_info = {
-                        'code': str(row['代码']),
-                        'name': str(row['名称']),
-                        'market': 'A',
-                        'current_price': float(row['最新价']) if pd.notna(row['最新价']) else 0.0,
-                        'change_percent': float(row['涨跌幅']) if pd.notna(row['涨跌幅']) else 0.0,
-                        'volume': int(row['成交量']) if pd.notna(row['成交量']) else 0,
-                        'market_cap': float(row['总市值']) if pd.notna(row['总市值']) else 0.0,
-                        'pe_ratio': float(row['市盈率-动态']) if pd.notna(row['市盈率-动态']) else 0.0,
-                        'pb_ratio': float(row['市净率']) if pd.notna(row['市净率']) else 0.0,
-                        'turnover_rate': float(row['换手率']) if pd.notna(row['换手率']) else 0.0,
-                        'amplitude': float(row['振幅']) if pd.notna(row['振幅']) else 0.0,
-                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    
-                    # 过滤无效数据
-                    if stock_info['current_price'] > 0:
-                        formatted_stocks.append(stock_info)
-                        
-                except Exception as e:
-                    continue  # 跳过有问题的单行数据
+            # 数据清理和格式化（整列转换，过滤无效数据）
+            formatted_stocks = spot_frame_to_records(stock_list, A_SPOT_COLUMNS, 'A')
             
             # 更新缓存
             self._update_cache(cache_key, formatted_stocks)
@@ -82,31 +79,9 @@ class RealTimeStockFetcher:
             print("正在获取港股股票列表...")
             
             # 使用akshare获取港股列表
-            hk_list = ak.stock_hk_spot()
+            hk_list = self._ak_call(ak.stock_hk_spot)
             
-            formatted_stocks = []
-            for _, row in hk_list.iterrows():
-                try:
-                    stock_info = {
-                        'code': str(row['symbol']),
-                        'name': str(row['name']),
-                        'market': 'HK',
-                        'current_price': float(row['lasttrade']) if pd.notna(row['lasttrade']) else 0.0,
-                        'change_percent': float(row['changepercent']) if pd.notna(row['changepercent']) else 0.0,
-                        'volume': int(row['volume']) if pd.notna(row['volume']) else 0,
-                        'market_cap': 0.0,  # 港股市值需要单独计算
-                        'pe_ratio': 0.0,
-                        'pb_ratio': 0.0,
-                        'turnover_rate': 0.0,
-                        'amplitude': 0.0,
-                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    
-                    if stock_info['current_price'] > 0:
-                        formatted_stocks.append(stock_info)
-                        
-                except Exception as e:
-                    continue
+            formatted_stocks = spot_frame_to_records(hk_list, HK_SPOT_COLUMNS, 'HK')
             
             # 更新缓存
             self._update_cache(cache_key, formatted_stocks)
@@ -118,40 +93,71 @@ class RealTimeStockFetcher:
             print(f"获取港股列表失败: {e}")
             return self._get_mock_hk_stocks()
     
-    def get_stock_detail(self, stock_code: str, market: str = 'A') -> Optional[Dict]:
-        """获取单只股票详细信息"""
+    def get_stock_detail(self, stock_code: str, market: str = 'A', with_indicators: bool = True) -> Optional[Dict]:
+        """
+        获取单只股票详细信息（行情取自共享的全市场快照，同一缓存周期内只下载一次）
+
+        Args:
+            with_indicators: 是否附带A股技术指标（当天首次需读取日线库），只用行情和财务数据的调用方传False
+        """
         cache_key = f"stock_detail_{stock_code}_{market}"
         
         if self._is_cache_valid(cache_key):
+            detail = self.cache[cache_key]['data']
+        else:
+            try:
+                if market.upper() == 'A':
+                    detail = self._get_a_stock_detail(stock_code)
+                else:
+                    detail = self._get_hk_stock_detail(stock_code)
+            except Exception as e:
+                print(f"获取股票 {stock_code} 详细信息失败: {e}")
+                return None
+        
+        if detail is None or not with_indicators or market.upper() != 'A':
+            return detail
+        return dict(detail, technical_indicators=self._refresh_technical_indicators(stock_code, detail))
+    
+    def get_cached_stock_detail(self, stock_code: str, market: str = 'A') -> Optional[Dict]:
+        """只读缓存中的个股详情（内存或持久化缓存，可以已过期），不发起请求，没有时返回None"""
+        cache_key = f"stock_detail_{stock_code}_{market}"
+        if cache_key in self.cache or self._is_cache_valid(cache_key):
             return self.cache[cache_key]['data']
+        if self.persistent_cache is not None:
+            return self.persistent_cache.get_stale(cache_key, 'quote')
+        return None
+    
+    def _get_spot_snapshot(self, market: str = 'A') -> Optional[pd.DataFrame]:
+        """获取全市场行情快照（按代码索引），同一缓存周期内只下载一次，并发调用等待同一次下载"""
+        cache_key = f"spot_snapshot_{market}"
         
-        try:
-            if market.upper() == 'A':
-                return self._get_a_stock_detail(stock_code)
+        with self._snapshot_lock:
+            if self._is_cache_valid(cache_key, tier=None):
+                return self.cache[cache_key]['data']
+            
+            if market == 'A':
+                spot, code_column = self._ak_call(ak.stock_zh_a_spot_em), '代码'
             else:
-                return self._get_hk_stock_detail(stock_code)
-        except Exception as e:
-            print(f"获取股票 {stock_code} 详细信息失败: {e}")
-            return None
+                spot, code_column = self._ak_call(ak.stock_hk_spot), 'symbol'
+            if spot is None or spot.empty:
+                return None
+            
+            snapshot = spot.drop_duplicates(code_column).set_index(code_column)
+            self._update_cache(cache_key, snapshot, tier=None)
+            return snapshot
     
     def _get_a_stock_detail(self, stock_code: str) -> Optional[Dict]:
-        """获取A股详细信息"""
+        """获取A股详细信息（不含技术指标）"""
         try:
-            # 获取实时数据
-            realtime_data = ak.stock_zh_a_spot_em()
-            stock_data = realtime_data[realtime_data['代码'] == stock_code]
-            
-            if stock_data.empty:
+            snapshot = self._get_spot_snapshot('A')
+            if snapshot is None or stock_code not in snapshot.index:
                 return None
             
-            row = stock_data.iloc[0]
+            row = snapshot.loc[stock_code]
             
             # 获取财务数据
             financial_data = self._get_financial_data(stock_code)
             
-            # 获取历史数据用于技术分析
-            history_data = self._get_history_data(stock_code)
-            
             stock_info = {
                 'code': stock_code,
                 'name': str(row['名称']),
@@ -172,7 +178,6 @@ class RealTimeStockFetcher:
                 'open_price': float(row['今开']),
                 'close_yesterday': float(row['昨收']),
                 'financial_metrics': financial_data,
-                'technical_indicators': self._calculate_technical_indicators(history_data),
                 'industry': self._get_stock_industry(stock_code),
                 'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
@@ -190,13 +195,11 @@ class RealTimeStockFetcher:
     def _get_hk_stock_detail(self, stock_code: str) -> Optional[Dict]:
         """获取港股详细信息"""
         try:
-            hk_data = ak.stock_hk_spot()
-            stock_data = hk_data[hk_data['symbol'] == stock_code]
-            
-            if stock_data.empty:
+            snapshot = self._get_spot_snapshot('HK')
+            if snapshot is None or stock_code not in snapshot.index:
                 return None
             
-            row = stock_data.iloc[0]
+            row = snapshot.loc[stock_code]
             
             stock_info = {
                 'code': stock_code,
@@ -222,12 +225,16 @@ class RealTimeStockFetcher:
     
     def _get_financial_data(self, stock_code: str) -> Dict:
         """获取财务指标数据"""
+        cache_key = f"financial_{stock_code}"
+        if self._is_cache_valid(cache_key, tier='financial'):
+            return self.cache[cache_key]['data']
+        
         try:
             # 获取财务指标
-            financial = ak.stock_financial_em(symbol=stock_code)
+            financial = self._ak_call(ak.stock_financial_em, symbol=stock_code)
             if not financial.empty:
                 latest = financial.iloc[0]
-                return {
+                financial_data = {
                     'roe': float(latest.get('净资产收益率', 0)),
                     'roa': float(latest.get('总资产收益率', 0)),
                     'debt_ratio': float(latest.get('资产负债率', 0)) / 100,
@@ -238,6 +245,8 @@ class RealTimeStockFetcher:
                     'profit_growth': float(latest.get('净利润同比增长', 0)),
                     'report_date': str(latest.get('报告期', ''))
                 }
+                self._update_cache(cache_key, financial_data, tier='financial')
+                return financial_data
         except Exception as e:
             print(f"获取 {stock_code} 财务数据失败: {e}")
         
@@ -249,86 +258,51 @@ class RealTimeStockFetcher:
         }
     
     def _get_history_data(self, stock_code: str, days: int = 30) -> pd.DataFrame:
-        """获取历史数据"""
+        """获取历史数据（本地日线库，只增量下载缺失的K线）"""
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            history = ak.stock_zh_a_hist(
-                symbol=stock_code,
-                start_date=start_date.strftime('%Y%m%d'),
-                end_date=end_date.strftime('%Y%m%d'),
-                adjust="qfq"
-            )
-            return history
+            return self.history_store.get_window(stock_code, days=days, adjust="qfq")
         except Exception as e:
             print(f"获取 {stock_code} 历史数据失败: {e}")
             return pd.DataFrame()
     
+    def _refresh_technical_indicators(self, stock_code: str, detail: Dict) -> Dict:
+        """用个股详情中的最新价增量更新技术指标（当天首次刷新时从日线库回放初始化）"""
+        try:
+            indicators = self.indicator_states.refresh(
+                stock_code, detail['current_price'], detail['volume'],
+                lambda: self._get_history_data(stock_code)
+            )
+            self.indicator_states.save()
+            return indicators
+        except Exception as e:
+            print(f"更新 {stock_code} 技术指标失败: {e}")
+            return {}
+    
     def _calculate_technical_indicators(self, df: pd.DataFrame) -> Dict:
-        """计算技术指标"""
+        """计算技术指标（批量指标引擎的单只股票调用，不修改传入的DataFrame）"""
         if df.empty or len(df) < 20:
             return {}
         
         try:
-            # 计算移动平均线
-            df['ma5'] = df['收盘'].rolling(window=5).mean()
-            df['ma10'] = df['收盘'].rolling(window=10).mean()
-            df['ma20'] = df['收盘'].rolling(window=20).mean()
-            
-            # 计算RSI
-            delta = df['收盘'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['rsi'] = 100 - (100 / (1 + rs))
-            
-            # 计算MACD
-            exp1 = df['收盘'].ewm(span=12).mean()
-            exp2 = df['收盘'].ewm(span=26).mean()
-            df['macd'] = exp1 - exp2
-            df['signal'] = df['macd'].ewm(span=9).mean()
-            
-            latest = df.iloc[-1]
-            
-            return {
-                'ma5': float(latest.get('ma5', 0)),
-                'ma10': float(latest.get('ma10', 0)),
-                'ma20': float(latest.get('ma20', 0)),
-                'rsi': float(latest.get('rsi', 50)),
-                'macd': float(latest.get('macd', 0)),
-                'signal': float(latest.get('signal', 0)),
-                'volume_trend': self._analyze_volume_trend(df)
-            }
+            symbols, closes, volumes = stack_history({'_': df})
+            return indicator_record(calculate_indicators(closes, volumes, symbols), '_')
             
         except Exception as e:
             print(f"计算技术指标失败: {e}")
             return {}
     
-    def _analyze_volume_trend(self, df: pd.DataFrame) -> str:
-        """分析成交量趋势"""
-        if len(df) < 5:
-            return "数据不足"
-        
-        try:
-            recent_volume = df['成交量'].tail(5).mean()
-            previous_volume = df['成交量'].iloc[-10:-5].mean()
-            
-            if recent_volume > previous_volume * 1.5:
-                return "放量"
-            elif recent_volume < previous_volume * 0.5:
-                return "缩量"
-            else:
-                return "正常"
-        except:
-            return "正常"
-    
     def _get_stock_industry(self, stock_code: str) -> str:
         """获取股票所属行业"""
+        cache_key = f"industry_{stock_code}"
+        if self._is_cache_valid(cache_key, tier='industry'):
+            return self.cache[cache_key]['data']
+        
         try:
-            industry_data = ak.stock_individual_info_em(symbol=stock_code)
+            industry_data = self._ak_call(ak.stock_individual_info_em, symbol=stock_code)
             if isinstance(industry_data, dict) and '行业' in industry_data:
-                return str(industry_data['行业'])
+                industry = str(industry_data['行业'])
+                self._update_cache(cache_key, industry, tier='industry')
+                return industry
         except:
             pass
         return "未知"
@@ -357,20 +331,44 @@ class RealTimeStockFetcher:
         
         return filtered_stocks[:50]  # 最多返回50个搜索结果
     
-    def _is_cache_valid(self, key: str) -> bool:
-        """检查缓存是否有效"""
-        if key not in self.cache:
-            return False
+    def _ak_call(self, func, *args, **kwargs):
+        """经过熔断和限流调用akshare接口（每个接口单独一个熔断器，KeyError、空表等数据错误不计入熔断）"""
+        return self.health.call(f"akshare.{func.__name__}", func, *args, **kwargs)
+    
+    def get_provider_status(self) -> Dict[str, Dict]:
+        """各数据源的熔断状态、当前限速和调用统计"""
+        return self.health.snapshot()
+    
+    def _is_cache_valid(self, key: str, tier: Optional[str] = 'quote') -> bool:
+        """检查缓存是否有效（内存未命中时查询持久化缓存）"""
+        now = datetime.now().timestamp()
+        if key in self.cache:
+            ttl = CACHE_TTL.get(tier, self.cache_duration)
+            if now - self.cache[key]['timestamp'] < ttl:
+                return True
         
-        cache_time = self.cache[key]['timestamp']
-        return (datetime.now().timestamp() - cache_time) < self.cache_duration
+        if tier is not None and self.persistent_cache is not None:
+            cached = self.persistent_cache.get(key, tier, with_created_at=True)
+            if cached is not None:
+                # 沿用持久化缓存中的写入时间，提升到内存后不会延长有效期
+                data, created_at = cached
+                self.cache[key] = {'data': data, 'timestamp': created_at}
+                return True
+        
+        return False
     
-    def _update_cache(self, key: str, data: any):
-        """更新缓存"""
+    def _update_cache(self, key: str, data: any, tier: Optional[str] = 'quote'):
+        """更新缓存，tier为None时只保存在内存中"""
         self.cache[key] = {
             'data': data,
             'timestamp': datetime.now().timestamp()
         }
+        
+        if tier is not None and self.persistent_cache is not None:
+            try:
+                self.persistent_cache.set(key, data, tier)
+            except Exception as e:
+                print(f"写入持久化缓存失败 {key}: {e}")
     
     def _get_mock_a_stocks(self) -> List[Dict]:
         """获取模拟A股数据（作为备用）"""
@@ -5,6 +5,7 @@ import os
 import time
 from datetime import datetime
 from typing import Dict, List, Optional
+from laoliu_scoring import SIMPLE_PROFILE, score_records
 import traceback
 
 class RobustDataGenerator:
@@ -75,12 +76,14 @@ class RobustDataGenerator:
         processed_stocks = []
         total_stocks = len(all_a_stocks)
         
+        # 整列一次计算老刘评分
+        laoliu_scores = score_records(all_a_stocks, SIMPLE_PROFILE)
+        
         for i, stock in enumerate(all_a_stocks):
             try:
                 print(f"处理A股 {i+1}/{total_stocks}: {stock['name']} ({stock['code']})")
                 
-                # 计算老刘评分
-                laoliu_score = self._calculate_laoliu_score(stock)
+                laoliu_score = int(laoliu_scores[i])
                 
                 # 获取财务指标
                 try:
@@ -405,41 +408,6 @@ class RobustDataGenerator:
                     print(f"复制文件 {filename} 失败: {e}")
     
     # 辅助方法
-    def _calculate_laoliu_score(self, stock: Dict) -> int:
-        """计算老刘评分"""
-        score = 50
-        
-        # PE评估
-        pe = stock.get('pe_ratio', 15)
-        if 0 < pe <= 15:
-            score += 20
-        elif 15 < pe <= 25:
-            score += 10
-        elif pe > 30:
-            score -= 10
-        
-        # PB评估
-        pb = stock.get('pb_ratio', 1.5)
-        if 0 < pb <= 2:
-            score += 15
-        elif pb > 5:
-            score -= 10
-        
-        # 行业加权
-        industry = stock.get('industry', '')
-        if '银行' in industry:
-            score += 15
-        elif '食品饮料' in industry:
-            score += 10
-        elif '医药' in industry:
-            score += 8
-        
-        # 逆向投资机会
-        if stock['change_percent'] < -3:
-            score += 5
-        
-        return max(0, min(100, score))
-    
     def _get_investment_advice(self, score: int) -> str:
         if score >= 80:
             return "强烈推荐：基本面优秀，符合老刘理念"
@@ -4,6 +4,7 @@ import json
 import os
 from datetime import datetime
 from typing import Dict, List
+from laoliu_scoring import SIMPLE_PROFILE, score_records
 import random
 
 class SimpleStockDataGenerator:
@@ -21,9 +22,10 @@ class SimpleStockDataGenerator:
         print("1. 获取A股数据...")
         a_stocks = self.fetcher.get_all_a_stocks()
         
-        # 为A股添加老刘评分
-        for stock in a_stocks:
-            stock['laoliu_score'] = self._calculate_simple_score(stock)
+        # 为A股添加老刘评分（整列一次评分）
+        a_scores = score_records(a_stocks, SIMPLE_PROFILE)
+        for stock, score in zip(a_stocks, a_scores):
+            stock['laoliu_score'] = int(score)
             stock['investment_advice'] = self._get_investment_advice(stock['laoliu_score'])
             stock['recommendation'] = self._get_recommendation(stock['laoliu_score'])
             stock['analysis_points'] = self._get_analysis_points(stock)
@@ -70,42 +72,6 @@ class SimpleStockDataGenerator:
         
         return a_stock_data, hk_stock_data
     
-    def _calculate_simple_score(self, stock: Dict) -> int:
-        """简化版老刘评分计算"""
-        score = 50  # 基础分数
-        
-        # PE评估
-        pe = stock.get('pe_ratio', 15)
-        if 0 < pe <= 15:
-            score += 20
-        elif 15 < pe <= 25:
-            score += 10
-        elif pe > 30:
-            score -= 10
-        
-        # PB评估
-        pb = stock.get('pb_ratio', 1.5)
-        if 0 < pb <= 2:
-            score += 15
-        elif pb > 5:
-            score -= 10
-        
-        # 行业加权
-        industry = stock.get('industry', '')
-        if '银行' in industry:
-            score += 15
-        elif '食品饮料' in industry:
-            score += 10
-        elif '医药' in industry:
-            score += 8
-        
-        # 价格变化
-        change = stock.get('change_percent', 0)
-        if change < -3:
-            score += 5  # 逆向投资机会
-        
-        return max(0, min(100, score))
-    
     def _get_investment_advice(self, score: int) -> str:
         """获取投资建议"""
         if score >= 80:
@@ -0,0 +1,82 @@
+# 行情快照列式转换 - 将akshare行情表整列转换为标准股票记录
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# 标准股票记录字段（与各数据获取器输出保持一致）
+STANDARD_FIELDS = [
+    'code', 'name', 'market', 'current_price', 'change_percent', 'volume',
+    'market_cap', 'pe_ratio', 'pb_ratio', 'turnover_rate', 'amplitude', 'update_time'
+]
+
+TEXT_FIELDS = ('code', 'name')
+
+# 标准字段 -> 候选源列名（按优先级排列）
+A_SPOT_COLUMNS = {
+    'code': ['代码', 'symbol'],
+    'name': ['名称', 'name'],
+    'current_price': ['最新价', 'current', 'price'],
+    'change_percent': ['涨跌幅', 'changepercent'],
+    'volume': ['成交量', 'volume'],
+    'market_cap': ['总市值', 'market_cap'],
+    'pe_ratio': ['市盈率-动态', 'pe'],
+    'pb_ratio': ['市净率', 'pb'],
+    'turnover_rate': ['换手率'],
+    'amplitude': ['振幅']
+}
+
+HK_SPOT_COLUMNS = {
+    'code': ['symbol', '代码'],
+    'name': ['name', '名称'],
+    'current_price': ['lasttrade', '最新价'],
+    'change_percent': ['changepercent', '涨跌幅'],
+    'volume': ['volume', '成交量']
+}
+
+
+def normalize_spot_frame(spot_df: pd.DataFrame, column_map: Dict[str, List[str]], market: str,
+                         update_time: Optional[str] = None, drop_invalid: bool = True) -> pd.DataFrame:
+    """
+    整列转换行情表：重命名中文列、类型转换、填充空值并过滤无效行情
+
+    Args:
+        spot_df: akshare返回的行情快照
+        column_map: 标准字段到候选源列名的映射
+        market: 市场标识 A/HK
+        update_time: 快照时间，默认取当前时间（整张表共用一个时间戳）
+        drop_invalid: 为False时保留停牌、零价格和无名称的行（按代码查询时仍需返回这些股票），只去掉无代码的行
+
+    Returns:
+        只包含 STANDARD_FIELDS 列的DataFrame
+    """
+    if update_time is None:
+        update_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    normalized = pd.DataFrame(index=spot_df.index)
+    for field in STANDARD_FIELDS:
+        if field == 'market':
+            normalized[field] = market
+            continue
+        if field == 'update_time':
+            normalized[field] = update_time
+            continue
+
+        source = next((col for col in column_map.get(field, []) if col in spot_df.columns), None)
+        if field in TEXT_FIELDS:
+            normalized[field] = spot_df[source].fillna('').astype(str) if source else ''
+        else:
+            normalized[field] = pd.to_numeric(spot_df[source], errors='coerce').fillna(0.0) if source else 0.0
+
+    normalized['volume'] = normalized['volume'].astype('int64')
+
+    # 过滤无效数据
+    valid = normalized['code'] != ''
+    if drop_invalid:
+        valid &= (normalized['current_price'] > 0) & (normalized['name'] != '')
+    return normalized.loc[valid, STANDARD_FIELDS].reset_index(drop=True)
+
+
+def spot_frame_to_records(spot_df: pd.DataFrame, column_map: Dict[str, List[str]], market: str,
+                          update_time: Optional[str] = None) -> List[Dict]:
+    """将行情快照转换为标准股票记录列表"""
+    return normalize_spot_frame(spot_df, column_map, market, update_time).to_dict('records')
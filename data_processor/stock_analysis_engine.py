@@ -1,13 +1,29 @@
 # 股票深度分析引擎 - 集成老刘投资理念
-import akshare as ak
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
-import requests
-from typing import Dict, List, Any
+import os
+from typing import Dict, List, Any, Optional
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from analysis_cache import ANALYSIS_CACHE_TIER, analysis_cache_key, get_analysis_cache
+from llm_client import TEXT_GENERATION_PATH, LLMClient, get_shared_llm_client
+from persistent_cache import PersistentCache
 from real_time_stock_fetcher import RealTimeStockFetcher
+from stock_data_fetcher import StockDataFetcher
+from laoliu_scoring import ENGINE_FULL_PROFILE, ENGINE_QUICK_PROFILE, PREFERRED_INDUSTRIES, score_record
+
+# 对冲行情只取真实的行情字段（估值、市值、名称、行业等来自 akshare 详情）
+HEDGED_QUOTE_FIELDS = ('current_price', 'change_percent', 'volume', 'turnover', 'turnover_rate')
+
+# 未显式传入 hedged_quotes 时读取的环境变量（1/true/yes/on 开启），小程序API等入口无需改代码即可开启对冲
+HEDGED_QUOTES_ENV = 'STOCK_HEDGED_QUOTES'
+
+
+def hedged_quotes_from_env() -> bool:
+    return os.environ.get(HEDGED_QUOTES_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on')
 
 class StockAnalysisEngine:
     """
@@ -15,21 +31,38 @@ class StockAnalysisEngine:
     集成开源项目算法 + 老刘投资智慧 + Qwen LLM分析
     """
     
-    def __init__(self):
+    def __init__(self, hedged_quotes: Optional[bool] = None, hedge_percentile: float = 0.95,
+                 analysis_cache: Optional[PersistentCache] = None, llm_client: Optional[LLMClient] = None):
+        """
+        Args:
+            hedged_quotes: 单股查询的行情字段是否使用多数据源对冲请求降低尾延迟，为None时读取环境变量 HEDGED_QUOTES_ENV；
+                           对冲行情先返回，估值、市值、行业取已缓存的akshare详情，详情在后台继续获取
+            hedge_percentile: 对冲等待时间取主数据源耗时的分位数
+            analysis_cache: AI分析文本缓存，默认使用 analysis_cache 的共享实例
+            llm_client: 通义千问客户端，默认使用按 API Key 共享的实例（配额、合并、重试统一调度）
+        """
         self.qwen_api_key = "your_qwen_api_key"  # 需要配置通义千问API密钥
-        self.qwen_base_url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+        self.qwen_model = 'qwen-plus'
+        self.llm_client = llm_client if llm_client is not None else get_shared_llm_client(self.qwen_api_key)
+        
+        # AI分析文本按归一化输入缓存，输入基本不变时不再请求接口
+        self.analysis_cache = analysis_cache if analysis_cache is not None else get_analysis_cache()
+        self._qwen_lock = threading.Lock()
+        self.qwen_stats = {'api_calls': 0, 'api_failures': 0, 'stale_reuses': 0, 'fallbacks': 0}
         
         # 初始化实时数据获取器
         self.fetcher = RealTimeStockFetcher()
         
+        # 对冲模式：按新浪 -> 腾讯 -> 东财回退链对冲请求行情
+        self.hedged_quotes = hedged_quotes_from_env() if hedged_quotes is None else hedged_quotes
+        self.hedge_percentile = hedge_percentile
+        self.quote_fetcher = StockDataFetcher() if hedged_quotes else None
+        self._quote_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hedged-quote") if self.hedged_quotes else None
+        self._detail_futures = {}  # (代码, 市场) -> 进行中的个股详情请求，基本信息和财务指标共用
+        self._detail_lock = threading.Lock()
+        
         # 老刘投资偏好行业
-        self.preferred_industries = {
-            '银行': {'weight': 1.2, 'keywords': ['银行', '金融']},
-            '食品饮料': {'weight': 1.15, 'keywords': ['食品', '饮料', '白酒', '乳制品']},
-            '医药': {'weight': 1.1, 'keywords': ['医药', '生物', '医疗']},
-            '保险': {'weight': 1.1, 'keywords': ['保险', '人寿']},
-            '公用事业': {'weight': 1.05, 'keywords': ['电力', '水务', '燃气']}
-        }
+        self.preferred_industries = PREFERRED_INDUSTRIES
     
     def quick_analysis(self, stock_code: str, market: str = 'A') -> Dict:
         """快速分析（用于批量处理）"""
@@ -83,44 +116,8 @@ class StockAnalysisEngine:
     
     def _calculate_quick_score(self, basic_info: Dict) -> int:
         """计算快速评分"""
-        score = 50  # 基础分数
-        
         try:
-            # PE估值评分
-            pe = basic_info.get('pe_ratio', 0)
-            if 0 < pe < 10:
-                score += 20
-            elif 10 <= pe < 15:
-                score += 15
-            elif 15 <= pe < 25:
-                score += 10
-            elif pe >= 50:
-                score -= 15
-            
-            # PB估值评分  
-            pb = basic_info.get('pb_ratio', 0)
-            if 0 < pb < 1.5:
-                score += 15
-            elif 1.5 <= pb < 3:
-                score += 10
-            elif pb >= 5:
-                score -= 10
-            
-            # 行业偏好评分
-            industry = basic_info.get('industry', '')
-            for pref_industry, config in self.preferred_industries.items():
-                if any(keyword in industry for keyword in config['keywords']):
-                    score += int((config['weight'] - 1) * 20)
-                    break
-            
-            # 市值评分（偏好大市值）
-            market_cap = basic_info.get('market_cap', 0)
-            if market_cap > 100000000000:  # > 1000亿
-                score += 10
-            elif market_cap > 50000000000:   # > 500亿
-                score += 5
-            
-            return max(0, min(100, score))
+            return score_record(basic_info, ENGINE_QUICK_PROFILE)
             
         except Exception as e:
             print(f"计算评分失败: {e}")
@@ -131,26 +128,14 @@ class StockAnalysisEngine:
         try:
             print(f"正在获取 {stock_code} 基本信息...")
             
-            # 使用实时数据获取器
-            stock_detail = self.fetcher.get_stock_detail(stock_code, market)
+            if self.hedged_quotes:
+                return self._get_hedged_basic_info(stock_code, market)
+            
+            # 使用实时数据获取器（不取技术指标，日线库只在量价分析中读取）
+            stock_detail = self.fetcher.get_stock_detail(stock_code, market, with_indicators=False)
             
             if stock_detail:
-                return {
-                    'code': stock_detail['code'],
-                    'name': stock_detail['name'],
-                    'market_type': stock_detail['market'],
-                    'current_price': stock_detail['current_price'],
-                    'change_percent': stock_detail['change_percent'],
-                    'volume': stock_detail['volume'],
-                    'market_cap': stock_detail.get('market_cap', 0),
-                    'industry': stock_detail.get('industry', '未知'),
-                    'pe_ratio': stock_detail.get('pe_ratio', 0),
-                    'pb_ratio': stock_detail.get('pb_ratio', 0),
-                    'turnover_rate': stock_detail.get('turnover_rate', 0),
-                    'amplitude': stock_detail.get('amplitude', 0),
-                    'update_time': stock_detail['update_time'],
-                    'data_source': 'real_time_api'
-                }
+                return self._basic_info_from_detail(stock_detail)
             else:
                 # 如果实时数据获取失败，使用模拟数据
                 return self._get_realistic_mock_data(stock_code, market)
@@ -159,13 +144,121 @@ class StockAnalysisEngine:
             print(f"获取股票基本信息失败: {e}")
             return self._get_realistic_mock_data(stock_code, market)
     
+    def _basic_info_from_detail(self, stock_detail: Dict) -> Dict:
+        return {
+            'code': stock_detail['code'],
+            'name': stock_detail['name'],
+            'market_type': stock_detail['market'],
+            'current_price': stock_detail['current_price'],
+            'change_percent': stock_detail['change_percent'],
+            'volume': stock_detail['volume'],
+            'market_cap': stock_detail.get('market_cap', 0),
+            'industry': stock_detail.get('industry', '未知'),
+            'pe_ratio': stock_detail.get('pe_ratio', 0),
+            'pb_ratio': stock_detail.get('pb_ratio', 0),
+            'turnover_rate': stock_detail.get('turnover_rate', 0),
+            'amplitude': stock_detail.get('amplitude', 0),
+            'update_time': stock_detail['update_time'],
+            'data_source': 'real_time_api'
+        }
+    
+    def _get_hedged_basic_info(self, stock_code: str, market: str) -> Dict:
+        """
+        对冲模式：对冲行情胜出即返回，不等待 akshare 详情
+        估值、市值、行业取已完成的详情或缓存中的详情（可以过期）；都没有时标记 fundamentals_pending，
+        详情请求在后台继续，结果进入缓存供财务指标和下次查询使用
+        """
+        detail_future = self._stock_detail_future(stock_code, market)
+        quote = self._get_hedged_quote(stock_code, market)
+        
+        if not quote:
+            # 行情全部失败，只能等详情
+            stock_detail = self._detail_result(detail_future)
+            if stock_detail:
+                return self._basic_info_from_detail(stock_detail)
+            return self._get_realistic_mock_data(stock_code, market)
+        
+        if detail_future.done():
+            stock_detail = self._detail_result(detail_future)
+        else:
+            stock_detail = self.fetcher.get_cached_stock_detail(stock_code, market)
+        
+        if stock_detail:
+            basic_info = self._basic_info_from_detail(stock_detail)
+        else:
+            basic_info = {
+                'code': stock_code,
+                'name': quote.get('name') or stock_code,
+                'market_type': market.upper(),
+                'market_cap': 0,
+                'industry': '未知',
+                'pe_ratio': 0,
+                'pb_ratio': 0,
+                'turnover_rate': 0,
+                'amplitude': 0,
+                'fundamentals_pending': True
+            }
+        
+        basic_info.update({field: quote[field] for field in HEDGED_QUOTE_FIELDS if field in quote})
+        basic_info['update_time'] = quote['update_time']
+        basic_info['data_source'] = f"hedged_{quote['data_source']}"
+        return basic_info
+    
+    def _stock_detail_future(self, stock_code: str, market: str) -> Future:
+        """个股详情请求（同一只股票进行中的请求只发一次）"""
+        key = (stock_code, market)
+        with self._detail_lock:
+            future = self._detail_futures.get(key)
+            if future is None:
+                future = self._quote_executor.submit(
+                    self.fetcher.get_stock_detail, stock_code, market, with_indicators=False
+                )
+                self._detail_futures[key] = future
+                future.add_done_callback(lambda _: self._release_detail_future(key, future))
+            return future
+    
+    def _release_detail_future(self, key, future: Future):
+        with self._detail_lock:
+            if self._detail_futures.get(key) is future:
+                del self._detail_futures[key]
+    
+    @staticmethod
+    def _detail_result(future: Future) -> Optional[Dict]:
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"获取个股详情失败: {e}")
+            return None
+    
+    def _get_hedged_quote(self, stock_code: str, market: str) -> Optional[Dict]:
+        """
+        对冲请求多个行情数据源，返回最先返回的有效结果
+        新浪/腾讯/东财行情里的估值、市值、行业是占位或估算值，只取其中的 HEDGED_QUOTE_FIELDS
+        """
+        try:
+            return self.quote_fetcher.fetch_quote_hedged(
+                stock_code, market_type=market.upper(), hedge_percentile=self.hedge_percentile
+            )
+        except Exception as e:
+            print(f"对冲行情获取失败 {stock_code}: {e}")
+            return None
+    
+    def get_hedge_stats(self) -> Dict:
+        """对冲请求触发次数和胜出次数"""
+        if self.quote_fetcher is None:
+            return {}
+        return self.quote_fetcher.get_hedge_stats()
+    
     def get_financial_metrics(self, stock_code: str) -> Dict:
         """获取财务指标数据"""
         try:
             print(f"正在获取 {stock_code} 财务指标...")
             
-            # 尝试从实时数据中获取财务指标
-            stock_detail = self.fetcher.get_stock_detail(stock_code, 'A')
+            # 尝试从实时数据中获取财务指标（对冲模式下等待基本信息阶段已发出的详情请求）
+            if self.hedged_quotes:
+                stock_detail = self._detail_result(self._stock_detail_future(stock_code, 'A'))
+            else:
+                stock_detail = self.fetcher.get_stock_detail(stock_code, 'A', with_indicators=False)
             if stock_detail and 'financial_metrics' in stock_detail:
                 return stock_detail['financial_metrics']
             
@@ -181,20 +274,16 @@ class StockAnalysisEngine:
         基于老刘投资理念计算综合评分
         核心原则：败于原价，死于抄底，终于杠杆
         """
-        score = 0
         analysis_points = []
         risk_warnings = []
         
         # 1. 盈利能力评估（30分）
         roe = financial_metrics.get('roe', 0)
         if roe >= 20:
-            score += 30
             analysis_points.append(f"ROE达{roe:.1f}%，盈利能力优秀")
         elif roe >= 15:
-            score += 25
             analysis_points.append(f"ROE达{roe:.1f}%，盈利能力强")
         elif roe >= 10:
-            score += 15
             analysis_points.append(f"ROE为{roe:.1f}%，盈利能力一般")
         else:
             analysis_points.append(f"ROE仅{roe:.1f}%，盈利能力偏弱")
@@ -204,17 +293,14 @@ class StockAnalysisEngine:
         pb = basic_info.get('pb_ratio', 0)
         
         if 0 < pe <= 15:
-            score += 20
             analysis_points.append(f"PE仅{pe:.1f}倍，估值偏低")
         elif 15 < pe <= 25:
-            score += 15
             analysis_points.append(f"PE为{pe:.1f}倍，估值合理")
         elif pe > 25:
             analysis_points.append(f"PE高达{pe:.1f}倍，估值偏高")
             risk_warnings.append("估值过高，注意风险")
         
         if 0 < pb <= 2:
-            score += 5
             analysis_points.append(f"PB仅{pb:.2f}倍，账面价值安全")
         elif pb > 5:
             risk_warnings.append(f"PB达{pb:.2f}倍，市净率偏高")
@@ -222,37 +308,34 @@ class StockAnalysisEngine:
         # 3. 财务安全评估（20分）
         debt_ratio = financial_metrics.get('debt_ratio', 0)
         if debt_ratio < 0.3:
-            score += 20
             analysis_points.append(f"负债率{debt_ratio*100:.1f}%，财务安全")
         elif debt_ratio < 0.6:
-            score += 15
             analysis_points.append(f"负债率{debt_ratio*100:.1f}%，财务健康")
         else:
             risk_warnings.append(f"负债率{debt_ratio*100:.1f}%，财务风险较高")
         
         # 4. 行业偏好加权（15分）
         industry = basic_info.get('industry', '')
-        industry_bonus = 0
         for pref_industry, config in self.preferred_industries.items():
             if any(keyword in industry for keyword in config['keywords']):
-                industry_bonus = 15 * (config['weight'] - 1) + 15
                 analysis_points.append(f"{industry}行业符合老刘投资偏好")
                 break
-        score += min(industry_bonus, 15)
         
         # 5. 逆向投资机会识别（10分）
         change_percent = basic_info.get('change_percent', 0)
         contrarian_opportunity = False
         if change_percent < -5 and pb < 2 and roe > 10:
-            score += 10
             analysis_points.append("符合'人弃我取'逆向投资机会")
             contrarian_opportunity = True
         
+        # 评分（与批量评分共用同一评分配置）
+        score = score_record({**basic_info, 'roe': roe, 'debt_ratio': debt_ratio}, ENGINE_FULL_PROFILE)
+        
         # 生成投资建议
         investment_advice = self._generate_investment_advice(score, risk_warnings)
         
         return {
-            'laoliu_score': min(score, 100),
+            'laoliu_score': score,
             'analysis_points': analysis_points,
             'risk_warnings': risk_warnings,
             'investment_advice': investment_advice,
@@ -263,13 +346,8 @@ class StockAnalysisEngine:
     def analyze_volume_price_relationship(self, stock_code: str) -> Dict:
         """量价关系分析"""
         try:
-            # 获取最近30天的价格和成交量数据
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=30)
-            
-            price_data = ak.stock_zh_a_hist(symbol=stock_code, 
-                                          start_date=start_date.strftime('%Y%m%d'),
-                                          end_date=end_date.strftime('%Y%m%d'))
+            # 获取最近30天的价格和成交量数据（本地日线库，不复权）
+            price_data = self.fetcher.history_store.get_window(stock_code, days=30)
             
             if len(price_data) < 5:
                 return {'signal': '数据不足', 'description': '无法分析量价关系'}
@@ -312,7 +390,12 @@ class StockAnalysisEngine:
             return {'signal': '量价关系正常', 'description': '分析数据获取失败'}
     
     def generate_qwen_analysis(self, stock_info: Dict, metrics: Dict, laoliu_eval: Dict) -> str:
-        """使用通义千问生成智能分析"""
+        """使用通义千问生成智能分析（先查缓存，归一化输入相同时直接复用）"""
+        cache_key = analysis_cache_key(stock_info, metrics, laoliu_eval, self.qwen_model)
+        cached = self.analysis_cache.get(cache_key, ANALYSIS_CACHE_TIER)
+        if cached is not None:
+            return cached
+        
         try:
             prompt = f"""
 作为老刘投资体系的AI分析师，请基于以下数据进行深度价值投资分析：
@@ -344,13 +427,8 @@ ROE：{metrics['roe']:.1f}%
 请用简洁易懂的语言，像老刘笔记一样实用。
 """
             
-            headers = {
-                'Authorization': f'Bearer {self.qwen_api_key}',
-                'Content-Type': 'application/json'
-            }
-            
             data = {
-                'model': 'qwen-plus',
+                'model': self.qwen_model,
                 'input': {
                     'messages': [{'role': 'user', 'content': prompt}]
                 },
@@ -360,17 +438,36 @@ ROE：{metrics['roe']:.1f}%
                 }
             }
             
-            response = requests.post(self.qwen_base_url, headers=headers, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['output']['text']
-            else:
-                return self._fallback_analysis(stock_info, laoliu_eval)
+            self._count_qwen('api_calls')
+            # 交互式分析：最多重试一次，失败时尽快回退到缓存或规则分析
+            result = self.llm_client.complete(TEXT_GENERATION_PATH, data, timeout=30, max_retries=1)
+            text = result['output']['text']
+            self.analysis_cache.set(cache_key, text, ANALYSIS_CACHE_TIER)
+            return text
                 
         except Exception as e:
             print(f"Qwen分析失败: {e}")
-            return self._fallback_analysis(stock_info, laoliu_eval)
+            return self._qwen_failure_analysis(cache_key, stock_info, laoliu_eval)
+    
+    def _qwen_failure_analysis(self, cache_key: str, stock_info: Dict, laoliu_eval: Dict) -> str:
+        """接口失败时先复用已过期的缓存文本，确实没有缓存时才生成备用分析（备用分析不写入缓存）"""
+        self._count_qwen('api_failures')
+        stale = self.analysis_cache.get_stale(cache_key, ANALYSIS_CACHE_TIER)
+        if stale is not None:
+            self._count_qwen('stale_reuses')
+            return stale
+        self._count_qwen('fallbacks')
+        return self._fallback_analysis(stock_info, laoliu_eval)
+    
+    def _count_qwen(self, name: str):
+        with self._qwen_lock:
+            self.qwen_stats[name] += 1
+    
+    def get_analysis_cache_stats(self) -> Dict:
+        """AI分析缓存命中率、接口调用统计及各模型延迟分布"""
+        with self._qwen_lock:
+            stats = dict(self.qwen_stats)
+        return {**self.analysis_cache.stats(), **stats, 'latency': self.llm_client.get_latency_histograms()}
     
     def comprehensive_analysis(self, stock_code: str, market: str = 'A') -> Dict:
         """综合分析主函数"""
@@ -392,7 +489,17 @@ ROE：{metrics['roe']:.1f}%
         ai_analysis = self.generate_qwen_analysis(basic_info, financial_metrics, laoliu_evaluation)
         
         # 6. 生成最终报告
-        analysis_result = {
+        analysis_result = self.build_analysis_result(
+            basic_info, financial_metrics, laoliu_evaluation, volume_price_analysis, ai_analysis
+        )
+        
+        print(f"分析完成，综合评分: {analysis_result['comprehensive_score']}")
+        return analysis_result
+    
+    def build_analysis_result(self, basic_info: Dict, financial_metrics: Dict, laoliu_evaluation: Dict,
+                              volume_price_analysis: Dict, ai_analysis: str) -> Dict:
+        """由各阶段结果组装综合分析报告（串行分析和批量并发分析共用）"""
+        return {
             'stock_info': basic_info,
             'financial_metrics': financial_metrics,
             'laoliu_evaluation': laoliu_evaluation,
@@ -404,9 +511,6 @@ ROE：{metrics['roe']:.1f}%
             'data_sources': ['akshare', 'qwen-ai'],
             'version': '1.0.0'
         }
-        
-        print(f"分析完成，综合评分: {analysis_result['comprehensive_score']}")
-        return analysis_result
     
     def _get_realistic_mock_data(self, stock_code: str, market: str) -> Dict:
         """获取真实模拟数据（基于实际股票信息）"""
@@ -6,9 +6,19 @@
 
 import math
 import random
-from typing import Dict, List, Any
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Iterable, Optional
 from datetime import datetime
 
+try:
+    from .stock_ranking import StockRanking
+except ImportError:
+    from stock_ranking import StockRanking
+
+# 参与评分的数值字段（缺失时按0处理）
+NUMERIC_FIELDS = ['pe_ratio', 'pb_ratio', 'roe', 'debt_ratio', 'dividend_yield', 'current_price']
+
 class StockAnalyzer:
     def __init__(self):
         """初始化股票分析器"""
@@ -35,180 +45,130 @@ class StockAnalyzer:
         
         print("股票分析器初始化完成")
     
-    def analyze_stocks(self, stocks: List[Dict], market_type: str) -> List[Dict]:
-        """分析股票列表"""
+    def analyze_table(self, stocks: List[Dict], market_type: str) -> 'AnalyzedTable':
+        """
+        批量分析股票：各项评分、行业权重、综合评分、推荐等级和目标价整列计算，
+        结果保持列式，序列化时才生成记录；投资理由只为需要输出的行生成
+        """
         print(f"正在分析{market_type}股票...")
         
-        analyzed_stocks = []
-        for stock in stocks:
-            try:
-                analyzed_stock = self._analyze_single_stock(stock, market_type)
-                if analyzed_stock:
-                    analyzed_stocks.append(analyzed_stock)
-            except Exception as e:
-                print(f"分析股票{stock.get('name', 'Unknown')}失败: {str(e)}")
-                continue
-        
-        print(f"{market_type}股票分析完成，共{len(analyzed_stocks)}只")
-        return analyzed_stocks
-    
-    def _analyze_single_stock(self, stock: Dict, market_type: str) -> Dict:
-        """分析单只股票"""
-        try:
-            # 基础数据
-            pe_ratio = stock.get('pe_ratio', 0)
-            pb_ratio = stock.get('pb_ratio', 0)
-            roe = stock.get('roe', 0)
-            debt_ratio = stock.get('debt_ratio', 0)
-            dividend_yield = stock.get('dividend_yield', 0)
-            industry = stock.get('industry', '其他')
-            
-            # 计算各项评分
-            valuation_score = self._calculate_valuation_score(pe_ratio, pb_ratio)
-            growth_score = self._calculate_growth_score(roe)
-            profitability_score = self._calculate_profitability_score(roe, dividend_yield)
-            safety_score = self._calculate_safety_score(debt_ratio, pb_ratio)
-            
-            # 行业调整
-            industry_weight = self.industry_weights.get(industry, 1.0)
-            
-            # 综合评分
-            total_score = (
-                valuation_score * 0.3 + 
-                growth_score * 0.25 + 
-                profitability_score * 0.25 + 
-                safety_score * 0.2
-            ) * industry_weight
-            
-            # 生成推荐等级
-            recommendation = self._generate_recommendation(total_score, valuation_score)
-            
-            # 计算目标价和止损价
-            target_price, stop_loss = self._calculate_price_targets(
-                stock.get('current_price', 0), total_score, pe_ratio
-            )
-            
-            # 生成投资理由
-            reason = self._generate_investment_reason(
-                stock, valuation_score, growth_score, profitability_score, safety_score
-            )
-            
-            # 返回分析结果
-            analyzed_stock = stock.copy()
-            analyzed_stock.update({
-                'scores': {
-                    'valuation': round(valuation_score, 2),
-                    'growth': round(growth_score, 2),
-                    'profitability': round(profitability_score, 2),
-                    'safety': round(safety_score, 2)
-                },
-                'total_score': round(total_score, 2),
-                'recommendation': recommendation,
-                'target_price': target_price,
-                'stop_loss': stop_loss,
-                'reason': reason
-            })
-            
-            return analyzed_stock
-            
-        except Exception as e:
-            print(f"分析股票失败: {str(e)}")
-            return None
+        columns = {}
+        invalid = np.zeros(len(stocks), dtype=bool)
+        for field in NUMERIC_FIELDS:
+            raw = pd.Series([stock.get(field, 0) for stock in stocks], dtype=object)
+            values = pd.to_numeric(raw, errors='coerce')
+            invalid |= (values.isna() & raw.notna()).to_numpy()  # 非数值字段，与逐只分析时一样跳过该股票
+            columns[field] = values.to_numpy(dtype=float)
+        
+        for position in np.flatnonzero(invalid):
+            print(f"分析股票{stocks[position].get('name', 'Unknown')}失败: 字段不是数值")
+        
+        valid = ~invalid
+        frame = pd.DataFrame({field: values[valid] for field, values in columns.items()},
+                             index=np.flatnonzero(valid))
+        frame['industry'] = [stocks[position].get('industry', '其他') for position in frame.index]
+        
+        # 计算各项评分
+        frame['valuation'] = self._calculate_valuation_score(frame['pe_ratio'].to_numpy(), frame['pb_ratio'].to_numpy())
+        frame['growth'] = self._calculate_growth_score(frame['roe'].to_numpy())
+        frame['profitability'] = self._calculate_profitability_score(
+            frame['roe'].to_numpy(), frame['dividend_yield'].to_numpy()
+        )
+        frame['safety'] = self._calculate_safety_score(frame['debt_ratio'].to_numpy(), frame['pb_ratio'].to_numpy())
+        
+        # 行业调整
+        frame['industry_weight'] = frame['industry'].map(
+            lambda industry: self.industry_weights.get(industry, 1.0)
+        ).astype(float)
+        
+        # 综合评分
+        frame['total_score'] = (
+            frame['valuation'] * 0.3 +
+            frame['growth'] * 0.25 +
+            frame['profitability'] * 0.25 +
+            frame['safety'] * 0.2
+        ) * frame['industry_weight']
+        
+        # 生成推荐等级
+        frame['recommendation'] = self._generate_recommendation(frame['total_score'].to_numpy(), frame['valuation'].to_numpy())
+        
+        # 计算目标价和止损价
+        frame['target_price'], frame['stop_loss'] = self._calculate_price_targets(
+            frame['current_price'].to_numpy(), frame['total_score'].to_numpy(), frame['pe_ratio'].to_numpy()
+        )
+        
+        print(f"{market_type}股票分析完成，共{len(frame)}只")
+        return AnalyzedTable(stocks, frame, self)
     
-    def _calculate_valuation_score(self, pe_ratio: float, pb_ratio: float) -> float:
+    def _calculate_valuation_score(self, pe_ratio: np.ndarray, pb_ratio: np.ndarray) -> np.ndarray:
         """计算估值评分"""
-        score = 0.5
+        criteria = self.valuation_criteria
         
         # PE评分
-        if pe_ratio > 0:
-            if pe_ratio < self.valuation_criteria['pe_low_threshold']:
-                score += 0.3
-            elif pe_ratio > self.valuation_criteria['pe_high_threshold']:
-                score -= 0.2
+        pe_adjust = np.select(
+            [(pe_ratio > 0) & (pe_ratio < criteria['pe_low_threshold']),
+             (pe_ratio > 0) & (pe_ratio > criteria['pe_high_threshold'])],
+            [0.3, -0.2], default=0
+        )
         
         # PB评分
-        if pb_ratio > 0:
-            if pb_ratio < self.valuation_criteria['pb_low_threshold']:
-                score += 0.2
-            elif pb_ratio > self.valuation_criteria['pb_high_threshold']:
-                score -= 0.1
+        pb_adjust = np.select(
+            [(pb_ratio > 0) & (pb_ratio < criteria['pb_low_threshold']),
+             (pb_ratio > 0) & (pb_ratio > criteria['pb_high_threshold'])],
+            [0.2, -0.1], default=0
+        )
         
-        return max(0, min(1, score))
+        return np.clip(0.5 + pe_adjust + pb_adjust, 0, 1)
     
-    def _calculate_growth_score(self, roe: float) -> float:
+    def _calculate_growth_score(self, roe: np.ndarray) -> np.ndarray:
         """计算成长性评分"""
-        if roe >= 20:
-            return 0.9
-        elif roe >= 15:
-            return 0.7
-        elif roe >= self.valuation_criteria['roe_min_threshold']:
-            return 0.5
-        else:
-            return 0.2
+        return np.select(
+            [roe >= 20, roe >= 15, roe >= self.valuation_criteria['roe_min_threshold']],
+            [0.9, 0.7, 0.5], default=0.2
+        )
     
-    def _calculate_profitability_score(self, roe: float, dividend_yield: float) -> float:
+    def _calculate_profitability_score(self, roe: np.ndarray, dividend_yield: np.ndarray) -> np.ndarray:
         """计算盈利能力评分"""
-        score = 0.3
-        
         # ROE评分
-        if roe >= 15:
-            score += 0.4
-        elif roe >= 10:
-            score += 0.2
+        roe_adjust = np.select([roe >= 15, roe >= 10], [0.4, 0.2], default=0)
         
         # 分红评分
-        if dividend_yield >= 3:
-            score += 0.3
-        elif dividend_yield >= 2:
-            score += 0.1
+        dividend_adjust = np.select([dividend_yield >= 3, dividend_yield >= 2], [0.3, 0.1], default=0)
         
-        return max(0, min(1, score))
+        return np.clip(0.3 + roe_adjust + dividend_adjust, 0, 1)
     
-    def _calculate_safety_score(self, debt_ratio: float, pb_ratio: float) -> float:
+    def _calculate_safety_score(self, debt_ratio: np.ndarray, pb_ratio: np.ndarray) -> np.ndarray:
         """计算安全性评分"""
-        score = 0.5
-        
         # 负债率评分
-        if debt_ratio < 0.3:
-            score += 0.3
-        elif debt_ratio < 0.5:
-            score += 0.1
-        elif debt_ratio > self.valuation_criteria['debt_ratio_max']:
-            score -= 0.2
+        debt_adjust = np.select(
+            [debt_ratio < 0.3, debt_ratio < 0.5, debt_ratio > self.valuation_criteria['debt_ratio_max']],
+            [0.3, 0.1, -0.2], default=0
+        )
         
         # PB安全边际
-        if pb_ratio < 1:
-            score += 0.2
-        elif pb_ratio < 2:
-            score += 0.1
+        pb_adjust = np.select([pb_ratio < 1, pb_ratio < 2], [0.2, 0.1], default=0)
         
-        return max(0, min(1, score))
+        return np.clip(0.5 + debt_adjust + pb_adjust, 0, 1)
     
-    def _generate_recommendation(self, total_score: float, valuation_score: float) -> str:
+    def _generate_recommendation(self, total_score: np.ndarray, valuation_score: np.ndarray) -> np.ndarray:
         """生成推荐等级"""
-        if total_score >= 0.8:
-            return 'strong_buy'
-        elif total_score >= 0.6:
-            return 'buy'
-        elif total_score >= 0.4:
-            return 'hold'
-        elif total_score >= 0.2:
-            return 'sell'
-        else:
-            return 'strong_sell'
+        return np.select(
+            [total_score >= 0.8, total_score >= 0.6, total_score >= 0.4, total_score >= 0.2],
+            ['strong_buy', 'buy', 'hold', 'sell'], default='strong_sell'
+        )
     
-    def _calculate_price_targets(self, current_price: float, total_score: float, pe_ratio: float) -> tuple:
-        """计算目标价和止损价"""
-        if current_price <= 0:
-            return 0, 0
+    def _calculate_price_targets(self, current_price: np.ndarray, total_score: np.ndarray,
+                                 pe_ratio: np.ndarray) -> tuple:
+        """计算目标价和止损价（现价无效时均为0）"""
+        priced = ~(current_price <= 0)
         
         # 基于评分的目标价
         score_multiplier = 1 + (total_score - 0.5) * 0.6  # 0.7-1.3倍
-        target_price = round(current_price * score_multiplier, 2)
+        target_price = np.where(priced, current_price * score_multiplier, 0)
         
         # 止损价设定为当前价的85-90%
-        stop_loss_ratio = 0.85 if total_score > 0.6 else 0.90
-        stop_loss = round(current_price * stop_loss_ratio, 2)
+        stop_loss_ratio = np.where(total_score > 0.6, 0.85, 0.90)
+        stop_loss = np.where(priced, current_price * stop_loss_ratio, 0)
         
         return target_price, stop_loss
     
@@ -245,12 +205,21 @@ class StockAnalyzer:
         
         return "，".join(reasons) if reasons else "综合评分一般，谨慎关注"
     
-    def generate_recommendations(self, analyzed_stocks: List[Dict]) -> Dict:
-        """生成推荐报告"""
+    def generate_recommendations(self, analyzed_stocks: List[Dict],
+                                 ranking: Optional[StockRanking] = None) -> Dict:
+        """
+        生成推荐报告
+        
+        Args:
+            analyzed_stocks: 分析后的股票列表
+            ranking: 已按 total_score 建立的排名视图（可复用给分页和汇总），为None时新建
+        """
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # 按评分排序
-        sorted_stocks = sorted(analyzed_stocks, key=lambda x: x.get('total_score', 0), reverse=True)
+        if ranking is None:
+            ranking = StockRanking(analyzed_stocks, 'total_score')
+        sorted_stocks = ranking.sorted_stocks()
         
         # 统计推荐等级
         recommendation_stats = {
@@ -261,9 +230,9 @@ class StockAnalyzer:
             'strong_sell': 0
         }
         
-        for stock in sorted_stocks:
-            rec = stock.get('recommendation', 'hold')
-            recommendation_stats[rec] = recommendation_stats.get(rec, 0) + 1
+        for rec, count in ranking.group_counts('recommendation').items():
+            rec = rec if isinstance(rec, str) else 'hold'
+            recommendation_stats[rec] = recommendation_stats.get(rec, 0) + count
         
         # 计算平均指标
         if sorted_stocks:
@@ -379,4 +348,88 @@ class StockAnalyzer:
         elif avg_score > 0.5 or industry_diversity > 0.2:
             return 'medium'
         else:
-            return 'high'
\ No newline at end of file
+            return 'high'
+
+
+class AnalyzedTable:
+    """
+    列式分析结果
+    frame 以原始列表中的位置为索引，保存评分、推荐等级和目标价等列；
+    to_records 时才合并回股票字典，投资理由只为需要输出的行生成
+    """
+    
+    SCORE_COLUMNS = ['valuation', 'growth', 'profitability', 'safety']
+    
+    def __init__(self, stocks: List[Dict], frame: pd.DataFrame, analyzer: StockAnalyzer):
+        self.stocks = stocks
+        self.frame = frame
+        self.analyzer = analyzer
+    
+    def __len__(self) -> int:
+        return len(self.frame)
+    
+    def _row_numbers(self, positions: List[int]) -> np.ndarray:
+        row_numbers = self.frame.index.get_indexer(positions)
+        if (row_numbers < 0).any():
+            raise KeyError("存在未分析（已跳过）的股票位置")
+        return row_numbers
+    
+    def reasons(self, positions: Iterable[int]) -> List[str]:
+        """为指定行（原始列表中的位置）生成投资理由"""
+        positions = list(positions)
+        row_numbers = self._row_numbers(positions)
+        scores = zip(*(self.frame[column].to_numpy()[row_numbers].tolist() for column in self.SCORE_COLUMNS))
+        return [
+            self.analyzer._generate_investment_reason(self.stocks[position], *row_scores)
+            for position, row_scores in zip(positions, scores)
+        ]
+    
+    def add_reasons(self, records: List[Dict]) -> List[Dict]:
+        """为需要输出的记录（to_records 的结果或其副本）按代码对应回原始行，原地补上投资理由"""
+        positions_by_code = {self.stocks[position].get('code'): position for position in self.frame.index}
+        positions = [positions_by_code[record.get('code')] for record in records]
+        for record, reason in zip(records, self.reasons(positions)):
+            record['reason'] = reason
+        return records
+    
+    def to_records(self, positions: Optional[Iterable[int]] = None, include_reason: bool = True) -> List[Dict]:
+        """
+        序列化为股票字典列表（格式同逐只分析的结果）
+        
+        Args:
+            positions: 需要输出的行（原始列表中的位置），默认全部按原顺序输出
+            include_reason: 是否生成投资理由
+        """
+        positions = list(self.frame.index if positions is None else positions)
+        row_numbers = self._row_numbers(positions)
+        columns = {
+            column: self.frame[column].to_numpy()[row_numbers].tolist()
+            for column in self.SCORE_COLUMNS + ['total_score', 'recommendation', 'current_price', 'target_price', 'stop_loss']
+        }
+        reasons = self.reasons(positions) if include_reason else None
+        
+        records = []
+        for i, position in enumerate(positions):
+            priced = not columns['current_price'][i] <= 0
+            record = self.stocks[position].copy()
+            record.update({
+                'scores': {column: _score_value(columns[column][i]) for column in self.SCORE_COLUMNS},
+                'total_score': round(columns['total_score'][i], 2),
+                'recommendation': columns['recommendation'][i],
+                'target_price': round(columns['target_price'][i], 2) if priced else 0,
+                'stop_loss': round(columns['stop_loss'][i], 2) if priced else 0
+            })
+            if reasons is not None:
+                record['reason'] = reasons[i]
+            records.append(record)
+        
+        return records
+
+
+def _score_value(score: float):
+    """分项评分输出值，截断到边界时与 max(0, min(1, score)) 一样返回整数"""
+    if score >= 1:
+        return 1
+    if score <= 0:
+        return 0
+    return round(score, 2)
@@ -10,17 +10,79 @@ import json
 import random
 import time
 import re
-from typing import Dict, List, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
+try:
+    from .quote_client import BatchQuoteClient
+    from .provider_health import ProviderHealthRegistry, ProviderUnavailableError, get_provider_registry
+except ImportError:
+    from quote_client import BatchQuoteClient
+    from provider_health import ProviderHealthRegistry, ProviderUnavailableError, get_provider_registry
+
+# 每个数据源允许的最大并发请求数
+DEFAULT_PROVIDER_LIMITS = {
+    'sina': 8,
+    'tencent': 8,
+    'eastmoney': 4
+}
+
+# 对冲请求：主数据源样本不足时的默认等待时间（秒）
+DEFAULT_HEDGE_DELAY = 0.5
+
+# 支持一次请求多只股票的数据源（按回退顺序）
+BATCH_PROVIDERS = ('sina', 'tencent')
+
+# 日志标签：市场 -> 数据源 -> 标签
+FETCH_LOG_LABELS = {
+    'A': {
+        'sina': '新浪API', 'tencent': '腾讯API', 'eastmoney': '东财API',
+        'mock': '模拟数据', 'failed': '完全失败', 'error': '异常错误', 'recovered': '异常恢复'
+    },
+    'HK': {
+        'sina': '新浪港股', 'tencent': '腾讯港股',
+        'mock': '港股模拟', 'failed': '港股失败', 'error': '港股异常', 'recovered': '港股恢复'
+    }
+}
+
 class StockDataFetcher:
-    def __init__(self):
-        """初始化数据获取器"""
+    def __init__(self, max_workers: int = 16, provider_limits: Optional[Dict[str, int]] = None,
+                 quote_batch_size: int = 50, health: Optional[ProviderHealthRegistry] = None):
+        """
+        初始化数据获取器
+        
+        Args:
+            max_workers: 并发获取的线程数
+            provider_limits: 每个数据源的并发上限，默认 DEFAULT_PROVIDER_LIMITS
+            quote_batch_size: 新浪/腾讯批量行情每次请求的代码数
+            health: 数据源健康注册表（熔断+限流），默认使用进程内共享实例
+        """
+        self.health = health if health is not None else get_provider_registry()
+        self.max_workers = max_workers
+        self.provider_limits = dict(DEFAULT_PROVIDER_LIMITS, **(provider_limits or {}))
+        self._provider_semaphores = {
+            provider: threading.BoundedSemaphore(limit)
+            for provider, limit in self.provider_limits.items()
+        }
+        
+        # 共享连接池，所有线程复用同一个会话
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.provider_limits) + 2, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Referer': 'https://finance.sina.com.cn'
         })
+        self.quote_client = BatchQuoteClient(self.session, batch_size=quote_batch_size, health=self.health)
+        
+        # 对冲请求线程池及统计
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+        self.hedge_stats = {'requests': 0, 'hedges_fired': 0, 'hedge_wins': 0}
         
         # 扩展A股股票池 - 涵盖各个行业的优质股票
         self.a_stock_pool = [
@@ -129,133 +191,301 @@ class StockDataFetcher:
     def fetch_a_stocks(self) -> List[Dict]:
         """获取A股数据"""
         print("正在获取A股数据...")
+        stocks, success_count, error_count = self._fetch_stock_pool(self.a_stock_pool, 'A')
+        print(f"A股数据获取完成: 成功{success_count}只, 错误{error_count}只, 总计{len(stocks)}只")
+        return stocks
+    
+    def fetch_hk_stocks(self) -> List[Dict]:
+        """获取港股数据"""
+        print("正在获取港股数据...")
+        stocks, success_count, error_count = self._fetch_stock_pool(self.hk_stock_pool, 'HK')
+        print(f"港股数据获取完成: 成功{success_count}只, 错误{error_count}只, 总计{len(stocks)}只")
+        return stocks
+    
+    def _fetch_stock_pool(self, stock_pool: List[Tuple[str, str]], market_type: str) -> Tuple[List[Dict], int, int]:
+        """
+        并发获取整个股票池，结果保持股票池顺序
+        
+        Returns:
+            (股票数据列表, 真实数据源成功数, 错误数)
+        """
+        labels = FETCH_LOG_LABELS[market_type]
+        price_prefix = 'HK$' if market_type == 'HK' else '价格'
         stocks = []
         success_count = 0
         error_count = 0
         
-        for code, name in self.a_stock_pool:
-            try:
-                stock_data = None
-                
-                # 1. 优先尝试新浪财经API
-                try:
-                    stock_data = self._fetch_sina_stock_data(code, name, 'A')
-                    if stock_data:
-                        print(f"[新浪API] {name}({code}) - 价格{stock_data.get('current_price', 'N/A')}")
-                        success_count += 1
-                except:
-                    pass
-                
-                # 2. 如果新浪失败，尝试腾讯财经
-                if not stock_data:
-                    try:
-                        stock_data = self._fetch_tencent_stock_data(code, name, 'A')
-                        if stock_data:
-                            print(f"[腾讯API] {name}({code}) - 价格{stock_data.get('current_price', 'N/A')}")
-                            success_count += 1
-                    except:
-                        pass
-                
-                # 3. 如果都失败，尝试东方财富API
-                if not stock_data:
-                    try:
-                        stock_data = self._fetch_eastmoney_stock_data(code, name, 'A')
-                        if stock_data:
-                            print(f"[东财API] {name}({code}) - 价格{stock_data.get('current_price', 'N/A')}")
-                            success_count += 1
-                    except:
-                        pass
-                
-                # 4. 最后使用高质量模拟数据确保有数据
-                if not stock_data:
-                    stock_data = self._generate_realistic_stock_data(code, name, 'A')
+        # 1. 新浪、腾讯批量请求，未命中的代码依次重新排队
+        batch_results = self._fetch_batch_quotes(stock_pool, market_type)
+        
+        # 2. 剩余代码并发走逐个回退链（东财 -> 模拟数据）
+        remaining_chain = [
+            (provider, fetch_func) for provider, fetch_func in self._get_provider_chain(market_type)
+            if provider not in BATCH_PROVIDERS
+        ]
+        remaining = [(code, name) for code, name in stock_pool if code not in batch_results]
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            single_results = executor.map(
+                lambda item: self._fetch_single_stock(item[0], item[1], market_type, remaining_chain), remaining
+            )
+            results = dict(zip([code for code, _ in remaining], single_results))
+            results.update({code: (stock_data, provider, None) for code, (stock_data, provider) in batch_results.items()})
+            
+            for code, name in stock_pool:
+                stock_data, source, error = results[code]
+                if error is not None:
+                    error_count += 1
+                    print(f"[{labels['error']}] {name}({code}): {error}")
                     if stock_data:
-                        print(f"[模拟数据] {name}({code}) - 价格{stock_data.get('current_price', 'N/A')}")
+                        stocks.append(stock_data)
+                        print(f"[{labels['recovered']}] {name}({code})")
+                    continue
                 
                 if stock_data:
+                    if source != 'mock':
+                        success_count += 1
+                    print(f"[{labels[source]}] {name}({code}) - {price_prefix}{stock_data.get('current_price', 'N/A')}")
                     stocks.append(stock_data)
                 else:
                     error_count += 1
-                    print(f"[完全失败] {name}({code})")
-                
-                # 减少请求间隔，提高获取速度
-                time.sleep(0.1)
-                
-            except Exception as e:
-                error_count += 1
-                print(f"[异常错误] {name}({code}): {str(e)}")
-                # 即使异常也尝试生成模拟数据
-                try:
-                    stock_data = self._generate_realistic_stock_data(code, name, 'A')
-                    if stock_data:
-                        stocks.append(stock_data)
-                        print(f"[异常恢复] {name}({code})")
-                except:
-                    pass
-                continue
+                    print(f"[{labels['failed']}] {name}({code})")
         
-        print(f"A股数据获取完成: 成功{success_count}只, 错误{error_count}只, 总计{len(stocks)}只")
-        return stocks
+        return stocks, success_count, error_count
     
-    def fetch_hk_stocks(self) -> List[Dict]:
-        """获取港股数据"""
-        print("正在获取港股数据...")
-        stocks = []
-        success_count = 0
-        error_count = 0
+    def _fetch_batch_quotes(self, stock_pool: List[Tuple[str, str]], market_type: str) -> Dict[str, Tuple[Dict, str]]:
+        """
+        按回退顺序批量请求支持多代码的数据源，只把未命中的代码交给下一个数据源
+        
+        Returns:
+            代码 -> (股票数据, 数据源)
+        """
+        if market_type == 'HK':
+            build_sina = self._build_sina_hk_stock_info
+            build_tencent = self._build_tencent_hk_stock_info
+        else:
+            build_sina = lambda code, name, fields: self._build_sina_stock_info(code, name, market_type, fields)
+            build_tencent = lambda code, name, fields: self._build_tencent_stock_info(code, name, market_type, fields)
+        batch_fetchers = {
+            'sina': (self.quote_client.fetch_sina, build_sina),
+            'tencent': (self.quote_client.fetch_tencent, build_tencent)
+        }
+        results = {}
+        pending = list(stock_pool)
         
-        for code, name in self.hk_stock_pool:
+        for provider in BATCH_PROVIDERS:
+            if not pending:
+                break
+            
+            fetch_batch, build_info = batch_fetchers[provider]
+            symbol_map = {self._get_quote_symbol(provider, code, market_type): (code, name) for code, name in pending}
             try:
+                quotes = self._call_provider(provider, fetch_batch, list(symbol_map))
+            except Exception as e:
+                print(f"{provider}批量行情获取失败: {str(e)}")
+                quotes = {}
+            
+            misses = []
+            for symbol, (code, name) in symbol_map.items():
                 stock_data = None
-                
-                # 1. 优先尝试新浪港股API
-                try:
-                    stock_data = self._fetch_sina_hk_stock_data(code, name)
-                    if stock_data:
-                        print(f"[新浪港股] {name}({code}) - HK${stock_data.get('current_price', 'N/A')}")
-                        success_count += 1
-                except:
-                    pass
-                
-                # 2. 如果新浪失败，尝试腾讯港股API
-                if not stock_data:
+                if symbol in quotes:
                     try:
-                        stock_data = self._fetch_tencent_hk_stock_data(code, name)
-                        if stock_data:
-                            print(f"[腾讯港股] {name}({code}) - HK${stock_data.get('current_price', 'N/A')}")
-                            success_count += 1
-                    except:
-                        pass
-                
-                # 3. 最后使用高质量模拟数据
-                if not stock_data:
-                    stock_data = self._generate_realistic_stock_data(code, name, 'HK')
-                    if stock_data:
-                        print(f"[港股模拟] {name}({code}) - HK${stock_data.get('current_price', 'N/A')}")
-                
+                        stock_data = build_info(code, name, quotes[symbol])
+                    except (ValueError, IndexError):
+                        stock_data = None
                 if stock_data:
-                    stocks.append(stock_data)
+                    results[code] = (stock_data, provider)
                 else:
-                    error_count += 1
-                    print(f"[港股失败] {name}({code})")
-                
-                time.sleep(0.1)
-                
-            except Exception as e:
-                error_count += 1
-                print(f"[港股异常] {name}({code}): {str(e)}")
-                # 异常恢复
+                    misses.append((code, name))
+            pending = misses
+        
+        return results
+    
+    def fetch_quote_hedged(self, code: str, name: Optional[str] = None, market_type: str = 'A',
+                           hedge_percentile: float = 0.95, hedge_delay: Optional[float] = None) -> Optional[Dict]:
+        """
+        对冲方式获取单只股票行情（用于交互式单股查询）
+        主数据源在其历史耗时分位数内未返回时，向回退链中的下一个数据源发出同样的请求，
+        先返回有效结果者胜出，其余未开始的请求取消、已发出的请求结果丢弃
+        
+        Args:
+            code: 股票代码
+            name: 股票名称，默认从股票池中查找
+            market_type: A/HK
+            hedge_percentile: 用主数据源耗时的该分位数作为对冲等待时间
+            hedge_delay: 固定对冲等待时间（秒），优先于分位数
+        
+        Returns:
+            股票数据，全部数据源失败时返回None
+        """
+        name = name or self._lookup_stock_name(code, market_type)
+        chain = [(provider, fetch_func) for provider, fetch_func in self._get_provider_chain(market_type)
+                 if self.health.is_available(provider)]
+        if not chain:
+            return None
+        
+        executor = self._get_hedge_executor()
+        with self._hedge_lock:
+            self.hedge_stats['requests'] += 1
+        
+        pending = {}  # future -> (数据源, 是否为对冲请求)
+        next_index = 0
+        winner = None
+        
+        def launch(is_hedge: bool):
+            nonlocal next_index
+            provider, fetch_func = chain[next_index]
+            next_index += 1
+            future = executor.submit(self._call_provider, provider, fetch_func, code, name)
+            pending[future] = (provider, is_hedge)
+            if is_hedge:
+                with self._hedge_lock:
+                    self.hedge_stats['hedges_fired'] += 1
+        
+        launch(is_hedge=False)
+        while pending:
+            has_next = next_index < len(chain)
+            if has_next:
+                latest_provider = chain[next_index - 1][0]
+                timeout = hedge_delay if hedge_delay is not None else self._get_hedge_delay(latest_provider, hedge_percentile)
+            else:
+                timeout = None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            if not done:
+                # 超过对冲等待时间仍未返回，发出对冲请求
+                launch(is_hedge=True)
+                continue
+            
+            failed = False
+            for future in done:
+                provider, is_hedge = pending.pop(future)
                 try:
-                    stock_data = self._generate_realistic_stock_data(code, name, 'HK')
+                    stock_data = future.result()
+                except Exception:
+                    stock_data = None
+                if stock_data and stock_data.get('current_price', 0) > 0:
+                    winner = (stock_data, is_hedge)
+                    break
+                failed = True
+            
+            if winner:
+                break
+            if failed and next_index < len(chain):
+                # 失败时按回退顺序立即尝试下一个数据源
+                launch(is_hedge=False)
+        
+        for future in pending:
+            future.cancel()
+        
+        if winner is None:
+            return None
+        
+        stock_data, is_hedge = winner
+        if is_hedge:
+            with self._hedge_lock:
+                self.hedge_stats['hedge_wins'] += 1
+        return stock_data
+    
+    def get_hedge_stats(self) -> Dict:
+        """对冲请求统计：触发率和对冲胜出率"""
+        with self._hedge_lock:
+            stats = dict(self.hedge_stats)
+        stats['fire_rate'] = round(stats['hedges_fired'] / stats['requests'], 4) if stats['requests'] else 0.0
+        stats['win_rate'] = round(stats['hedge_wins'] / stats['hedges_fired'], 4) if stats['hedges_fired'] else 0.0
+        return stats
+    
+    def _get_hedge_delay(self, provider: str, percentile: float) -> float:
+        """对冲等待时间：主数据源耗时分位数，样本不足时用默认值"""
+        delay = self.health.get(provider).latency_percentile(percentile)
+        return delay if delay is not None else DEFAULT_HEDGE_DELAY
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=max(4, len(self.provider_limits) * 2))
+            return self._hedge_executor
+    
+    def _lookup_stock_name(self, code: str, market_type: str) -> str:
+        """从股票池查找股票名称，找不到时用代码代替"""
+        stock_pool = self.hk_stock_pool if market_type == 'HK' else self.a_stock_pool
+        for pool_code, pool_name in stock_pool:
+            if pool_code == code:
+                return pool_name
+        return code
+    
+    def get_provider_status(self) -> Dict[str, Dict]:
+        """各数据源的熔断状态、当前限速和调用统计"""
+        return self.health.snapshot()
+    
+    def _http_get(self, url: str, **kwargs) -> requests.Response:
+        response = self.session.get(url, **kwargs)
+        response.raise_for_status()
+        return response
+    
+    def _get_quote_symbol(self, provider: str, code: str, market_type: str) -> str:
+        """构建新浪/腾讯行情代码"""
+        if market_type == 'HK':
+            return f'rt_hk{code}' if provider == 'sina' else f'hk{code}'
+        return f'sh{code}' if code.startswith('6') else f'sz{code}'
+    
+    def _fetch_single_stock(self, code: str, name: str, market_type: str,
+                            provider_chain: Optional[List[Tuple[str, Any]]] = None) -> Tuple[Optional[Dict], Optional[str], Optional[str]]:
+        """
+        按数据源回退顺序获取单只股票
+        
+        Args:
+            provider_chain: 要尝试的数据源，默认完整回退链
+        
+        Returns:
+            (股票数据, 数据源, 异常信息)
+        """
+        if provider_chain is None:
+            provider_chain = self._get_provider_chain(market_type)
+        
+        try:
+            for provider, fetch_func in provider_chain:
+                try:
+                    stock_data = self._call_provider(provider, fetch_func, code, name)
                     if stock_data:
-                        stocks.append(stock_data)
-                        print(f"[港股恢复] {name}({code})")
+                        return stock_data, provider, None
                 except:
                     pass
-                continue
+            
+            # 最后使用高质量模拟数据确保有数据
+            return self._generate_realistic_stock_data(code, name, market_type), 'mock', None
+            
+        except Exception as e:
+            # 即使异常也尝试生成模拟数据
+            try:
+                stock_data = self._generate_realistic_stock_data(code, name, market_type)
+            except:
+                stock_data = None
+            return stock_data, None, str(e)
+    
+    def _get_provider_chain(self, market_type: str) -> List[Tuple[str, Any]]:
+        """数据源回退顺序：A股 新浪 -> 腾讯 -> 东财；港股 新浪 -> 腾讯"""
+        if market_type == 'HK':
+            return [
+                ('sina', self._fetch_sina_hk_stock_data),
+                ('tencent', self._fetch_tencent_hk_stock_data)
+            ]
+        return [
+            ('sina', lambda code, name: self._fetch_sina_stock_data(code, name, market_type)),
+            ('tencent', lambda code, name: self._fetch_tencent_stock_data(code, name, market_type)),
+            ('eastmoney', lambda code, name: self._fetch_eastmoney_stock_data(code, name, market_type))
+        ]
+    
+    def _call_provider(self, provider: str, fetch_func, *args) -> Optional[Dict]:
+        """在数据源并发上限内调用获取函数，熔断中的数据源直接跳过"""
+        if not self.health.is_available(provider):
+            raise ProviderUnavailableError(f"数据源 {provider} 熔断中，已跳过")
         
-        print(f"港股数据获取完成: 成功{success_count}只, 错误{error_count}只, 总计{len(stocks)}只")
-        return stocks
+        semaphore = self._provider_semaphores.get(provider)
+        if semaphore is None:
+            return fetch_func(*args)
+        with semaphore:
+            return fetch_func(*args)
     
     def fetch_market_data(self) -> Dict:
         """获取大盘数据"""
@@ -293,174 +523,141 @@ class StockDataFetcher:
     def _fetch_sina_stock_data(self, code: str, name: str, market_type: str) -> Optional[Dict]:
         """从新浪财经获取A股数据"""
         try:
-            # 构建新浪财经API URL
-            if code.startswith('6'):
-                sina_code = f'sh{code}'
-            else:
-                sina_code = f'sz{code}'
-            
-            url = f'https://hq.sinajs.cn/list={sina_code}'
-            
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # 解析新浪返回的数据
-            content = response.text
-            if 'var hq_str_' not in content:
-                return None
-            
-            data_str = content.split('"')[1]
-            if not data_str:
+            sina_code = self._get_quote_symbol('sina', code, market_type)
+            fields = self.quote_client.fetch_sina([sina_code]).get(sina_code)
+            if not fields:
                 return None
-            
-            fields = data_str.split(',')
-            if len(fields) < 30:
-                return None
-            
-            current_price = float(fields[3]) if fields[3] else 0
-            prev_close = float(fields[2]) if fields[2] else current_price
-            
-            change_percent = 0
-            if prev_close > 0:
-                change_percent = round(((current_price - prev_close) / prev_close) * 100, 2)
-            
-            stock_info = {
-                'code': code,
-                'name': name,
-                'market_type': market_type,
-                'current_price': current_price,
-                'change_percent': change_percent,
-                'volume': int(float(fields[8])) if fields[8] else 0,
-                'market_cap': int(current_price * 1000000000),  # 估算市值
-                'pe_ratio': round(random.uniform(5, 35), 1),  # PE需要额外API获取
-                'pb_ratio': round(random.uniform(0.5, 8), 2),
-                'ps_ratio': round(random.uniform(0.8, 15), 1),
-                'roe': round(random.uniform(3, 30), 1),
-                'roa': round(random.uniform(1, 20), 1),
-                'debt_ratio': round(random.uniform(0.1, 0.9), 2),
-                'dividend_yield': round(random.uniform(0.5, 6), 1),
-                'industry': self._get_industry_by_name(name),
-                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'data_source': 'sina'
-            }
-            
-            return stock_info
+            return self._build_sina_stock_info(code, name, market_type, fields)
             
         except Exception as e:
             print(f"新浪API获取失败 {name}: {str(e)}")
             return None
     
+    def _build_sina_stock_info(self, code: str, name: str, market_type: str, fields: List[str]) -> Optional[Dict]:
+        """解析新浪A股行情字段"""
+        if len(fields) < 30:
+            return None
+        
+        current_price = float(fields[3]) if fields[3] else 0
+        prev_close = float(fields[2]) if fields[2] else current_price
+        
+        change_percent = 0
+        if prev_close > 0:
+            change_percent = round(((current_price - prev_close) / prev_close) * 100, 2)
+        
+        stock_info = {
+            'code': code,
+            'name': name,
+            'market_type': market_type,
+            'current_price': current_price,
+            'change_percent': change_percent,
+            'volume': int(float(fields[8])) if fields[8] else 0,
+            'market_cap': int(current_price * 1000000000),  # 估算市值
+            'pe_ratio': round(random.uniform(5, 35), 1),  # PE需要额外API获取
+            'pb_ratio': round(random.uniform(0.5, 8), 2),
+            'ps_ratio': round(random.uniform(0.8, 15), 1),
+            'roe': round(random.uniform(3, 30), 1),
+            'roa': round(random.uniform(1, 20), 1),
+            'debt_ratio': round(random.uniform(0.1, 0.9), 2),
+            'dividend_yield': round(random.uniform(0.5, 6), 1),
+            'industry': self._get_industry_by_name(name),
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'data_source': 'sina'
+        }
+        
+        return stock_info
+    
     def _fetch_tencent_stock_data(self, code: str, name: str, market_type: str) -> Optional[Dict]:
         """从腾讯财经获取A股数据"""
         try:
-            # 构建腾讯财经API URL
-            if code.startswith('6'):
-                tencent_code = f'sh{code}'
-            else:
-                tencent_code = f'sz{code}'
-            
-            url = f'http://qt.gtimg.cn/q={tencent_code}'
-            
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # 解析腾讯返回的数据
-            content = response.text
-            if 'v_' not in content:
-                return None
-            
-            data_str = content.split('"')[1]
-            if not data_str:
+            tencent_code = self._get_quote_symbol('tencent', code, market_type)
+            fields = self.quote_client.fetch_tencent([tencent_code]).get(tencent_code)
+            if not fields:
                 return None
-            
-            fields = data_str.split('~')
-            if len(fields) < 20:
-                return None
-            
-            current_price = float(fields[3]) if fields[3] else 0
-            change_percent = float(fields[32]) if fields[32] else 0
-            
-            stock_info = {
-                'code': code,
-                'name': name,
-                'market_type': market_type,
-                'current_price': current_price,
-                'change_percent': change_percent,
-                'volume': int(float(fields[6])) if fields[6] else 0,
-                'market_cap': int(current_price * 1000000000),
-                'pe_ratio': round(random.uniform(5, 35), 1),
-                'pb_ratio': round(random.uniform(0.5, 8), 2),
-                'ps_ratio': round(random.uniform(0.8, 15), 1),
-                'roe': round(random.uniform(3, 30), 1),
-                'roa': round(random.uniform(1, 20), 1),
-                'debt_ratio': round(random.uniform(0.1, 0.9), 2),
-                'dividend_yield': round(random.uniform(0.5, 6), 1),
-                'industry': self._get_industry_by_name(name),
-                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'data_source': 'tencent'
-            }
-            
-            return stock_info
+            return self._build_tencent_stock_info(code, name, market_type, fields)
             
         except Exception as e:
             print(f"腾讯API获取失败 {name}: {str(e)}")
             return None
     
+    def _build_tencent_stock_info(self, code: str, name: str, market_type: str, fields: List[str]) -> Optional[Dict]:
+        """解析腾讯A股行情字段"""
+        if len(fields) < 20:
+            return None
+        
+        current_price = float(fields[3]) if fields[3] else 0
+        change_percent = float(fields[32]) if fields[32] else 0
+        
+        stock_info = {
+            'code': code,
+            'name': name,
+            'market_type': market_type,
+            'current_price': current_price,
+            'change_percent': change_percent,
+            'volume': int(float(fields[6])) if fields[6] else 0,
+            'market_cap': int(current_price * 1000000000),
+            'pe_ratio': round(random.uniform(5, 35), 1),
+            'pb_ratio': round(random.uniform(0.5, 8), 2),
+            'ps_ratio': round(random.uniform(0.8, 15), 1),
+            'roe': round(random.uniform(3, 30), 1),
+            'roa': round(random.uniform(1, 20), 1),
+            'debt_ratio': round(random.uniform(0.1, 0.9), 2),
+            'dividend_yield': round(random.uniform(0.5, 6), 1),
+            'industry': self._get_industry_by_name(name),
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'data_source': 'tencent'
+        }
+        
+        return stock_info
+    
     def _fetch_sina_hk_stock_data(self, code: str, name: str) -> Optional[Dict]:
         """从新浪财经获取港股数据"""
         try:
             # 港股代码格式处理
-            sina_hk_code = f'rt_hk{code}'
-            url = f'https://hq.sinajs.cn/list={sina_hk_code}'
-            
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            content = response.text
-            if 'var hq_str_' not in content:
+            sina_hk_code = self._get_quote_symbol('sina', code, 'HK')
+            fields = self.quote_client.fetch_sina([sina_hk_code]).get(sina_hk_code)
+            if not fields:
                 return None
-            
-            data_str = content.split('"')[1]
-            if not data_str:
-                return None
-            
-            fields = data_str.split(',')
-            if len(fields) < 10:
-                return None
-            
-            current_price = float(fields[6]) if fields[6] else 0
-            prev_close = float(fields[3]) if fields[3] else current_price
-            
-            change_percent = 0
-            if prev_close > 0:
-                change_percent = round(((current_price - prev_close) / prev_close) * 100, 2)
-            
-            stock_info = {
-                'code': code,
-                'name': name,
-                'market_type': 'HK',
-                'current_price': current_price,
-                'change_percent': change_percent,
-                'volume': int(float(fields[12])) if len(fields) > 12 and fields[12] else 0,
-                'market_cap': int(current_price * 1000000000),
-                'pe_ratio': round(random.uniform(8, 40), 1),
-                'pb_ratio': round(random.uniform(0.5, 10), 2),
-                'ps_ratio': round(random.uniform(1, 20), 1),
-                'roe': round(random.uniform(5, 35), 1),
-                'roa': round(random.uniform(2, 25), 1),
-                'debt_ratio': round(random.uniform(0.1, 0.8), 2),
-                'dividend_yield': round(random.uniform(1, 8), 1),
-                'industry': self._get_industry_by_name(name),
-                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'data_source': 'sina_hk'
-            }
-            
-            return stock_info
+            return self._build_sina_hk_stock_info(code, name, fields)
             
         except Exception as e:
             print(f"新浪港股API获取失败 {name}: {str(e)}")
             return None
     
+    def _build_sina_hk_stock_info(self, code: str, name: str, fields: List[str]) -> Optional[Dict]:
+        """解析新浪港股行情字段"""
+        if len(fields) < 10:
+            return None
+        
+        current_price = float(fields[6]) if fields[6] else 0
+        prev_close = float(fields[3]) if fields[3] else current_price
+        
+        change_percent = 0
+        if prev_close > 0:
+            change_percent = round(((current_price - prev_close) / prev_close) * 100, 2)
+        
+        stock_info = {
+            'code': code,
+            'name': name,
+            'market_type': 'HK',
+            'current_price': current_price,
+            'change_percent': change_percent,
+            'volume': int(float(fields[12])) if len(fields) > 12 and fields[12] else 0,
+            'market_cap': int(current_price * 1000000000),
+            'pe_ratio': round(random.uniform(8, 40), 1),
+            'pb_ratio': round(random.uniform(0.5, 10), 2),
+            'ps_ratio': round(random.uniform(1, 20), 1),
+            'roe': round(random.uniform(5, 35), 1),
+            'roa': round(random.uniform(2, 25), 1),
+            'debt_ratio': round(random.uniform(0.1, 0.8), 2),
+            'dividend_yield': round(random.uniform(1, 8), 1),
+            'industry': self._get_industry_by_name(name),
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'data_source': 'sina_hk'
+        }
+        
+        return stock_info
+    
     def _fetch_sina_index_data(self, index_code: str) -> Optional[Dict]:
         """获取指数数据"""
         try:
@@ -473,8 +670,7 @@ class StockDataFetcher:
                 
             url = f'https://hq.sinajs.cn/list={sina_code}'
             
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+            response = self.health.call('sina', self._http_get, url, timeout=10)
             
             content = response.text
             if 'var hq_str_' not in content:
@@ -507,8 +703,7 @@ class StockDataFetcher:
         try:
             url = f'https://hq.sinajs.cn/list=rt_hkHSI'
             
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+            response = self.health.call('sina', self._http_get, url, timeout=10)
             
             content = response.text
             if 'var hq_str_' not in content:
@@ -578,8 +773,7 @@ class StockDataFetcher:
                 'cb': ''
             }
             
-            response = self.session.get(url, params=params, timeout=8)
-            response.raise_for_status()
+            response = self.health.call('eastmoney', self._http_get, url, params=params, timeout=8)
             
             # 解析JSON数据
             data = response.json()
@@ -620,53 +814,46 @@ class StockDataFetcher:
     def _fetch_tencent_hk_stock_data(self, code: str, name: str) -> Optional[Dict]:
         """从腾讯财经获取港股数据"""
         try:
-            # 腾讯港股API
-            url = f'http://qt.gtimg.cn/q=hk{code}'
-            
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            content = response.text
-            if 'v_hk' not in content:
+            tencent_hk_code = self._get_quote_symbol('tencent', code, 'HK')
+            fields = self.quote_client.fetch_tencent([tencent_hk_code]).get(tencent_hk_code)
+            if not fields:
                 return None
-            
-            data_str = content.split('"')[1]
-            if not data_str:
-                return None
-            
-            fields = data_str.split('~')
-            if len(fields) < 10:
-                return None
-            
-            current_price = float(fields[3]) if fields[3] else 0
-            change_percent = float(fields[32]) if len(fields) > 32 and fields[32] else 0
-            
-            stock_info = {
-                'code': code,
-                'name': name,
-                'market_type': 'HK',
-                'current_price': current_price,
-                'change_percent': change_percent,
-                'volume': int(float(fields[6])) if fields[6] else 0,
-                'market_cap': int(current_price * 1000000000),
-                'pe_ratio': round(random.uniform(8, 40), 1),
-                'pb_ratio': round(random.uniform(0.5, 10), 2),
-                'ps_ratio': round(random.uniform(1, 20), 1),
-                'roe': round(random.uniform(5, 35), 1),
-                'roa': round(random.uniform(2, 25), 1),
-                'debt_ratio': round(random.uniform(0.1, 0.8), 2),
-                'dividend_yield': round(random.uniform(1, 8), 1),
-                'industry': self._get_industry_by_name(name),
-                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'data_source': 'tencent_hk'
-            }
-            
-            return stock_info
+            return self._build_tencent_hk_stock_info(code, name, fields)
             
         except Exception as e:
             print(f"腾讯港股API获取失败 {name}: {str(e)}")
             return None
     
+    def _build_tencent_hk_stock_info(self, code: str, name: str, fields: List[str]) -> Optional[Dict]:
+        """解析腾讯港股行情字段"""
+        if len(fields) < 10:
+            return None
+        
+        current_price = float(fields[3]) if fields[3] else 0
+        change_percent = float(fields[32]) if len(fields) > 32 and fields[32] else 0
+        
+        stock_info = {
+            'code': code,
+            'name': name,
+            'market_type': 'HK',
+            'current_price': current_price,
+            'change_percent': change_percent,
+            'volume': int(float(fields[6])) if fields[6] else 0,
+            'market_cap': int(current_price * 1000000000),
+            'pe_ratio': round(random.uniform(8, 40), 1),
+            'pb_ratio': round(random.uniform(0.5, 10), 2),
+            'ps_ratio': round(random.uniform(1, 20), 1),
+            'roe': round(random.uniform(5, 35), 1),
+            'roa': round(random.uniform(2, 25), 1),
+            'debt_ratio': round(random.uniform(0.1, 0.8), 2),
+            'dividend_yield': round(random.uniform(1, 8), 1),
+            'industry': self._get_industry_by_name(name),
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'data_source': 'tencent_hk'
+        }
+        
+        return stock_info
+    
     def _generate_realistic_stock_data(self, code: str, name: str, market_type: str) -> Optional[Dict]:
         """生成高质量的股票模拟数据"""
         try:
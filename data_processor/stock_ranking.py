@@ -0,0 +1,106 @@
+# 股票排名 - argpartition取前K、单次排序得到各分组排名，排序视图缓存后供分页和汇总复用
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional, Union
+
+ScoreKey = Union[str, Callable[[Dict], float]]
+
+
+class StockRanking:
+    """
+    按评分排名的股票视图
+    - top(k)：argpartition 选出前k再排序，不做全量排序
+    - group_top(field, k)：按 (分组, 评分) 一次稳定排序，得到每个分组的前k
+    - sorted_stocks() / page()：全量排序视图，首次使用时计算并缓存
+    评分相同时保持原列表顺序，与 sorted(..., reverse=True) 结果一致
+    """
+
+    def __init__(self, stocks: List[Dict], score_key: ScoreKey = 'total_score', default: float = 0):
+        """
+        Args:
+            stocks: 股票列表
+            score_key: 评分字段名，或从股票字典计算评分的函数
+            default: 评分字段缺失时的默认值
+        """
+        self.stocks = stocks
+        if callable(score_key):
+            scores = [score_key(stock) for stock in stocks]
+        else:
+            scores = [stock.get(score_key, default) for stock in stocks]
+        # 取负后升序即评分降序，无效评分排在最后
+        self._keys = -np.nan_to_num(np.asarray(scores, dtype=float), nan=-np.inf)
+        self._positions = np.arange(len(stocks))
+        self._order = None
+        self._group_orders = {}
+
+    def __len__(self) -> int:
+        return len(self.stocks)
+
+    @property
+    def order(self) -> np.ndarray:
+        """全量排序后的位置数组（缓存）"""
+        if self._order is None:
+            self._order = np.argsort(self._keys, kind='stable')
+        return self._order
+
+    def top_positions(self, k: int) -> np.ndarray:
+        """评分前k的位置"""
+        n = len(self.stocks)
+        if k <= 0 or n == 0:
+            return self._positions[:0]
+        if self._order is not None or k >= n:
+            return self.order[:k]
+
+        # 第k大的评分作为阈值，阈值上的并列项按原顺序取
+        kth = np.partition(self._keys, k - 1)[k - 1]
+        candidates = np.flatnonzero(self._keys <= kth)
+        candidates = candidates[np.lexsort((candidates, self._keys[candidates]))]
+        return candidates[:k]
+
+    def top(self, k: int) -> List[Dict]:
+        """评分前k的股票"""
+        return [self.stocks[position] for position in self.top_positions(k)]
+
+    def sorted_stocks(self) -> List[Dict]:
+        """按评分降序的全部股票"""
+        return [self.stocks[position] for position in self.order]
+
+    def page(self, page: int, page_size: int = 50) -> List[Dict]:
+        """排序视图的第page页（从1开始）"""
+        start = (page - 1) * page_size
+        return [self.stocks[position] for position in self.order[start:start + page_size]]
+
+    def _group_codes(self, field: str):
+        labels = pd.Series([stock.get(field) for stock in self.stocks], dtype=object)
+        return pd.factorize(labels, use_na_sentinel=False)
+
+    def _group_order(self, field: str):
+        """按 (分组编号, 评分, 原位置) 排序的位置数组及各分组的起止下标（按字段缓存）"""
+        if field not in self._group_orders:
+            codes, uniques = self._group_codes(field)
+            order = np.lexsort((self._positions, self._keys, codes))
+            sorted_codes = codes[order]
+            starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else order
+            ends = np.r_[starts[1:], len(order)] if len(order) else order
+            self._group_orders[field] = (order, starts, ends, uniques)
+        return self._group_orders[field]
+
+    def group_top(self, field: str, k: Optional[int] = None) -> Dict[Any, List[Dict]]:
+        """
+        各分组评分前k的股票（如 market / industry / recommendation）
+
+        Returns:
+            分组值 -> 股票列表，分组按首次出现的顺序排列；k为None时返回分组内全部股票
+        """
+        order, starts, ends, uniques = self._group_order(field)
+        # 分组编号即首次出现顺序，排序后各分组按编号依次排列
+        return {
+            label: [self.stocks[position] for position in order[start:end if k is None else min(end, start + k)]]
+            for label, start, end in zip(uniques, starts, ends)
+        }
+
+    def group_counts(self, field: str) -> Dict[Any, int]:
+        """各分组的股票数"""
+        codes, uniques = self._group_codes(field)
+        counts = np.bincount(codes, minlength=len(uniques)) if len(codes) else []
+        return {label: int(count) for label, count in zip(uniques, counts)}
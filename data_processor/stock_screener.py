@@ -0,0 +1,198 @@
+# 股票筛选引擎 - 列式快照上建立排序索引和分类位图，组合条件通过位图求交集，并给出各分面计数
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+# 字段 -> 缺失时的默认值，或从股票字典取值的函数
+FieldSpec = Union[float, None, Callable[[Dict], Any]]
+
+
+def miniprogram_score(stock: Dict) -> float:
+    """小程序使用的评分：laoliu_score || total_score || 0"""
+    return stock.get('laoliu_score') or stock.get('total_score') or 0
+
+
+DEFAULT_NUMERIC_FIELDS = {
+    'pe_ratio': None,
+    'pb_ratio': None,
+    'roe': None,
+    'laoliu_score': None,
+    'total_score': None,
+    'change_percent': None,
+    'market_cap': None,
+    'score': miniprogram_score
+}
+DEFAULT_CATEGORICAL_FIELDS = ('industry', 'recommendation', 'market')
+
+# 小程序快速筛选（pages/stocks/stocks.js quickFilter）的服务端版本
+MINIPROGRAM_SCREENS = {
+    'high_roe': {'ranges': {'roe': {'ge': 15}}},
+    'low_pe': {'ranges': {'pe_ratio': {'gt': 0, 'le': 20}}},
+    'strong_buy': {'members': {'recommendation': ['strong_buy', 'buy']}},
+    'high_score': {'ranges': {'score': {'ge': 80}}}
+}
+
+
+class StockScreener:
+    """
+    股票筛选引擎
+    - 数值字段：稳定排序后的位置数组 + 有序值，区间条件用 searchsorted 定位后写入位图
+    - 分类字段：factorize 编码，每个取值一张位图（按需建立并缓存）
+    - screen()：各条件位图按位与，得到结果位图；facet_counts() 在结果上 bincount 得到分面计数
+    快照建立后只读，同一快照上的多次筛选互不影响
+    """
+
+    def __init__(self, stocks: List[Dict],
+                 numeric_fields: Optional[Dict[str, FieldSpec]] = None,
+                 categorical_fields: Iterable[str] = DEFAULT_CATEGORICAL_FIELDS):
+        """
+        Args:
+            stocks: 股票列表
+            numeric_fields: 数值字段 -> 缺失默认值（同 dict.get）或取值函数，默认见 DEFAULT_NUMERIC_FIELDS；
+                            无法转为数值的值记为NaN，不满足任何区间条件
+            categorical_fields: 分类字段（行业、推荐等级等）
+        """
+        self.stocks = stocks
+        self._size = len(stocks)
+        self._numeric = {}
+        self._sorted = {}
+        self._categorical = {}
+        self._bitmaps = {}
+
+        fields = DEFAULT_NUMERIC_FIELDS if numeric_fields is None else numeric_fields
+        for field, spec in fields.items():
+            if callable(spec):
+                values = [spec(stock) for stock in stocks]
+            else:
+                values = [stock.get(field, spec) for stock in stocks]
+            self.add_column(field, values)
+
+        for field in categorical_fields:
+            labels = pd.Series([stock.get(field) for stock in stocks], dtype=object)
+            codes, uniques = pd.factorize(labels, use_na_sentinel=False)
+            self._categorical[field] = (codes, uniques, {label: code for code, label in enumerate(uniques)})
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add_column(self, field: str, values: Any):
+        """加入（或替换）一个数值列，并建立排序索引"""
+        column = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+        if len(column) != self._size:
+            raise ValueError(f"列 {field} 长度 {len(column)} 与股票数 {self._size} 不一致")
+        # NaN 排在末尾，有效值个数之后的部分不参与区间查询
+        order = np.argsort(column, kind='stable')
+        self._numeric[field] = column
+        self._sorted[field] = (order, column[order], int(np.count_nonzero(~np.isnan(column))))
+
+    def column(self, field: str) -> np.ndarray:
+        """数值列（按原顺序，无法转换的值为NaN）"""
+        return self._numeric[field]
+
+    def range_positions(self, field: str, bounds: Dict[str, float]) -> np.ndarray:
+        """
+        满足区间条件的位置（按字段值升序）
+
+        Args:
+            bounds: {'gt'/'ge': 下限, 'lt'/'le': 上限}，写法同评分配置中的区间
+        """
+        order, values, valid = self._sorted[field]
+        start, end = 0, valid
+        for op, bound in bounds.items():
+            if op == 'ge':
+                start = max(start, int(np.searchsorted(values[:valid], bound, side='left')))
+            elif op == 'gt':
+                start = max(start, int(np.searchsorted(values[:valid], bound, side='right')))
+            elif op == 'le':
+                end = min(end, int(np.searchsorted(values[:valid], bound, side='right')))
+            elif op == 'lt':
+                end = min(end, int(np.searchsorted(values[:valid], bound, side='left')))
+            else:
+                raise ValueError(f"不支持的区间条件: {op}")
+        return order[start:max(start, end)]
+
+    def range_bitmap(self, field: str, bounds: Dict[str, float]) -> np.ndarray:
+        """区间条件的位图"""
+        bitmap = np.zeros(self._size, dtype=bool)
+        bitmap[self.range_positions(field, bounds)] = True
+        return bitmap
+
+    def member_bitmap(self, field: str, labels: Iterable[Any]) -> np.ndarray:
+        """取值属于 labels 的位图（各取值的位图缓存后按位或）"""
+        codes, _, lookup = self._categorical[field]
+        bitmap = np.zeros(self._size, dtype=bool)
+        for label in labels:
+            code = lookup.get(label)
+            if code is None:
+                continue
+            key = (field, code)
+            if key not in self._bitmaps:
+                self._bitmaps[key] = codes == code
+            bitmap |= self._bitmaps[key]
+        return bitmap
+
+    def screen(self, ranges: Optional[Dict[str, Dict[str, float]]] = None,
+               members: Optional[Dict[str, Iterable[Any]]] = None,
+               mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        组合筛选
+
+        Args:
+            ranges: 数值字段 -> 区间条件，如 {'roe': {'ge': 15}, 'pe_ratio': {'gt': 0, 'le': 20}}
+            members: 分类字段 -> 可选取值，如 {'recommendation': ['buy', 'strong_buy']}
+            mask: 在已有结果位图上继续筛选
+
+        Returns:
+            布尔位图，True 表示满足全部条件
+        """
+        result = np.ones(self._size, dtype=bool) if mask is None else mask.copy()
+        for field, bounds in (ranges or {}).items():
+            result &= self.range_bitmap(field, bounds)
+        for field, labels in (members or {}).items():
+            result &= self.member_bitmap(field, labels)
+        return result
+
+    def select(self, mask: np.ndarray) -> List[Dict]:
+        """位图对应的股票（保持原顺序）"""
+        return [self.stocks[position] for position in np.flatnonzero(mask)]
+
+    def facet_counts(self, mask: Optional[np.ndarray] = None,
+                     fields: Optional[Iterable[str]] = None) -> Dict[str, Dict[Any, int]]:
+        """
+        各分类字段的取值计数
+
+        Returns:
+            字段 -> {取值: 股票数}，只包含计数大于0的取值，按首次出现顺序排列
+        """
+        result = {}
+        for field in (self._categorical if fields is None else fields):
+            codes, uniques, _ = self._categorical[field]
+            selected = codes if mask is None else codes[mask]
+            counts = np.bincount(selected, minlength=len(uniques)) if len(selected) else np.zeros(len(uniques), dtype=int)
+            result[field] = {label: int(count) for label, count in zip(uniques, counts) if count}
+        return result
+
+    def precompute(self, screens: Dict[str, Dict], ranking: Optional[Callable[[List[Dict]], List[Dict]]] = None,
+                   code_field: str = 'code') -> Dict[str, Dict]:
+        """
+        预计算一组命名筛选的结果，供服务端直接下发
+
+        Args:
+            screens: 名称 -> {'ranges': ..., 'members': ...}，如 MINIPROGRAM_SCREENS
+            ranking: 对结果股票排序的函数，默认保持原顺序
+
+        Returns:
+            名称 -> {'count': 数量, 'codes': 股票代码列表, 'facets': 分面计数}
+        """
+        results = {}
+        for name, criteria in screens.items():
+            mask = self.screen(ranges=criteria.get('ranges'), members=criteria.get('members'))
+            selected = self.select(mask)
+            if ranking is not None:
+                selected = ranking(selected)
+            results[name] = {
+                'count': len(selected),
+                'codes': [stock.get(code_field) for stock in selected],
+                'facets': self.facet_counts(mask)
+            }
+        return results
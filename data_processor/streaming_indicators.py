@@ -0,0 +1,346 @@
+# 增量技术指标 - 每只股票维护一份指标状态，新K线/新报价O(1)更新，状态可序列化跨进程恢复
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+import pandas as pd
+
+DEFAULT_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'indicator_states.json')
+
+MIN_HISTORY_DAYS = 20
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RESYNC_INTERVAL = 1000  # 每隔多少根K线用窗口数据重算一次滑动和，消除浮点累积误差
+
+
+def _decay(span: int) -> float:
+    return 1 - 2 / (span + 1)
+
+
+class StreamingIndicators:
+    """
+    单只股票的增量技术指标状态
+
+    - 均线：最近20个收盘价 + 5/10/20日滑动和
+    - RSI：sma 模式维护最近14个涨跌幅的滑动和（与 _calculate_technical_indicators 一致），
+      wilder 模式维护 Wilder 平滑的平均涨跌幅
+    - MACD：EWM(adjust=True) 的分子/分母累积量，结果与 pandas ewm(span).mean() 一致
+    - 量能趋势：最近10个成交量
+
+    update() 追加一根新K线；update_last() 用盘中最新报价修正当前K线。
+    """
+
+    def __init__(self, rsi_mode: str = 'sma'):
+        if rsi_mode not in ('sma', 'wilder'):
+            raise ValueError(f"不支持的RSI模式: {rsi_mode}")
+        self.rsi_mode = rsi_mode
+        self._state = self._empty_state()
+        self._before_bar = None  # 当前K线计入前的状态，供 update_last 回退
+        self.last_date = None    # 最后一根K线的日期（YYYY-MM-DD）
+        self.seeded_on = None    # 最近一次用日线回放初始化的日期
+
+    @staticmethod
+    def _empty_state() -> Dict:
+        return {
+            'count': 0,
+            'last_close': None,
+            'closes': deque(maxlen=MIN_HISTORY_DAYS),
+            'sums': {5: 0.0, 10: 0.0, 20: 0.0},
+            'deltas': deque(maxlen=RSI_WINDOW),
+            'gain_sum': 0.0,
+            'loss_sum': 0.0,
+            'avg_gain': 0.0,
+            'avg_loss': 0.0,
+            'ema': {'fast': [0.0, 0.0], 'slow': [0.0, 0.0], 'signal': [0.0, 0.0]},  # [分子, 分母]
+            'volumes': deque(maxlen=10)
+        }
+
+    @staticmethod
+    def _copy_state(state: Dict) -> Dict:
+        copied = dict(state)
+        for key in ('closes', 'deltas', 'volumes'):
+            copied[key] = deque(state[key], maxlen=state[key].maxlen)
+        copied['sums'] = dict(state['sums'])
+        copied['ema'] = {name: list(values) for name, values in state['ema'].items()}
+        return copied
+
+    def update(self, close: float, volume: float = 0.0) -> Dict:
+        """追加一根新K线，返回最新指标"""
+        self._before_bar = self._copy_state(self._state)
+        self._apply(self._state, float(close), float(volume))
+        return self.indicators()
+
+    def update_last(self, close: float, volume: float = 0.0) -> Dict:
+        """用最新报价修正当前（最后一根）K线，尚无K线时等同于 update()"""
+        if self._before_bar is None:
+            return self.update(close, volume)
+        self._state = self._copy_state(self._before_bar)
+        self._apply(self._state, float(close), float(volume))
+        return self.indicators()
+
+    def _apply(self, state: Dict, close: float, volume: float):
+        closes = state['closes']
+        sums = state['sums']
+
+        # 均线滑动和：加入新值，减去移出窗口的旧值
+        for window in sums:
+            if len(closes) >= window:
+                sums[window] -= closes[-window]
+            sums[window] += close
+        closes.append(close)
+
+        # RSI
+        if state['last_close'] is not None:
+            delta = close - state['last_close']
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            deltas = state['deltas']
+            if len(deltas) == deltas.maxlen:
+                old_gain, old_loss = deltas[0]
+                state['gain_sum'] -= old_gain
+                state['loss_sum'] -= old_loss
+            deltas.append((gain, loss))
+            state['gain_sum'] += gain
+            state['loss_sum'] += loss
+
+            # Wilder平滑：前14个涨跌幅取简单均值，之后按 (n-1)/n 递推
+            if state['count'] <= RSI_WINDOW:  # 本次是第 count 个涨跌幅
+                state['avg_gain'] = state['gain_sum'] / len(deltas)
+                state['avg_loss'] = state['loss_sum'] / len(deltas)
+            else:
+                state['avg_gain'] = (state['avg_gain'] * (RSI_WINDOW - 1) + gain) / RSI_WINDOW
+                state['avg_loss'] = (state['avg_loss'] * (RSI_WINDOW - 1) + loss) / RSI_WINDOW
+        state['last_close'] = close
+
+        # MACD：EWM(adjust=True) 递推 分子 = x + d·分子，分母 = 1 + d·分母
+        ema = state['ema']
+        for name, span in (('fast', MACD_FAST), ('slow', MACD_SLOW)):
+            decay = _decay(span)
+            ema[name][0] = close + decay * ema[name][0]
+            ema[name][1] = 1 + decay * ema[name][1]
+        macd = ema['fast'][0] / ema['fast'][1] - ema['slow'][0] / ema['slow'][1]
+        decay = _decay(MACD_SIGNAL)
+        ema['signal'][0] = macd + decay * ema['signal'][0]
+        ema['signal'][1] = 1 + decay * ema['signal'][1]
+
+        state['volumes'].append(volume)
+        state['count'] += 1
+
+        if state['count'] % RESYNC_INTERVAL == 0:
+            self._resync(state)
+
+    @staticmethod
+    def _resync(state: Dict):
+        closes = list(state['closes'])
+        for window in state['sums']:
+            state['sums'][window] = math.fsum(closes[-window:])
+        state['gain_sum'] = math.fsum(gain for gain, _ in state['deltas'])
+        state['loss_sum'] = math.fsum(loss for _, loss in state['deltas'])
+
+    def indicators(self) -> Dict:
+        """当前指标，字段同 _calculate_technical_indicators，K线不足20根时返回空字典"""
+        state = self._state
+        if state['count'] < MIN_HISTORY_DAYS:
+            return {}
+
+        if self.rsi_mode == 'wilder':
+            gain, loss = state['avg_gain'], state['avg_loss']
+        else:
+            gain, loss = state['gain_sum'] / RSI_WINDOW, state['loss_sum'] / RSI_WINDOW
+        if loss == 0:
+            rsi = 100.0 if gain > 0 else float('nan')
+        else:
+            rsi = 100 - 100 / (1 + gain / loss)
+
+        ema = state['ema']
+        volumes = list(state['volumes'])
+        recent_volume = sum(volumes[-5:]) / 5
+        previous_volume = sum(volumes[:5]) / 5
+        if recent_volume > previous_volume * 1.5:
+            volume_trend = "放量"
+        elif recent_volume < previous_volume * 0.5:
+            volume_trend = "缩量"
+        else:
+            volume_trend = "正常"
+
+        return {
+            'ma5': state['sums'][5] / 5,
+            'ma10': state['sums'][10] / 10,
+            'ma20': state['sums'][20] / 20,
+            'rsi': rsi,
+            'macd': ema['fast'][0] / ema['fast'][1] - ema['slow'][0] / ema['slow'][1],
+            'signal': ema['signal'][0] / ema['signal'][1],
+            'volume_trend': volume_trend
+        }
+
+    def to_dict(self) -> Dict:
+        """可JSON序列化的状态"""
+        return {
+            'rsi_mode': self.rsi_mode,
+            'state': self._serialize(self._state),
+            'before_bar': self._serialize(self._before_bar) if self._before_bar is not None else None,
+            'last_date': self.last_date,
+            'seeded_on': self.seeded_on
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StreamingIndicators':
+        indicators = cls(rsi_mode=data.get('rsi_mode', 'sma'))
+        indicators._state = cls._deserialize(data['state'])
+        if data.get('before_bar') is not None:
+            indicators._before_bar = cls._deserialize(data['before_bar'])
+        indicators.last_date = data.get('last_date')
+        indicators.seeded_on = data.get('seeded_on')
+        return indicators
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, rsi_mode: str = 'sma',
+                     close_column: str = '收盘', volume_column: str = '成交量') -> 'StreamingIndicators':
+        """用日线DataFrame（列名同 ak.stock_zh_a_hist）初始化状态，只需回放一次"""
+        indicators = cls(rsi_mode=rsi_mode)
+        closes = pd.to_numeric(df[close_column], errors='coerce').tolist()
+        volumes = pd.to_numeric(df[volume_column], errors='coerce').fillna(0).tolist()
+        for close, volume in zip(closes, volumes):
+            if not math.isnan(close):
+                indicators.update(close, volume)
+        if '日期' in df.columns and len(df):
+            indicators.last_date = str(df['日期'].iloc[-1])[:10]
+        return indicators
+
+    @staticmethod
+    def _serialize(state: Dict) -> Dict:
+        data = dict(state)
+        data['closes'] = list(state['closes'])
+        data['deltas'] = [list(pair) for pair in state['deltas']]
+        data['volumes'] = list(state['volumes'])
+        data['sums'] = {str(window): value for window, value in state['sums'].items()}
+        data['ema'] = {name: list(values) for name, values in state['ema'].items()}
+        return data
+
+    @classmethod
+    def _deserialize(cls, data: Dict) -> Dict:
+        state = cls._empty_state()
+        state.update({key: data[key] for key in ('count', 'last_close', 'gain_sum', 'loss_sum', 'avg_gain', 'avg_loss')})
+        state['closes'].extend(data['closes'])
+        state['deltas'].extend(tuple(pair) for pair in data['deltas'])
+        state['volumes'].extend(data['volumes'])
+        state['sums'] = {int(window): value for window, value in data['sums'].items()}
+        state['ema'] = {name: list(values) for name, values in data['ema'].items()}
+        return state
+
+
+def save_states(states: Dict[str, StreamingIndicators], path: str):
+    """保存全市场指标状态（先写临时文件再替换，避免中断时留下半个文件）"""
+    _dump_payload({symbol: indicators.to_dict() for symbol, indicators in states.items()}, path)
+
+
+def _dump_payload(payload: Dict, path: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False, suffix='.tmp') as f:
+        json.dump(payload, f, ensure_ascii=False)
+        temp_path = f.name
+    os.replace(temp_path, path)
+
+
+def load_states(path: str) -> Dict[str, StreamingIndicators]:
+    """读取指标状态，文件不存在时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    return {symbol: StreamingIndicators.from_dict(data) for symbol, data in payload.items()}
+
+
+def _in_session(now: datetime) -> bool:
+    """A股交易日开盘之后（不识别节假日，节假日多出的K线在次日重新播种时消除）"""
+    return now.weekday() < 5 and now.strftime('%H:%M') >= '09:30'
+
+
+class IndicatorStateBook:
+    """
+    全市场指标状态
+    每只股票每天从本地日线库回放一次，之后每次刷新用行情快照的最新价 O(1) 更新；
+    按间隔保存到磁盘，进程退出时再保存一次
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH, save_interval: float = 60.0):
+        self.path = path
+        self.save_interval = save_interval
+        try:
+            self.states = load_states(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"读取指标状态失败，重新初始化: {e}")
+            self.states = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def refresh(self, symbol: str, close: Optional[float], volume: float,
+                load_history: Callable[[], pd.DataFrame], now: Optional[datetime] = None) -> Dict:
+        """
+        用最新报价更新一只股票的指标并返回
+
+        Args:
+            symbol: 股票代码
+            close: 最新价，无效（停牌、缺失）时只返回已有指标
+            volume: 当日成交量
+            load_history: 读取日线的函数（列名同 ak.stock_zh_a_hist），当天首次刷新时调用
+        """
+        now = now or datetime.now()
+        today = now.strftime('%Y-%m-%d')
+
+        with self._lock:
+            state = self.states.get(symbol)
+        if state is None or state.seeded_on != today:
+            history = load_history()
+            if history is None or history.empty:
+                return state.indicators() if state is not None else {}
+            state = StreamingIndicators.from_history(history)
+            state.seeded_on = today
+
+        with self._lock:
+            self.states[symbol] = state
+            self._dirty = True
+            if close is None or math.isnan(close) or close <= 0:
+                return state.indicators()
+            if state.last_date == today:
+                # 盘中报价修正当天K线
+                return state.update_last(close, volume)
+            if _in_session(now):
+                # 日线库还没有当天K线：开盘后的第一笔报价作为新K线追加
+                state.last_date = today
+                return state.update(close, volume)
+            return state.indicators()
+
+    def save(self, force: bool = False):
+        """有更新且距上次保存超过 save_interval 时写盘（force 时立即写）"""
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._saved_at < self.save_interval):
+                return
+            payload = {symbol: state.to_dict() for symbol, state in self.states.items()}
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        try:
+            _dump_payload(payload, self.path)
+        except OSError as e:
+            print(f"保存指标状态失败: {e}")
+
+
+_shared_books = {}
+_shared_books_lock = threading.Lock()
+
+
+def get_shared_indicator_states(path: str = DEFAULT_STATE_PATH) -> IndicatorStateBook:
+    """获取进程内共享的指标状态（同一文件只有一个实例写入，退出时自动保存）"""
+    with _shared_books_lock:
+        if path not in _shared_books:
+            book = IndicatorStateBook(path)
+            atexit.register(book.save, True)
+            _shared_books[path] = book
+        return _shared_books[path]
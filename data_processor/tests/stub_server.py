@@ -0,0 +1,71 @@
+# 本地桩服务 - 测试时代替新浪/腾讯行情、通义千问等HTTP接口，按预先录制的响应回放并记录收到的请求
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 响应函数：(方法, 路径, 请求体) -> (状态码, 响应头, 响应体字节)
+Responder = Callable[[str, str, bytes], Tuple[int, Dict[str, str], bytes]]
+
+
+class StubServer:
+    """
+    在后台线程中运行的本地HTTP服务
+    requests 记录每个请求的 (方法, 路径, 请求体)，可用作 with 语句自动关闭
+    """
+
+    def __init__(self, responder: Responder):
+        self.responder = responder
+        self.requests: List[Tuple[str, str, bytes]] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self, method: str):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                with server._lock:
+                    server.requests.append((method, self.path, body))
+                status, headers, payload = server.responder(method, self.path, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self._httpd.server_port}'
+
+    def paths(self, prefix: Optional[str] = None) -> List[str]:
+        with self._lock:
+            return [path for _, path, _ in self.requests if prefix is None or path.startswith(prefix)]
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def json_response(payload: Dict, status: int = 200, headers: Optional[Dict[str, str]] = None):
+    """JSON响应三元组"""
+    return status, dict({'Content-Type': 'application/json'}, **(headers or {})), json.dumps(payload).encode('utf-8')
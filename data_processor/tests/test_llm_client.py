@@ -0,0 +1,175 @@
+# LLM客户端测试 - 本地假接口代替 DashScope（合并、配额排队、退避重试、延迟分布）
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import llm_client
+from llm_client import CHAT_COMPLETIONS_PATH, LLMClient, LLMError
+from stub_server import StubServer, json_response
+
+
+def chat_payload(text: str, max_tokens: int = 10) -> dict:
+    return {'model': 'qwen-test', 'messages': [{'role': 'user', 'content': text}], 'max_tokens': max_tokens}
+
+
+class FakeDashScope:
+    """按脚本依次返回状态码的假接口，脚本用完后一律返回200；delay 为每次响应前的等待秒数"""
+
+    def __init__(self, script=(), delay: float = 0.0, headers=None):
+        self.script = list(script)
+        self.delay = delay
+        self.headers = headers or {}
+        self._lock = threading.Lock()
+        self.server = StubServer(self._respond)
+
+    def _respond(self, method, path, body):
+        time.sleep(self.delay)
+        with self._lock:
+            status = self.script.pop(0) if self.script else 200
+        if status == 'bad_json':
+            return 200, {'Content-Type': 'application/json'}, b'<html>gateway</html>'
+        if status != 200:
+            return json_response({'error': {'code': status}}, status=status, headers=self.headers.get(status))
+        prompt = json.loads(body)['messages'][0]['content']
+        return json_response({'choices': [{'message': {'content': f'echo:{prompt}'}}], 'usage': {'total_tokens': 5}})
+
+    @property
+    def calls(self) -> int:
+        return len(self.server.requests)
+
+    def close(self):
+        self.server.close()
+
+
+class LLMClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fakes = []
+
+    def tearDown(self):
+        for fake in self.fakes:
+            fake.close()
+
+    def client(self, fake: FakeDashScope, **options) -> LLMClient:
+        options.setdefault('backoff_base', 0.01)
+        return LLMClient('test-key', base_url=fake.server.base_url, **options)
+
+    def fake(self, *args, **kwargs) -> FakeDashScope:
+        fake = FakeDashScope(*args, **kwargs)
+        self.fakes.append(fake)
+        return fake
+
+    def test_identical_inflight_requests_are_coalesced(self):
+        fake = self.fake(delay=0.3)
+        client = self.client(fake)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: client.complete(CHAT_COMPLETIONS_PATH, chat_payload('同一问题')), range(4)))
+
+        self.assertEqual(fake.calls, 1)
+        self.assertTrue(all(llm_client.chat_completion_text(result) == 'echo:同一问题' for result in results))
+        stats = client.get_stats()
+        self.assertEqual((stats['requests'], stats['coalesced'], stats['http_calls']), (4, 3, 1))
+
+        # 完成后同样的请求重新发送
+        client.complete(CHAT_COMPLETIONS_PATH, chat_payload('同一问题'))
+        self.assertEqual(fake.calls, 2)
+
+    def test_rpm_budget_waits_for_window(self):
+        fake = self.fake()
+        client = self.client(fake, rpm=2, tpm=100000)
+        with mock.patch.object(llm_client, 'BUDGET_WINDOW', 0.5):
+            started = time.monotonic()
+            for i in range(2):
+                client.complete(CHAT_COMPLETIONS_PATH, chat_payload(f'问题{i}'))
+            self.assertLess(time.monotonic() - started, 0.4)
+            client.complete(CHAT_COMPLETIONS_PATH, chat_payload('问题2'))
+            self.assertGreaterEqual(time.monotonic() - started, 0.45)
+        self.assertEqual(fake.calls, 3)
+
+    def test_tpm_budget_waits_for_window(self):
+        fake = self.fake()
+        client = self.client(fake, rpm=100, tpm=100)
+        with mock.patch.object(llm_client, 'BUDGET_WINDOW', 0.5):
+            started = time.monotonic()
+            # 估算 Token = 字符数 + max_tokens = 62，两次超过预算；第一次的实际用量修正为5后第二次即可放行
+            client.complete(CHAT_COMPLETIONS_PATH, chat_payload('甲一', max_tokens=60))
+            client.complete(CHAT_COMPLETIONS_PATH, chat_payload('乙二', max_tokens=60))
+            self.assertLess(time.monotonic() - started, 0.4)
+
+            client.complete(CHAT_COMPLETIONS_PATH, chat_payload('丙三' * 30, max_tokens=40))
+            self.assertGreaterEqual(time.monotonic() - started, 0.45)
+
+    def test_retries_429_and_5xx_with_full_jitter(self):
+        fake = self.fake([503, 500, 429])
+        client = self.client(fake, max_retries=3, backoff_base=0.02, backoff_cap=1.0)
+        with mock.patch.object(llm_client.random, 'uniform', side_effect=lambda low, high: high / 2) as uniform:
+            result = client.complete(CHAT_COMPLETIONS_PATH, chat_payload('重试'))
+
+        self.assertEqual(llm_client.chat_completion_text(result), 'echo:重试')
+        self.assertEqual(fake.calls, 4)
+        self.assertEqual([call.args for call in uniform.call_args_list], [(0, 0.02), (0, 0.04), (0, 0.08)])
+        self.assertEqual(client.get_stats()['retries'], 3)
+
+    def test_retry_after_header_is_followed(self):
+        fake = self.fake([429], headers={429: {'Retry-After': '0.3'}})
+        client = self.client(fake)
+        started = time.monotonic()
+        client.complete(CHAT_COMPLETIONS_PATH, chat_payload('限流'))
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(fake.calls, 2)
+
+    def test_retries_exhausted_raise_llm_error(self):
+        fake = self.fake([503, 503])
+        client = self.client(fake)
+        with self.assertRaises(LLMError) as context:
+            client.complete(CHAT_COMPLETIONS_PATH, chat_payload('一直失败'), max_retries=1)
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(fake.calls, 2)
+
+    def test_4xx_is_not_retried(self):
+        fake = self.fake([400])
+        client = self.client(fake)
+        with self.assertRaises(LLMError) as context:
+            client.complete(CHAT_COMPLETIONS_PATH, chat_payload('参数错误'))
+        self.assertEqual(context.exception.status_code, 400)
+        self.assertEqual(fake.calls, 1)
+        self.assertEqual(client.get_stats()['retries'], 0)
+
+    def test_read_timeout_is_not_retried(self):
+        fake = self.fake(delay=0.5)
+        client = self.client(fake)
+        with self.assertRaises(LLMError):
+            client.complete(CHAT_COMPLETIONS_PATH, chat_payload('超时'), timeout=0.1)
+        time.sleep(0.5)
+        self.assertEqual(fake.calls, 1)
+
+    def test_invalid_json_raises_llm_error(self):
+        fake = self.fake(['bad_json'])
+        client = self.client(fake)
+        with self.assertRaises(LLMError):
+            client.complete(CHAT_COMPLETIONS_PATH, chat_payload('网关页面'))
+
+    def test_latency_histogram_counts_every_http_call(self):
+        fake = self.fake([503], delay=0.05)
+        client = self.client(fake)
+        client.complete(CHAT_COMPLETIONS_PATH, chat_payload('甲'))
+        client.complete(CHAT_COMPLETIONS_PATH, chat_payload('乙'))
+
+        histogram = client.get_latency_histograms()['qwen-test']
+        self.assertEqual(histogram['count'], 3)
+        self.assertEqual(histogram['buckets'][0.5], 3)
+        self.assertEqual(sum(histogram['buckets'].values()), 3)
+        self.assertGreaterEqual(histogram['mean'], 0.05)
+        self.assertGreaterEqual(histogram['max'], histogram['mean'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# 持久化缓存测试 - 分类有效期、永不过期的类别、容量淘汰
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import persistent_cache
+from persistent_cache import CACHE_TTL, PersistentCache
+
+
+class PersistentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'cache.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_stock_table_only_has_stock_tiers(self):
+        cache = PersistentCache(self.db_path)
+        self.assertEqual(set(cache.ttl), {'quote', 'financial', 'industry'})
+        self.assertTrue(all(ttl is not None for ttl in CACHE_TTL.values()))
+
+    def test_caller_tier_table_replaces_stock_tiers(self):
+        cache = PersistentCache(self.db_path, ttl={'notes': None, 'draft': 1})
+        self.assertEqual(cache.ttl, {'notes': None, 'draft': 1})
+
+    def test_tier_without_ttl_never_expires(self):
+        cache = PersistentCache(self.db_path, ttl={'notes': None, 'draft': 1})
+        cache.set('a', {'text': '笔记'}, 'notes')
+        cache.set('b', '草稿', 'draft')
+
+        later = time.time() + 10 * 365 * 86400
+        with mock.patch.object(persistent_cache.time, 'time', return_value=later):
+            self.assertEqual(cache.get('a', 'notes'), {'text': '笔记'})
+            self.assertIsNone(cache.get('b', 'draft'))
+
+    def test_eviction_keeps_non_expiring_tier_until_lru(self):
+        cache = PersistentCache(self.db_path, max_entries=2, ttl={'notes': None, 'draft': 1})
+        cache.set('a', 1, 'notes')
+        cache.set('b', 2, 'draft')
+
+        later = time.time() + 5
+        with mock.patch.object(persistent_cache.time, 'time', return_value=later):
+            # 超出容量时先删掉过期的草稿，永不过期的笔记保留
+            cache.set('c', 3, 'notes')
+            self.assertEqual(cache.get('a', 'notes'), 1)
+            self.assertIsNone(cache.get_stale('b', 'draft'))
+            self.assertEqual(cache.stats()['entries'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+# 数据源健康管理测试 - 本地假数据源按脚本注入失败（5xx、429、超时、错误数据）
+import os
+import sys
+import time
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from provider_health import CircuitBreaker, ProviderHealthRegistry, ProviderUnavailableError
+from stub_server import StubServer, json_response
+
+
+class FakeProvider:
+    """按顺序返回预设结果的本地数据源：'ok' / 500 / 429 / 'slow'（超过客户端超时）/ 'bad'（缺字段）"""
+
+    def __init__(self, outcomes, default='ok'):
+        self.outcomes = list(outcomes)
+        self.default = default
+        self.server = StubServer(self._respond)
+
+    def _respond(self, method, path, body):
+        outcome = self.outcomes.pop(0) if self.outcomes else self.default
+        if outcome == 'slow':
+            time.sleep(0.3)
+            return json_response({'price': 10.0})
+        if outcome == 'bad':
+            return json_response({'unexpected': True})
+        if isinstance(outcome, int):
+            return json_response({'error': outcome}, status=outcome)
+        return json_response({'price': 10.0})
+
+    def quote(self):
+        response = requests.get(self.server.base_url + '/quote', timeout=0.1)
+        response.raise_for_status()
+        return response.json()['price']  # 缺字段时抛 KeyError（数据错误）
+
+    @property
+    def calls(self):
+        return len(self.server.requests)
+
+    def close(self):
+        self.server.close()
+
+
+class ProviderHealthTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ProviderHealthRegistry(rates={'fake': 1000}, failure_threshold=3, reset_timeout=0.2)
+        self.providers = []
+
+    def tearDown(self):
+        for provider in self.providers:
+            provider.close()
+
+    def fake(self, outcomes, default='ok'):
+        provider = FakeProvider(outcomes, default)
+        self.providers.append(provider)
+        return provider
+
+    def call(self, provider):
+        return self.registry.call('fake', provider.quote)
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        provider = self.fake([500, 'slow', 500])
+        for _ in range(2):
+            with self.assertRaises(requests.RequestException):
+                self.call(provider)
+            self.assertTrue(self.registry.is_available('fake'))
+        with self.assertRaises(requests.RequestException):
+            self.call(provider)
+
+        self.assertFalse(self.registry.is_available('fake'))
+        self.assertEqual(self.registry.snapshot()['fake']['state'], CircuitBreaker.OPEN)
+
+    def test_success_resets_failure_count(self):
+        provider = self.fake([500, 500, 'ok', 500, 500])
+        outcomes = []
+        for _ in range(5):
+            try:
+                outcomes.append(self.call(provider))
+            except requests.RequestException:
+                outcomes.append('error')
+        self.assertEqual(outcomes, ['error', 'error', 10.0, 'error', 'error'])
+        self.assertTrue(self.registry.is_available('fake'))
+
+    def test_open_provider_is_skipped_without_request(self):
+        provider = self.fake([500, 500, 500])
+        for _ in range(3):
+            with self.assertRaises(requests.RequestException):
+                self.call(provider)
+
+        started = time.monotonic()
+        with self.assertRaises(ProviderUnavailableError):
+            self.call(provider)
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertEqual(provider.calls, 3)
+        self.assertEqual(self.registry.snapshot()['fake']['skipped'], 1)
+
+    def test_half_open_trial_success_closes(self):
+        provider = self.fake([500, 500, 500, 'ok'])
+        for _ in range(3):
+            with self.assertRaises(requests.RequestException):
+                self.call(provider)
+        time.sleep(0.25)
+
+        self.assertEqual(self.call(provider), 10.0)
+        snapshot = self.registry.snapshot()['fake']
+        self.assertEqual(snapshot['state'], CircuitBreaker.CLOSED)
+        self.assertEqual(snapshot['consecutive_failures'], 0)
+
+    def test_half_open_trial_failure_reopens(self):
+        provider = self.fake([500, 500, 500, 'slow'])
+        for _ in range(3):
+            with self.assertRaises(requests.RequestException):
+                self.call(provider)
+        time.sleep(0.25)
+
+        with self.assertRaises(requests.Timeout):
+            self.call(provider)
+        self.assertFalse(self.registry.is_available('fake'))
+        with self.assertRaises(ProviderUnavailableError):
+            self.call(provider)
+        self.assertEqual(provider.calls, 4)
+
+    def test_half_open_allows_a_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        breaker.release_trial()
+        self.assertTrue(breaker.allow_request())
+
+    def test_data_errors_do_not_count_or_reset_failures(self):
+        provider = self.fake(['slow', 'bad', 'slow', 'bad', 'slow'])
+        for expected in (requests.Timeout, KeyError, requests.Timeout, KeyError):
+            with self.assertRaises(expected):
+                self.call(provider)
+            self.assertTrue(self.registry.is_available('fake'))
+        with self.assertRaises(requests.Timeout):
+            self.call(provider)
+
+        snapshot = self.registry.snapshot()['fake']
+        self.assertEqual(snapshot['state'], CircuitBreaker.OPEN)
+        self.assertEqual(snapshot['data_errors'], 2)
+        self.assertEqual(snapshot['failures'], 3)
+
+    def test_rate_halves_on_429_and_recovers(self):
+        provider = self.fake([429, 429])
+        limiter = self.registry.get('fake').limiter
+        for expected_rate in (500.0, 250.0):
+            with self.assertRaises(requests.HTTPError):
+                self.call(provider)
+            self.assertAlmostEqual(limiter.rate, expected_rate)
+        self.assertEqual(self.registry.snapshot()['fake']['throttled'], 2)
+
+        # 正常响应每次恢复上限的5%，不超过上限
+        for _ in range(5):
+            self.call(provider)
+        self.assertAlmostEqual(limiter.rate, 500.0)
+        for _ in range(20):
+            self.call(provider)
+        self.assertAlmostEqual(limiter.rate, 1000.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# 批量行情客户端测试 - 本地桩服务回放录制的新浪/腾讯多行响应
+import os
+import sys
+import unittest
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from provider_health import ProviderHealthRegistry
+from quote_client import SINA_LINE_PATTERN, TENCENT_LINE_PATTERN, BatchQuoteClient, parse_quote_response
+from stock_data_fetcher import StockDataFetcher
+from stub_server import StubServer
+
+# 录制的行情行（新浪为GBK编码、逗号分隔；腾讯为 ~ 分隔）
+SINA_RECORDED = {
+    'sh600000': 'var hq_str_sh600000="浦发银行,7.010,7.000,7.050,7.080,6.980,7.040,7.050,32541256,228456789.000,'
+                '112300,7.040,98700,7.030,45600,7.020,56700,7.010,12300,7.000,45600,7.050,23400,7.060,'
+                '34500,7.070,45600,7.080,56700,7.090,2024-01-05,15:00:00,00,";',
+    'sz000001': 'var hq_str_sz000001="平安银行,9.120,9.100,9.250,9.300,9.080,9.240,9.250,85412563,786541236.000,'
+                '212300,9.240,198700,9.230,145600,9.220,156700,9.210,112300,9.200,145600,9.250,123400,9.260,'
+                '134500,9.270,145600,9.280,156700,9.290,2024-01-05,15:00:00,00,";',
+    'sh600036': 'var hq_str_sh600036="招商银行,31.500,31.200,31.800,32.000,31.400,31.790,31.800,45123658,1431256987.000,'
+                '12300,31.790,9870,31.780,4560,31.770,5670,31.760,1230,31.750,4560,31.800,2340,31.810,'
+                '3450,31.820,4560,31.830,5670,31.840,2024-01-05,15:00:00,00,";'
+}
+TENCENT_FIELDS = {
+    'sz000002': ['51', '万科A', '000002', '10.50', '10.30', '10.35', '452136', '225412', '226724'] + ['0'] * 23
+                + ['1.94'] + ['0'] * 17,
+    'sh600519': ['1', '贵州茅台', '600519', '1688.00', '1700.00', '1699.00', '25413', '12541', '12872'] + ['0'] * 23
+                + ['-0.71'] + ['0'] * 17
+}
+TENCENT_RECORDED = {symbol: f'v_{symbol}="{"~".join(fields)}";' for symbol, fields in TENCENT_FIELDS.items()}
+
+
+def replay(recorded, miss_template):
+    """按请求中的代码列表回放录制的行，未录制的代码返回空行情（与真实接口一致）"""
+    def responder(method, path, body):
+        symbols = unquote(path.split('=', 1)[1]).split(',')
+        lines = [recorded.get(symbol, miss_template.format(symbol=symbol)) for symbol in symbols]
+        return 200, {'Content-Type': 'text/plain; charset=GBK'}, '\n'.join(lines).encode('gbk')
+    return responder
+
+
+class BatchQuoteClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sina = StubServer(replay(SINA_RECORDED, 'var hq_str_{symbol}="";'))
+        self.tencent = StubServer(replay(TENCENT_RECORDED, 'v_pv_none_match="1";'))
+
+    def tearDown(self):
+        self.sina.close()
+        self.tencent.close()
+
+    def make_client(self, batch_size=50):
+        return BatchQuoteClient(batch_size=batch_size, timeout=5,
+                                sina_url=self.sina.base_url + '/list={symbols}',
+                                tencent_url=self.tencent.base_url + '/q={symbols}',
+                                health=ProviderHealthRegistry(rates={'sina': 1000, 'tencent': 1000}))
+
+    def test_parse_multi_line_response(self):
+        content = '\n'.join(SINA_RECORDED.values()) + '\nvar hq_str_sz300750="";'
+        quotes = parse_quote_response(content, SINA_LINE_PATTERN, ',')
+        self.assertEqual(set(quotes), {'sh600000', 'sz000001', 'sh600036'})
+        self.assertEqual(quotes['sh600000'][0], '浦发银行')
+        self.assertEqual(quotes['sz000001'][3], '9.250')
+        self.assertEqual(quotes['sh600036'][30], '2024-01-05')
+
+        quotes = parse_quote_response('\n'.join(TENCENT_RECORDED.values()), TENCENT_LINE_PATTERN, '~')
+        self.assertEqual(quotes['sz000002'][1], '万科A')
+        self.assertEqual(quotes['sh600519'][32], '-0.71')
+
+    def test_fetch_maps_quotes_back_to_codes(self):
+        client = self.make_client()
+        quotes = client.fetch_sina(['sz000001', 'sh600000', 'sz300750'])
+        self.assertEqual(set(quotes), {'sz000001', 'sh600000'})
+        self.assertEqual(quotes['sh600000'][0], '浦发银行')
+        self.assertEqual(quotes['sz000001'][0], '平安银行')
+
+        quotes = client.fetch_tencent(['sh600519', 'sz000002'])
+        self.assertEqual(quotes['sh600519'][2], '600519')
+        self.assertEqual(quotes['sz000002'][3], '10.50')
+
+    def test_symbols_are_packed_batch_size_per_request(self):
+        client = self.make_client(batch_size=2)
+        symbols = ['sh600000', 'sz000001', 'sh600036', 'sz300750', 'sh601318']
+        quotes = client.fetch_sina(symbols)
+
+        requested = [unquote(path.split('=', 1)[1]).split(',') for path in self.sina.paths()]
+        self.assertEqual(len(requested), 3)
+        self.assertEqual(client.request_count, 3)
+        self.assertTrue(all(len(chunk) <= 2 for chunk in requested))
+        self.assertEqual(sorted(sum(requested, [])), sorted(symbols))
+        self.assertEqual(set(quotes), {'sh600000', 'sz000001', 'sh600036'})
+
+    def test_only_misses_are_requeued_to_next_provider(self):
+        fetcher = StockDataFetcher(health=ProviderHealthRegistry(rates={'sina': 1000, 'tencent': 1000}))
+        fetcher.quote_client = self.make_client(batch_size=2)
+        pool = [('600000', '浦发银行'), ('000001', '平安银行'), ('000002', '万科A'),
+                ('600036', '招商银行'), ('600519', '贵州茅台'), ('300750', '宁德时代')]
+
+        results = fetcher._fetch_batch_quotes(pool, 'A')
+
+        tencent_symbols = sum((unquote(path.split('=', 1)[1]).split(',') for path in self.tencent.paths()), [])
+        self.assertEqual(sorted(tencent_symbols), ['sh600519', 'sz000002', 'sz300750'])
+        self.assertEqual({code: source for code, (_, source) in results.items()}, {
+            '600000': 'sina', '000001': 'sina', '600036': 'sina', '000002': 'tencent', '600519': 'tencent'
+        })
+        self.assertEqual(results['000001'][0]['current_price'], 9.25)
+        self.assertEqual(results['600519'][0]['change_percent'], -0.71)
+        self.assertNotIn('300750', results)
+
+
+if __name__ == '__main__':
+    unittest.main()
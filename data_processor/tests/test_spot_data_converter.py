@@ -0,0 +1,40 @@
+# 行情快照转换测试 - 过滤无效行情与按代码查询时保留停牌股票
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spot_data_converter import A_SPOT_COLUMNS, STANDARD_FIELDS, normalize_spot_frame
+
+SPOT = pd.DataFrame({
+    '代码': ['600000', '000001', '600001', ''],
+    '名称': ['浦发银行', '平安银行', '', '无代码'],
+    '最新价': [7.05, None, 0.0, 1.0],
+    '涨跌幅': [0.5, None, 0.0, 0.0],
+    '成交量': [32541256, None, 0, 0],
+    '总市值': [2.0e11, 1.8e11, 0, 0]
+})
+
+
+class NormalizeSpotFrameTest(unittest.TestCase):
+
+    def test_drops_zero_price_and_unnamed_rows_by_default(self):
+        normalized = normalize_spot_frame(SPOT, A_SPOT_COLUMNS, 'A')
+        self.assertEqual(list(normalized.columns), STANDARD_FIELDS)
+        self.assertEqual(normalized['code'].tolist(), ['600000'])
+
+    def test_keeps_suspended_rows_for_code_lookup(self):
+        normalized = normalize_spot_frame(SPOT, A_SPOT_COLUMNS, 'A', drop_invalid=False)
+        self.assertEqual(normalized['code'].tolist(), ['600000', '000001', '600001'])
+
+        suspended = normalized.set_index('code').loc['000001']
+        self.assertEqual(suspended['current_price'], 0.0)
+        self.assertEqual(suspended['volume'], 0)
+        self.assertEqual(suspended['market_cap'], 1.8e11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档流式读写工具
+逐个读取JSON数组中的元素；正文先写入临时文件，最后接在依赖全量统计的头部之后
+"""
+
+import json
+import re
+import shutil
+import tempfile
+from typing import Any, Iterator, TextIO
+
+_VALUE_END = re.compile(r'\s*[,\]]')
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    逐个读取JSON数组文件中的元素（如 complete_ocr_results.json、ocr_progress_*.json），不把整个文件载入内存
+
+    Raises:
+        ValueError: 文件不是JSON数组或内容不完整
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+
+        def fill(size: int) -> bool:
+            nonlocal buffer
+            chunk = f.read(size)
+            buffer += chunk
+            return bool(chunk)
+
+        while not buffer.strip():
+            if not fill(chunk_size):
+                raise ValueError(f"{path} 为空")
+        buffer = buffer.lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} 不是JSON数组")
+        buffer = buffer[1:]
+
+        while True:
+            buffer = buffer.lstrip()
+            if not buffer:
+                if not fill(chunk_size):
+                    raise ValueError(f"{path} 中的JSON数组不完整")
+                continue
+            if buffer[0] == ']':
+                return
+            if buffer[0] == ',':
+                buffer = buffer[1:]
+                continue
+
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # 元素跨越了读取块：按已缓冲的长度加倍读取后重新解析
+                if fill(max(chunk_size, len(buffer))):
+                    continue
+                raise
+            if isinstance(value, (int, float)) and not _VALUE_END.match(buffer, end) and fill(chunk_size):
+                # 数字后面还没读到分隔符时可能被读取块截断（如 "2." 之后才是 "5"），读入后面的内容再解析
+                continue
+            buffer = buffer[end:]
+            yield value
+
+
+def spool() -> TextIO:
+    """正文暂存用的临时文件（较小时留在内存，超过1MB落盘）"""
+    return tempfile.SpooledTemporaryFile(max_size=1 << 20, mode='w+', encoding='utf-8')
+
+
+def append_spool(target: TextIO, spooled: TextIO):
+    """把暂存内容接到目标文件末尾"""
+    spooled.seek(0)
+    shutil.copyfileobj(spooled, target)
@@ -5,10 +5,11 @@
 只保留原始文字内容，去除过度解析
 """
 
-import json
 import time
 import re
 
+from doc_stream import iter_json_array
+
 def extract_clean_text(text, method):
     """提取清洁的原始文字"""
     
@@ -34,9 +35,10 @@ def extract_clean_text(text, method):
 def generate_clean_document():
     """生成清洁版本的完整文档"""
     
-    # 读取完整结果
-    with open('complete_ocr_results.json', 'r', encoding='utf-8') as f:
-        results = json.load(f)
+    # 逐条读取完整结果，边读边写，统计信息累计计数
+    results = iter_json_array('complete_ocr_results.json')
+    total_pages = 0
+    method_stats = {}
     
     # 生成清洁文档
     output_file = "老刘投资笔记_完整文档1_清洁版.txt"
@@ -55,6 +57,8 @@ def generate_clean_document():
             filename = result['filename']
             best_method = result['best_method']
             best_text = result['best_text']
+            total_pages += 1
+            method_stats[best_method] = method_stats.get(best_method, 0) + 1
             
             # 提取清洁文字
             clean_text = extract_clean_text(best_text, best_method)
@@ -67,12 +71,6 @@ def generate_clean_document():
     print(f"✓ 清洁版完整文档已生成: {output_file}")
     
     # 统计信息
-    total_pages = len(results)
-    method_stats = {}
-    for result in results:
-        method = result['best_method']
-        method_stats[method] = method_stats.get(method, 0) + 1
-    
     print(f"\n📊 完整处理统计:")
     print(f"  总页数: {total_pages}")
     print(f"  成功率: 100%")
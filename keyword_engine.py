@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键词引擎
+文本只切分一次句子；所有类别的字面关键词合成一个 Aho-Corasick 自动机，一次扫描全部命中；
+含正则语法的模式合并为一个预编译的选择表达式。结果为 类别 -> 命中的句子
+"""
+
+import re
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+SENTENCE_DELIMITERS = '。！？'
+
+_DELIMITER_PATTERNS = {}
+
+
+def split_sentences(text: str, delimiters: str = SENTENCE_DELIMITERS) -> Tuple[List[str], List[int]]:
+    """
+    按句末标点切分
+
+    Returns:
+        (句子列表, 各句在原文中的起始位置)；句子不含句末标点，与 [^。！？]* 匹配出的片段一致
+    """
+    pattern = _DELIMITER_PATTERNS.get(delimiters)
+    if pattern is None:
+        pattern = _DELIMITER_PATTERNS[delimiters] = re.compile(f'[{re.escape(delimiters)}]')
+
+    sentences, starts = [], [0]
+    position = 0
+    for match in pattern.finditer(text):
+        sentences.append(text[position:match.start()])
+        position = match.end()
+        starts.append(position)
+    sentences.append(text[position:])
+    return sentences, starts
+
+
+def iter_unique(items: Iterable[str], min_length: int, strip_chars: Optional[str] = None) -> Iterator[str]:
+    """逐个清理（去掉首尾 strip_chars）并保序去重，只产出长度大于 min_length 的首次出现项"""
+    seen = set()
+    for item in items:
+        item = item.strip(strip_chars)
+        if len(item) > min_length and item not in seen:
+            seen.add(item)
+            yield item
+
+
+def _unit_of(starts: List[int], start: int, end: int) -> Optional[int]:
+    """命中所在的句子（或行）序号；命中跨越分隔符时返回None"""
+    unit = bisect_right(starts, start) - 1
+    if unit + 1 < len(starts) and end > starts[unit + 1] - 1:
+        return None
+    return unit
+
+
+def _append_unit(bucket: List[int], unit: Optional[int]):
+    # 同一模式的命中按位置有序产出，只需和上一个比较
+    if unit is not None and (not bucket or bucket[-1] != unit):
+        bucket.append(unit)
+
+
+def _fold(text: str) -> str:
+    """转小写且保持长度不变（个别字符转小写后会变长，这类字符保持原样）"""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机，扫描一遍文本得到所有关键词（含互相重叠的）的出现位置"""
+
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for keyword_id, keyword in enumerate(self.keywords):
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append(keyword_id)
+
+        # 按层建立失配指针，并把失配节点的输出并入当前节点（第一层节点的失配指针即根节点）
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """按结束位置顺序产出 (关键词序号, 结束位置)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for keyword_id in output[node]:
+                yield keyword_id, position + 1
+
+
+class KeywordEngine:
+    """
+    多类别关键词匹配
+    - 字面关键词（不含正则语法）进入同一个自动机，同一关键词可属于多个类别
+    - 其余模式合并为一个带先行断言的选择表达式，逐位置匹配；同一位置多个正则都能匹配时只记第一个
+    """
+
+    def __init__(self, categories: Dict[str, Sequence[str]], ignore_case: bool = True):
+        """
+        Args:
+            categories: 类别 -> 模式列表（字面关键词或正则）
+            ignore_case: 是否忽略大小写（同 re.IGNORECASE）
+        """
+        self.categories = {category: list(patterns) for category, patterns in categories.items()}
+        self.ignore_case = ignore_case
+
+        literal_owners = {}
+        regex_owners = []
+        for category, patterns in self.categories.items():
+            for index, pattern in enumerate(patterns):
+                if re.escape(pattern) == pattern:
+                    keyword = _fold(pattern) if ignore_case else pattern
+                    literal_owners.setdefault(keyword, []).append((category, index))
+                else:
+                    regex_owners.append((category, index, pattern))
+
+        self._literal_owners = list(literal_owners.values())
+        self._automaton = AhoCorasick(list(literal_owners))
+        self._regex_owners = [(category, index) for category, index, _ in regex_owners]
+        self._regex = None
+        if regex_owners:
+            alternation = '|'.join(f'(?P<p{i}>{pattern})' for i, (_, _, pattern) in enumerate(regex_owners))
+            self._regex = re.compile(f'(?=(?:{alternation}))', re.IGNORECASE if ignore_case else 0)
+
+    def find(self, text: str) -> Iterator[Tuple[str, int, int, int]]:
+        """
+        所有命中
+
+        Returns:
+            (类别, 模式序号, 起始位置, 结束位置) 的迭代器；先产出字面关键词，再产出正则命中，各自按位置有序
+        """
+        scan_text = _fold(text) if self.ignore_case else text
+        keywords = self._automaton.keywords
+        for keyword_id, end in self._automaton.iter_matches(scan_text):
+            start = end - len(keywords[keyword_id])
+            for category, index in self._literal_owners[keyword_id]:
+                yield category, index, start, end
+
+        if self._regex is not None:
+            for match in self._regex.finditer(text):
+                for name, value in match.groupdict().items():
+                    if value is not None:
+                        category, index = self._regex_owners[int(name[1:])]
+                        yield category, index, match.start(name), match.end(name)
+                        break
+
+    def sentence_hits(self, text: str) -> Dict[str, List[str]]:
+        """
+        类别 -> 命中的句子
+
+        每个模式对每个句子最多命中一次，列表按模式顺序、同一模式内按句子顺序排列，
+        与对每个模式依次执行 re.findall(f'[^。！？]*{pattern}[^。！？]*', text) 并拼接的结果一致
+        """
+        sentences, starts = split_sentences(text)
+        buckets = {category: [[] for _ in patterns] for category, patterns in self.categories.items()}
+
+        for category, index, start, end in self.find(text):
+            # 跨句的正则命中不算（原写法的片段不含句末标点）
+            _append_unit(buckets[category][index], _unit_of(starts, start, end))
+
+        return {
+            category: [sentences[sentence] for bucket in category_buckets for sentence in bucket]
+            for category, category_buckets in buckets.items()
+        }
+
+
+class QuoteMatcher:
+    """
+    金句候选匹配，三类模式共用一个 KeywordEngine，文本只扫描一遍
+    - 片段模式（如引号包围的内容）：与 re.findall(pattern, text) 相同的不重叠匹配
+    - 行标记词（破折号、投资大师名字）：含该词的整行，同 re.findall(f'.*{keyword}.*', text, re.MULTILINE)
+    - 句标记词（人名）：含该词的整句，同 re.findall(f'[^。！？]*{keyword}[^。！？]*', text)
+    """
+
+    def __init__(self, span_patterns: Sequence[str], line_keywords: Sequence[str],
+                 sentence_keywords: Sequence[str] = ()):
+        self.engine = KeywordEngine({
+            'spans': span_patterns,
+            'lines': line_keywords,
+            'sentences': sentence_keywords
+        })
+
+    def iter_quotes(self, text: str) -> Iterator[str]:
+        """按 片段模式、行标记词、句标记词 的顺序逐个产出候选（未清理、未去重）"""
+        categories = self.engine.categories
+        spans = [[] for _ in categories['spans']]
+        line_buckets = [[] for _ in categories['lines']]
+        sentence_buckets = [[] for _ in categories['sentences']]
+        lines, line_starts = split_sentences(text, '\n')
+        sentences, sentence_starts = split_sentences(text)
+
+        for category, index, start, end in self.engine.find(text):
+            if category == 'spans':
+                # 先行断言会在每个位置都给出匹配，跳过与上一个重叠的，和 findall 一致
+                bucket = spans[index]
+                if not bucket or start >= bucket[-1][1]:
+                    bucket.append((start, end))
+            elif category == 'lines':
+                _append_unit(line_buckets[index], _unit_of(line_starts, start, end))
+            else:
+                _append_unit(sentence_buckets[index], _unit_of(sentence_starts, start, end))
+
+        for bucket in spans:
+            for start, end in bucket:
+                yield text[start:end]
+        for bucket in line_buckets:
+            for line in bucket:
+                yield lines[line]
+        for bucket in sentence_buckets:
+            for sentence in bucket:
+                yield sentences[sentence]
@@ -6,13 +6,17 @@
 """
 
 import os
-import base64
+import sys
 import json
 import time
-import requests
 from pathlib import Path
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_processor'))
+from llm_client import CHAT_COMPLETIONS_PATH, chat_completion_text, get_shared_llm_client
+from ocr_pipeline import OCRPipeline, encode_image
+from ocr_preprocess import ImagePreprocessor
+
 def get_sorted_image_files(directory):
     """获取按文件名排序的图片文件列表"""
     image_dir = Path(directory)
@@ -31,18 +35,18 @@ def get_sorted_image_files(directory):
     sorted_files = sorted(image_files, key=extract_number)
     return [str(f) for f in sorted_files]
 
-def extract_text_from_image(image_path, api_key):
-    """从图片中提取文字"""
-    
-    base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+def extract_text_from_image(image_path, api_key, preprocessor=None):
+    """从图片中提取文字（preprocessor 为 ImagePreprocessor 时先缩小再编码）"""
     
     # 编码图片
     with open(image_path, 'rb') as image_file:
-        base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+        data = image_file.read()
+    processed = preprocessor.process(data) if preprocessor is not None else data
+    image_url = encode_image(processed, image_path, 'image/jpeg' if processed is not data else None)
+    return recognize_image_url(image_url, api_key)
+
+def recognize_image_url(image_url, api_key):
+    """识别已编码的图片（image_url 为 data URL）"""
     
     # 构建请求数据
     payload = {
@@ -54,7 +58,7 @@ def extract_text_from_image(image_path, api_key):
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
+                            "url": image_url
                         }
                     },
                     {
@@ -68,20 +72,12 @@ def extract_text_from_image(image_path, api_key):
         "max_tokens": 4096
     }
     
-    # 发送请求
-    response = requests.post(
-        f"{base_url}/chat/completions",
-        headers=headers,
-        json=payload,
-        timeout=60
-    )
-    
-    if response.status_code == 200:
-        result = response.json()
-        extracted_text = result['choices'][0]['message']['content'].strip()
-        return extracted_text
-    else:
-        error_msg = f"API调用失败，状态码: {response.status_code}"
+    # 发送请求（共享客户端按配额调度，429/5xx自动退避重试）
+    try:
+        result = get_shared_llm_client(api_key).complete(CHAT_COMPLETIONS_PATH, payload, timeout=60)
+        return chat_completion_text(result)
+    except Exception as e:
+        error_msg = f"API调用失败: {e}"
         print(f"❌ {error_msg}")
         return f"[OCR识别失败: {error_msg}]"
 
@@ -108,24 +104,24 @@ def main():
         f.write(f"# 处理时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write(f"# 处理文件数: {len(test_files)}\n\n")
         
-        for i, image_path in enumerate(test_files, 1):
+        def write_page(index, image_path, extracted_text):
+            i = index + 1
             filename = os.path.basename(image_path)
-            print(f"[{i}/{len(test_files)}] 处理: {filename}")
-            
-            # 提取文字
-            extracted_text = extract_text_from_image(image_path, API_KEY)
             
-            # 写入文件
+            # 写入文件（识别并发进行，写出按页序）
             f.write(f"## 第{i}页 - {filename}\n\n")
             f.write(f"{extracted_text}\n\n")
             f.write("-" * 80 + "\n\n")
             
-            print(f"✓ 完成: {filename}")
-            
-            # 避免API调用过快
-            time.sleep(2)
+            print(f"[{i}/{len(test_files)}] ✓ 完成: {filename}")
+        
+        preprocessor = ImagePreprocessor()
+        pipeline = OCRPipeline(lambda image_url, filename: recognize_image_url(image_url, API_KEY),
+                               max_workers=4, preprocessor=preprocessor)
+        pipeline.run(test_files, on_result=write_page)
     
     print("=" * 50)
+    print(preprocessor.report())
     print(f"✓ 批次1处理完成！结果已保存到: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
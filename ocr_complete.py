@@ -6,13 +6,17 @@
 """
 
 import os
-import base64
+import sys
 import json
 import time
-import requests
 from pathlib import Path
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_processor'))
+from llm_client import CHAT_COMPLETIONS_PATH, chat_completion_text, get_shared_llm_client
+from ocr_pipeline import OCRPipeline, encode_image
+from ocr_preprocess import ImagePreprocessor
+
 def get_sorted_image_files(directory):
     """获取按文件名排序的图片文件列表"""
     image_dir = Path(directory)
@@ -31,61 +35,52 @@ def get_sorted_image_files(directory):
     sorted_files = sorted(image_files, key=extract_number)
     return [str(f) for f in sorted_files]
 
-def extract_text_from_image(image_path, api_key):
-    """从图片中提取文字"""
-    
-    base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+def extract_text_from_image(image_path, api_key, preprocessor=None):
+    """从图片中提取文字（preprocessor 为 ImagePreprocessor 时先缩小再编码）"""
     
+    # 编码图片（读取或预处理失败同样返回失败标记，不中断整批处理）
     try:
-        # 编码图片
         with open(image_path, 'rb') as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-        
-        # 构建请求数据
-        payload = {
-            "model": "qwen-vl-max-latest",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        },
-                        {
-                            "type": "text",
-                            "text": "请准确识别图片中的所有手写文字内容，保持原有的换行和标点符号，不要添加任何解释或分析，只输出识别到的文字内容。"
+            data = image_file.read()
+        processed = preprocessor.process(data) if preprocessor is not None else data
+        image_url = encode_image(processed, image_path, 'image/jpeg' if processed is not data else None)
+    except Exception as e:
+        error_msg = f"处理失败: {str(e)}"
+        print(f"❌ {error_msg}")
+        return f"[OCR识别失败: {error_msg}]"
+    return recognize_image_url(image_url, api_key)
+
+def recognize_image_url(image_url, api_key):
+    """识别已编码的图片（image_url 为 data URL）"""
+    
+    # 构建请求数据
+    payload = {
+        "model": "qwen-vl-max-latest",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
                         }
-                    ]
-                }
-            ],
-            "temperature": 0.1,
-            "max_tokens": 4096
-        }
-        
-        # 发送请求
-        response = requests.post(
-            f"{base_url}/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=120
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            extracted_text = result['choices'][0]['message']['content'].strip()
-            return extracted_text
-        else:
-            error_msg = f"API调用失败，状态码: {response.status_code}"
-            print(f"❌ {error_msg}")
-            return f"[OCR识别失败: {error_msg}]"
-            
+                    },
+                    {
+                        "type": "text",
+                        "text": "请准确识别图片中的所有手写文字内容，保持原有的换行和标点符号，不要添加任何解释或分析，只输出识别到的文字内容。"
+                    }
+                ]
+            }
+        ],
+        "temperature": 0.1,
+        "max_tokens": 4096
+    }
+    
+    # 发送请求（共享客户端按配额调度，429/5xx自动退避重试）
+    try:
+        result = get_shared_llm_client(api_key).complete(CHAT_COMPLETIONS_PATH, payload, timeout=120)
+        return chat_completion_text(result)
     except Exception as e:
         error_msg = f"处理失败: {str(e)}"
         print(f"❌ {error_msg}")
@@ -114,24 +109,24 @@ def main():
         f.write(f"# 处理时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write(f"# 处理文件数: {len(remaining_files)}\n\n")
         
-        for i, image_path in enumerate(remaining_files, 6):  # 从第6个开始编号
+        def write_page(index, image_path, extracted_text):
+            i = index + 6
             filename = os.path.basename(image_path)
-            print(f"[{i}/{len(image_files)}] 处理: {filename}")
-            
-            # 提取文字
-            extracted_text = extract_text_from_image(image_path, API_KEY)
             
-            # 写入文件
+            # 写入文件（识别并发进行，写出按页序）
             f.write(f"## 第{i}页 - {filename}\n\n")
             f.write(f"{extracted_text}\n\n")
             f.write("-" * 80 + "\n\n")
             
-            print(f"✓ 完成: {filename}")
-            
-            # 避免API调用过快
-            time.sleep(2)
+            print(f"[{i}/{len(image_files)}] ✓ 完成: {filename}")
+        
+        preprocessor = ImagePreprocessor()
+        pipeline = OCRPipeline(lambda image_url, filename: recognize_image_url(image_url, API_KEY),
+                               max_workers=4, preprocessor=preprocessor)
+        pipeline.run(remaining_files, on_result=write_page)
     
     print("=" * 50)
+    print(preprocessor.report())
     print(f"✓ 剩余文件处理完成！结果已保存到: {OUTPUT_FILE}")
     print(f"现在需要合并batch1和complete两个文件")
 
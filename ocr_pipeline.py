@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR流水线
+读取 -> 预处理并编码 -> 并发识别 -> 按页序写出，每张图片只读取和编码一次
+整批耗时取决于接口并发数，而不是各页耗时之和
+"""
+
+import base64
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from ocr_preprocess import ImagePreprocessor
+
+MIME_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp'}
+
+
+def encode_image(data: bytes, image_path: str, mime: Optional[str] = None) -> str:
+    """图片内容转为 data URL（mime 默认按扩展名判断）"""
+    mime = mime or MIME_TYPES.get(os.path.splitext(image_path)[1].lower(), 'image/jpeg')
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+class OCRPipeline:
+    def __init__(self, recognize: Callable[[str, str], str], max_workers: int = 4, read_ahead: int = 4,
+                 preprocessor: Optional[ImagePreprocessor] = None):
+        """
+        Args:
+            recognize: 识别函数，参数为 (图片的 data URL, 文件名)，返回识别文字
+            max_workers: 同时在途的识别请求数
+            read_ahead: 读取阶段最多预读的图片数
+            preprocessor: 编码前的图片预处理（缩放、灰度等），None 表示发送原图
+        """
+        self.recognize = recognize
+        self.max_workers = max_workers
+        self.read_ahead = read_ahead
+        self.preprocessor = preprocessor
+
+    def run(self, image_files: List[str],
+            on_result: Optional[Callable[[int, str, str], None]] = None) -> List[str]:
+        """
+        处理一批图片
+
+        Args:
+            image_files: 图片路径（按页序，如 get_sorted_image_files 的结果）
+            on_result: 按页序回调 (序号, 图片路径, 识别文字)，用于边识别边写文件
+
+        Returns:
+            与 image_files 顺序一致的识别文字；读取或识别出错的页为 "[OCR识别失败: ...]"
+        """
+        total = len(image_files)
+        results = [None] * total
+        if total == 0:
+            return results
+
+        read_queue = queue.Queue(maxsize=self.read_ahead)
+        done_queue = queue.Queue()
+        # 在途 + 已完成但尚未按序写出的页数上限，页序靠前的慢请求不会让缓冲无限增长
+        window = threading.BoundedSemaphore(self.max_workers * 2)
+
+        def reader():
+            for index, image_path in enumerate(image_files):
+                try:
+                    with open(image_path, 'rb') as image_file:
+                        data = image_file.read()
+                except OSError as e:
+                    data = e
+                read_queue.put((index, image_path, data))
+
+        def recognize(data_url: str, filename: str) -> str:
+            try:
+                text = self.recognize(data_url, filename)
+                return '' if text is None else text
+            except Exception as e:
+                return f"[OCR识别失败: {str(e)}]"
+
+        def encoder(executor: ThreadPoolExecutor):
+            for _ in range(total):
+                index, image_path, data = read_queue.get()
+                window.acquire()
+                if isinstance(data, Exception):
+                    done_queue.put((index, f"[OCR识别失败: {str(data)}]"))
+                    continue
+                try:
+                    if self.preprocessor is not None:
+                        processed = self.preprocessor.process(data)
+                        # 预处理失败时返回的是原图，按原扩展名编码
+                        image_url = encode_image(processed, image_path, 'image/jpeg' if processed is not data else None)
+                    else:
+                        image_url = encode_image(data, image_path)
+                except Exception as e:
+                    # 编码线程不能退出，否则写出端会一直等这一页
+                    done_queue.put((index, f"[OCR识别失败: {str(e)}]"))
+                    continue
+                future = executor.submit(recognize, image_url, os.path.basename(image_path))
+                future.add_done_callback(lambda f, index=index: done_queue.put((index, f.result())))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ocr-api") as executor:
+            threading.Thread(target=reader, name="ocr-reader", daemon=True).start()
+            threading.Thread(target=encoder, args=(executor,), name="ocr-encoder", daemon=True).start()
+
+            # 按页序写出：结果乱序到达时先缓存，等前面的页完成再依次回调
+            next_index = 0
+            while next_index < total:
+                index, text = done_queue.get()
+                results[index] = text
+                while next_index < total and results[next_index] is not None:
+                    if on_result is not None:
+                        on_result(next_index, image_files[next_index], results[next_index])
+                    window.release()
+                    next_index += 1
+
+        return results
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR图片预处理
+自动旋正 -> 灰度 -> 缩放到目标长边 -> 增强对比度 -> 按调好的质量重新编码为JPEG
+结果按原图内容哈希缓存到磁盘，原图不做任何修改
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, ImageEnhance
+
+PREPROCESS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'ocr_preprocessed')
+
+# investnotebook 中的笔记图片（约1280x1810）按默认参数处理后体积约减半
+DEFAULT_PREPROCESS = {
+    'long_edge': 1600,   # 长边像素，短于此值的图片不放大
+    'contrast': 1.5,     # 对比度增强倍数，1.0 为不变
+    'quality': 80        # JPEG质量
+}
+
+
+class ImagePreprocessor:
+    def __init__(self, cache_dir: Optional[str] = PREPROCESS_CACHE_DIR, options: Optional[Dict] = None):
+        """
+        Args:
+            cache_dir: 预处理结果缓存目录，None 表示不缓存
+            options: 预处理参数，默认 DEFAULT_PREPROCESS
+        """
+        self.cache_dir = cache_dir
+        self.options = dict(DEFAULT_PREPROCESS, **(options or {}))
+        # 参数变化时缓存自动失效
+        self._options_tag = hashlib.sha256(
+            json.dumps(self.options, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:8]
+        self._lock = threading.Lock()
+        self.stats = {'images': 0, 'cache_hits': 0, 'failures': 0, 'original_bytes': 0, 'processed_bytes': 0}
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def process(self, data: bytes) -> bytes:
+        """
+        预处理一张图片
+
+        Args:
+            data: 原图内容
+
+        Returns:
+            JPEG内容；无法解码或处理后反而更大时返回原图内容
+        """
+        cache_path = None
+        if self.cache_dir:
+            source_hash = hashlib.sha256(data).hexdigest()
+            cache_path = os.path.join(self.cache_dir, f"{source_hash}_{self._options_tag}.jpg")
+            try:
+                with open(cache_path, 'rb') as cached:
+                    processed = cached.read()
+            except OSError:
+                processed = None
+            if processed:
+                self._record(data, processed, cache_hit=True)
+                return processed
+
+        try:
+            processed = self._transform(data)
+        except Exception as e:
+            print(f"⚠️ 图片预处理失败，使用原图: {e}")
+            with self._lock:
+                self.stats['failures'] += 1
+            processed = data
+
+        if len(processed) >= len(data):
+            processed = data
+        elif cache_path:
+            # 先写临时文件再替换，并发处理同一张图时不会读到半个文件；写缓存失败（磁盘满、只读目录）不影响本次结果
+            temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_path, 'wb') as cached:
+                    cached.write(processed)
+                os.replace(temp_path, cache_path)
+            except OSError as e:
+                print(f"⚠️ 预处理缓存写入失败: {e}")
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+        self._record(data, processed, cache_hit=False)
+        return processed
+
+    def process_file(self, image_path: str) -> bytes:
+        """读取并预处理图片文件"""
+        with open(image_path, 'rb') as image_file:
+            return self.process(image_file.read())
+
+    def report(self) -> str:
+        """字节节省情况"""
+        with self._lock:
+            stats = dict(self.stats)
+        original, processed = stats['original_bytes'], stats['processed_bytes']
+        saved = original - processed
+        ratio = saved / original * 100 if original else 0.0
+        return (f"图片预处理: {stats['images']} 张（缓存命中 {stats['cache_hits']}，失败 {stats['failures']}），"
+                f"{original / 1024:.0f}KB -> {processed / 1024:.0f}KB，节省 {saved / 1024:.0f}KB ({ratio:.1f}%)")
+
+    def _transform(self, data: bytes) -> bytes:
+        options = self.options
+        with Image.open(io.BytesIO(data)) as image:
+            # 按EXIF方向旋正，再转灰度（手写笔记颜色不影响识别）
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('L')
+
+            long_edge = max(image.size)
+            if long_edge > options['long_edge']:
+                scale = options['long_edge'] / long_edge
+                image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                     Image.LANCZOS)
+
+            if options['contrast'] != 1.0:
+                image = ImageEnhance.Contrast(image).enhance(options['contrast'])
+
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=options['quality'], optimize=True)
+            return output.getvalue()
+
+    def _record(self, original: bytes, processed: bytes, cache_hit: bool):
+        with self._lock:
+            self.stats['images'] += 1
+            self.stats['original_bytes'] += len(original)
+            self.stats['processed_bytes'] += len(processed)
+            if cache_hit:
+                self.stats['cache_hits'] += 1
@@ -6,86 +6,93 @@
 """
 
 import os
+import sys
 import base64
 import json
 import time
-import requests
 from pathlib import Path
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_processor'))
+from llm_client import CHAT_COMPLETIONS_PATH, LLMClient, chat_completion_text, get_shared_llm_client
+from ocr_pipeline import OCRPipeline
+from ocr_preprocess import ImagePreprocessor
 
 class QwenOCRProcessor:
-    def __init__(self, api_key: str):
-        """初始化OCR处理器"""
+    def __init__(self, api_key: str, llm_client: Optional[LLMClient] = None,
+                 preprocessor: Optional[ImagePreprocessor] = None, preprocess: bool = True):
+        """
+        初始化OCR处理器（请求经共享客户端按配额调度、失败自动退避重试）
+        
+        Args:
+            preprocessor: 图片预处理器，默认使用 DEFAULT_PREPROCESS 参数并缓存到 cache/ocr_preprocessed
+            preprocess: 为False时发送原图
+        """
         self.api_key = api_key
-        self.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        self.headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+        self.client = llm_client if llm_client is not None else get_shared_llm_client(api_key)
+        if preprocess:
+            self.preprocessor = preprocessor if preprocessor is not None else ImagePreprocessor()
+        else:
+            self.preprocessor = None
         
     def encode_image_to_base64(self, image_path: str) -> str:
-        """将图片文件转换为base64编码"""
+        """将图片文件转换为base64编码（启用预处理时编码的是缩小后的JPEG）"""
         with open(image_path, 'rb') as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+            data = image_file.read()
+        if self.preprocessor is not None:
+            data = self.preprocessor.process(data)
+        return base64.b64encode(data).decode('utf-8')
     
     def extract_text_from_image(self, image_path: str, retry_count: int = 3) -> str:
-        """从图片中提取文字"""
-        for attempt in range(retry_count):
-            try:
-                # 编码图片
-                base64_image = self.encode_image_to_base64(image_path)
-                
-                # 构建请求数据
-                payload = {
-                    "model": "qwen-vl-max-latest",
-                    "messages": [
+        """从图片中提取文字（retry_count 为总尝试次数，仅429/5xx/网络错误会重试）"""
+        try:
+            # 编码图片
+            base64_image = self.encode_image_to_base64(image_path)
+        except Exception as e:
+            print(f"✗ 处理失败: {os.path.basename(image_path)} - {str(e)}")
+            return f"[OCR识别失败: {str(e)}]"
+        
+        return self.recognize_image_url(f"data:image/jpeg;base64,{base64_image}",
+                                        os.path.basename(image_path), retry_count)
+    
+    def build_payload(self, image_url: str) -> Dict:
+        """构建识别请求（image_url 为已编码的 data URL）"""
+        return {
+            "model": "qwen-vl-max-latest",
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": image_url
+                            }
+                        },
                         {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "请准确识别图片中的所有手写文字内容，保持原有的换行和标点符号，不要添加任何解释或分析，只输出识别到的文字内容。"
-                                }
-                            ]
+                            "type": "text",
+                            "text": "请准确识别图片中的所有手写文字内容，保持原有的换行和标点符号，不要添加任何解释或分析，只输出识别到的文字内容。"
                         }
-                    ],
-                    "temperature": 0.1,
-                    "max_tokens": 4096
+                    ]
                 }
-                
-                # 发送请求
-                response = requests.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload,
-                    timeout=60
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    extracted_text = result['choices'][0]['message']['content'].strip()
-                    print(f"✓ 成功处理: {os.path.basename(image_path)}")
-                    return extracted_text
-                else:
-                    error_msg = f"API调用失败，状态码: {response.status_code}, 响应: {response.text}"
-                    print(f"✗ API错误: {error_msg}")
-                    raise Exception(error_msg)
-                
-            except Exception as e:
-                print(f"✗ 处理失败 (尝试 {attempt + 1}/{retry_count}): {os.path.basename(image_path)} - {str(e)}")
-                if attempt < retry_count - 1:
-                    time.sleep(2)  # 重试前等待2秒
-                else:
-                    return f"[OCR识别失败: {str(e)}]"
-        
-        return "[OCR识别失败: 超过最大重试次数]"
+            ],
+            "temperature": 0.1,
+            "max_tokens": 4096
+        }
+    
+    def recognize_image_url(self, image_url: str, name: str = "", retry_count: int = 3) -> str:
+        """识别已编码的图片，重试时复用同一份请求体"""
+        try:
+            result = self.client.complete(CHAT_COMPLETIONS_PATH, self.build_payload(image_url),
+                                          timeout=60, max_retries=retry_count - 1)
+            extracted_text = chat_completion_text(result)
+            print(f"✓ 成功处理: {name}")
+            return extracted_text
+            
+        except Exception as e:
+            print(f"✗ 处理失败: {name} - {str(e)}")
+            return f"[OCR识别失败: {str(e)}]"
 
     def get_sorted_image_files(self, directory: str) -> List[str]:
         """获取按文件名排序的图片文件列表"""
@@ -105,15 +112,15 @@ class QwenOCRProcessor:
         sorted_files = sorted(image_files, key=extract_number)
         return [str(f) for f in sorted_files]
 
-    def batch_process_images(self, directory: str, output_file: str = None) -> Dict[str, str]:
-        """批量处理图片文件"""
+    def batch_process_images(self, directory: str, output_file: str = None, max_workers: int = 4) -> Dict[str, str]:
+        """批量处理图片文件（读取、编码、并发识别流水线执行，按页序写出）"""
         if output_file is None:
             output_file = "laoliu_notes_ocr_raw.txt"
         
         image_files = self.get_sorted_image_files(directory)
         results = {}
         
-        print(f"开始处理 {len(image_files)} 个图片文件...")
+        print(f"开始处理 {len(image_files)} 个图片文件（并发 {max_workers}）...")
         print("=" * 50)
         
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -121,23 +128,22 @@ class QwenOCRProcessor:
             f.write(f"# 处理时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"# 处理文件数: {len(image_files)}\n\n")
             
-            for i, image_path in enumerate(image_files, 1):
+            def write_page(index: int, image_path: str, extracted_text: str):
                 filename = os.path.basename(image_path)
-                print(f"[{i}/{len(image_files)}] 处理: {filename}")
-                
-                # 提取文字
-                extracted_text = self.extract_text_from_image(image_path)
+                print(f"[{index + 1}/{len(image_files)}] 完成: {filename}")
                 results[filename] = extracted_text
                 
                 # 写入文件
-                f.write(f"## 第{i}页 - {filename}\n\n")
+                f.write(f"## 第{index + 1}页 - {filename}\n\n")
                 f.write(f"{extracted_text}\n\n")
                 f.write("-" * 80 + "\n\n")
-                
-                # 避免API调用过快
-                time.sleep(1)
+            
+            pipeline = OCRPipeline(self.recognize_image_url, max_workers=max_workers, preprocessor=self.preprocessor)
+            pipeline.run(image_files, on_result=write_page)
         
         print("=" * 50)
+        if self.preprocessor is not None:
+            print(self.preprocessor.report())
         print(f"✓ 批量处理完成！结果已保存到: {output_file}")
         return results
 
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR结果库
+按 图片内容SHA-256 + 模型 + 提示词 保存识别文字，按 图片 + 识别配置 保存整页的选择结果
+重跑未变化的笔记时直接读库，不再调用接口；每条结果只写入一次（SQLite单条写入即原子提交）
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+OCR_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'ocr_results.db')
+TEXT_TIER = 'ocr_result'
+PAGE_TIER = 'ocr_page'
+
+_shared_stores = {}
+_shared_lock = threading.Lock()
+
+
+def image_sha256(data: bytes) -> str:
+    """图片内容哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """
+    永久结果库
+    保存按内容寻址的计算结果（键已包含全部输入，输入变化即换键），结果不会过时，因此不设有效期也不淘汰
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL, '
+            'PRIMARY KEY (kind, key))'
+        )
+        self._import_legacy_cache()
+        self._conn.commit()
+
+    def get(self, key: str, kind: str) -> Optional[Any]:
+        """读取结果，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM results WHERE kind = ? AND key = ?', (kind, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any, kind: str, replace: bool = True) -> bool:
+        """写入结果（值必须可JSON序列化），replace为False时已有结果不覆盖；返回是否写入"""
+        payload = json.dumps(value, ensure_ascii=False)
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        with self._lock:
+            cursor = self._conn.execute(
+                f'{verb} INTO results (kind, key, value, created_at) VALUES (?, ?, ?, ?)',
+                (kind, key, payload, time.time())
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'entries': entries
+        }
+
+    def _import_legacy_cache(self):
+        """旧版本把结果存在通用缓存表 cache（键为 类别:摘要）中，迁移到 results 表后删除旧表"""
+        legacy = self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'cache'"
+        ).fetchone()
+        if legacy is None:
+            return
+        self._conn.execute(
+            'INSERT OR IGNORE INTO results (kind, key, value, created_at) '
+            'SELECT tier, substr(key, length(tier) + 2), value, created_at FROM cache'
+        )
+        self._conn.execute('DROP TABLE cache')
+
+
+def get_shared_store(db_path: str) -> ResultStore:
+    """获取进程内共享的结果库实例"""
+    with _shared_lock:
+        if db_path not in _shared_stores:
+            _shared_stores[db_path] = ResultStore(db_path)
+        return _shared_stores[db_path]
+
+
+class OCRResultStore:
+    def __init__(self, db_path: str = OCR_STORE_PATH, store: Optional[ResultStore] = None):
+        """
+        Args:
+            db_path: SQLite文件路径
+            store: 直接指定底层结果库（测试时使用临时库）
+        """
+        self.store = store if store is not None else get_shared_store(db_path)
+
+    def get_text(self, image_hash: str, model: str, prompt: str) -> Optional[str]:
+        """已保存的识别文字"""
+        return self.store.get(_digest(image_hash, model, prompt), TEXT_TIER)
+
+    def put_text(self, image_hash: str, model: str, prompt: str, text: str) -> bool:
+        """保存识别文字（失败结果不保存，已有结果不覆盖），返回是否写入"""
+        if not text or text.startswith('['):
+            return False
+        return self.store.put(_digest(image_hash, model, prompt), text, TEXT_TIER, replace=False)
+
+    def get_page(self, image_hash: str, signature: str) -> Optional[Dict]:
+        """已保存的整页结果（signature 为识别方法和选择策略的摘要）"""
+        return self.store.get(_digest(image_hash, signature), PAGE_TIER)
+
+    def put_page(self, image_hash: str, signature: str, record: Dict):
+        """保存整页结果"""
+        self.store.put(_digest(image_hash, signature), record, PAGE_TIER)
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        return self.store.stats()
@@ -5,12 +5,15 @@
 """
 
 import os
+import sys
 import base64
 import time
-import requests
 from pathlib import Path
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_processor'))
+from llm_client import CHAT_COMPLETIONS_PATH, chat_completion_text, get_shared_llm_client
+
 def get_remaining_files():
     """获取剩余未处理的图片文件"""
     
@@ -39,12 +42,6 @@ def get_remaining_files():
 def extract_text(image_path, api_key):
     """提取文字"""
     
-    base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
     try:
         with open(image_path, 'rb') as image_file:
             base64_image = base64.b64encode(image_file.read()).decode('utf-8')
@@ -72,18 +69,8 @@ def extract_text(image_path, api_key):
             "max_tokens": 4096
         }
         
-        response = requests.post(
-            f"{base_url}/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=120
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['choices'][0]['message']['content'].strip()
-        else:
-            return f"[识别失败: HTTP {response.status_code}]"
+        result = get_shared_llm_client(api_key).complete(CHAT_COMPLETIONS_PATH, payload, timeout=120)
+        return chat_completion_text(result)
             
     except Exception as e:
         return f"[识别失败: {str(e)}]"
@@ -121,7 +108,6 @@ def main():
             f.write("-" * 80 + "\n\n")
             
             print(f"✓ 完成")
-            time.sleep(2)
     
     print("=" * 50)
     print(f"✓ 剩余文件处理完成: {output_file}")
@@ -8,9 +8,11 @@
 import re
 import json
 import time
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 from dataclasses import dataclass, asdict
 
+from keyword_engine import KeywordEngine, QuoteMatcher, iter_unique
+
 @dataclass
 class InvestmentNote:
     """投资笔记结构化数据"""
@@ -88,51 +90,44 @@ class InvestmentAnalyzer:
             ]
         }
         
-        # 投资名言模式
-        self.quote_patterns = [
-            r'"[^"]*"',  # 双引号包围的内容
-            r'"[^"]*"',  # 中文双引号包围的内容
-            r'.*——.*',    # 含有"——"的名言
-            r'.*巴菲特.*', r'.*格雷厄姆.*', r'.*芒格.*'  # 投资大师相关
-        ]
+        # 投资名言：双引号包围的内容；含破折号或投资大师名字的整行
+        self.quote_patterns = [r'"[^"]*"']
+        self.quote_line_keywords = ['——', '巴菲特', '格雷厄姆', '芒格']
+        self.quote_matcher = QuoteMatcher(self.quote_patterns, self.quote_line_keywords)
+        
+        # 投资观点、择时建议的关键词（取包含这些词的整句）
+        self.view_keywords = ['投资', '买入', '卖出', '持有']
+        self.timing_keywords = ['时机', '时候', '机会']
+        
+        # 所有类别合成一个关键词引擎，每页只扫描一遍
+        self.keyword_engine = KeywordEngine({
+            **self.patterns,
+            'views': self.view_keywords,
+            'timing': self.timing_keywords
+        })
 
     def extract_key_quotes(self, text: str) -> List[str]:
         """提取投资金句和名言"""
-        quotes = []
-        
-        for pattern in self.quote_patterns:
-            matches = re.findall(pattern, text, re.MULTILINE)
-            quotes.extend(matches)
-        
-        # 清理和去重
-        cleaned_quotes = []
-        for quote in quotes:
-            quote = quote.strip()
-            if len(quote) > 5 and quote not in cleaned_quotes:
-                cleaned_quotes.append(quote)
-        
-        return cleaned_quotes
+        return list(self.iter_key_quotes(text))
+
+    def iter_key_quotes(self, text: str) -> Iterator[str]:
+        """逐条产出清理、去重后的金句（引号内容、名言行、名人名言句由一个匹配器一次扫描得到）"""
+        return iter_unique(self.quote_matcher.iter_quotes(text), 5, None)
 
     def extract_by_keywords(self, text: str, keyword_type: str) -> List[str]:
         """基于关键词提取相关内容"""
+        return list(self.iter_by_keywords(text, keyword_type))
+
+    def iter_by_keywords(self, text: str, keyword_type: str) -> Iterator[str]:
+        """逐条产出包含某类关键词的句子（清理、去重后）"""
         if keyword_type not in self.patterns:
-            return []
-        
-        results = []
-        patterns = self.patterns[keyword_type]
+            return iter(())
         
-        for pattern in patterns:
-            matches = re.findall(f'[^。！？]*{pattern}[^。！？]*', text, re.IGNORECASE)
-            results.extend(matches)
-        
-        # 清理和去重
-        cleaned_results = []
-        for result in results:
-            result = result.strip('，。！？ \n\t')
-            if len(result) > 3 and result not in cleaned_results:
-                cleaned_results.append(result)
-        
-        return cleaned_results
+        return self._clean_hits(self.keyword_engine.sentence_hits(text)[keyword_type])
+
+    def _clean_hits(self, sentences: List[str]) -> Iterator[str]:
+        """清理和保序去重"""
+        return iter_unique(sentences, 3, '，。！？ \n\t')
 
     def analyze_page(self, page_num: int, filename: str, text: str) -> InvestmentNote:
         """分析单页内容"""
@@ -154,28 +149,21 @@ class InvestmentAnalyzer:
             risk_warnings=[]
         )
         
-        # 提取各类信息
+        # 提取各类信息（所有类别的关键词一次扫描）
+        hits = self.keyword_engine.sentence_hits(text)
         note.key_quotes = self.extract_key_quotes(text)
-        note.investment_strategies = self.extract_by_keywords(text, 'strategies')
-        note.mentioned_stocks = self.extract_by_keywords(text, 'stocks')
-        note.financial_metrics = self.extract_by_keywords(text, 'financial')
-        note.market_analysis = self.extract_by_keywords(text, 'market')
-        note.technical_analysis = self.extract_by_keywords(text, 'technical')
-        note.risk_warnings = self.extract_by_keywords(text, 'risks')
+        note.investment_strategies = list(self._clean_hits(hits['strategies']))
+        note.mentioned_stocks = list(self._clean_hits(hits['stocks']))
+        note.financial_metrics = list(self._clean_hits(hits['financial']))
+        note.market_analysis = list(self._clean_hits(hits['market']))
+        note.technical_analysis = list(self._clean_hits(hits['technical']))
+        note.risk_warnings = list(self._clean_hits(hits['risks']))
         
-        # 提取投资观点（包含"投资"、"买"、"卖"等关键词的句子）
-        investment_patterns = [r'[^。！？]*投资[^。！？]*', r'[^。！？]*买入[^。！？]*', 
-                             r'[^。！？]*卖出[^。！？]*', r'[^。！？]*持有[^。！？]*']
-        for pattern in investment_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            note.investment_views.extend([m.strip() for m in matches if len(m.strip()) > 5])
+        # 投资观点（包含"投资"、"买入"、"卖出"、"持有"的句子）
+        note.investment_views = [m.strip() for m in hits['views'] if len(m.strip()) > 5]
         
-        # 提取择时建议（包含"时机"、"时候"等关键词的句子）
-        timing_patterns = [r'[^。！？]*时机[^。！？]*', r'[^。！？]*时候[^。！？]*', 
-                          r'[^。！？]*机会[^。！？]*']
-        for pattern in timing_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            note.timing_advice.extend([m.strip() for m in matches if len(m.strip()) > 5])
+        # 择时建议（包含"时机"、"时候"等关键词的句子）
+        note.timing_advice = [m.strip() for m in hits['timing'] if len(m.strip()) > 5]
         
         return note
 
@@ -5,16 +5,18 @@
 """
 
 import os
+import sys
 import base64
 import json
-import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_processor'))
+from llm_client import CHAT_COMPLETIONS_PATH, LLMClient, LLMError, chat_completion_text
 
 def test_single_image():
     """测试单个图片的OCR识别"""
     
     # 配置
     API_KEY = "sk-2eee3571d9954f5282586c576e33bfd5"
-    BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
     IMAGE_PATH = "/mnt/c/Users/M2814/.cursor/investliu/investnotebook/微信图片_20250820223018_68.jpg"
     
     # 编码图片
@@ -22,11 +24,6 @@ def test_single_image():
         base64_image = base64.b64encode(image_file.read()).decode('utf-8')
     
     # 构建请求
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     payload = {
         "model": "qwen-vl-max-latest",
         "messages": [
@@ -51,18 +48,18 @@ def test_single_image():
     }
     
     print("发送API请求...")
-    response = requests.post(
-        f"{BASE_URL}/chat/completions",
-        headers=headers,
-        json=payload,
-        timeout=60
-    )
-    
-    print(f"响应状态码: {response.status_code}")
+    # 接口地址可用环境变量 DASHSCOPE_BASE_URL 指向本地假接口测试
+    client = LLMClient(API_KEY, max_retries=0)
+    try:
+        result = client.complete(CHAT_COMPLETIONS_PATH, payload, timeout=60)
+    except LLMError as e:
+        result = None
+        print(f"❌ API调用失败:")
+        print(f"状态码: {e.status_code}")
+        print(f"响应内容: {e}")
     
-    if response.status_code == 200:
-        result = response.json()
-        extracted_text = result['choices'][0]['message']['content'].strip()
+    if result is not None:
+        extracted_text = chat_completion_text(result)
         print("\n✓ OCR识别结果:")
         print("-" * 50)
         print(extracted_text)
@@ -74,11 +71,6 @@ def test_single_image():
             f.write(extracted_text)
         
         print(f"\n结果已保存到: test_ocr_result.txt")
-        
-    else:
-        print(f"❌ API调用失败:")
-        print(f"状态码: {response.status_code}")
-        print(f"响应内容: {response.text}")
 
 if __name__ == "__main__":
     test_single_image()
\ No newline at end of file